@@ -1,3 +1,5 @@
+import functools
+import math
 import numpy as np
 import Utils
 
@@ -42,6 +44,8 @@ def temperature(altitude: float) -> float:
   '''
   Calculates Temperature in *Kelvin* at certain altitude in meters
   '''
+  if isinstance(altitude, np.ndarray) and altitude.ndim > 0:
+    return _temperature_array(altitude)
   out: float = 0
   if altitude < 11e3:
     out = 15.04 - 6.49e-3 * altitude
@@ -59,25 +63,137 @@ def pressure(altitude: float) -> float:
   '''
   Calculates air pressure in pascals at altitude in meters
   '''
+  if isinstance(altitude, np.ndarray) and altitude.ndim > 0:
+    return _pressure_array(altitude, _temperature_array(altitude))
+  return _pressure(altitude, temperature(altitude))
+
+
+def density(altitude : float) -> float:
+  '''
+  Calculates the air density in kilogram/cubic meter at altitude in meter
+  '''
+  return state(altitude)[2]
+
+
+def state(altitude: float) -> tuple:
+  '''
+  Temperature (K), pressure (Pa) and density (kg/m3) at altitude in meters,
+  computing each of them once. `altitude` can be a float or an array
+  '''
+  if isinstance(altitude, np.ndarray) and altitude.ndim > 0:
+    K = _temperature_array(altitude)
+    P = _pressure_array(altitude, K)
+  else:
+    K = temperature(altitude)
+    P = _pressure(altitude, K)
+  return K, P, P / (286.9 * K)
+
+
+def _pressure(altitude: float, K: float) -> float:
   out: float = 0
   if altitude < 11e3:
-    out = P_sl0 * (temperature(altitude)/288.08)**5.256
+    out = P_sl0 * (K/288.08)**5.256
   elif altitude < 25e3:
-    out = P_sl1 * np.exp((1.73 - 0.000157*altitude))
-  elif altitude < 33e3: 
-    out = P_sl2 * (temperature(altitude)/216.6)**(-11.388)
+    out = P_sl1 * math.exp((1.73 - 0.000157*altitude))
+  elif altitude < 33e3:
+    out = P_sl2 * (K/216.6)**(-11.388)
   else:
-    out = P_sl2 * (temperature(altitude)/216.6)**(-11.388)
+    out = P_sl2 * (K/216.6)**(-11.388)
     # raise Exception(altitude)
   return out
 
 
-def density(altitude : float) -> float:
+# Array versions, used when a whole ensemble (or trajectory) is evaluated at
+# once. Same layers as the scalar functions above, each one only computed
+# where it applies.
+
+def _temperature_array(altitude: np.ndarray) -> np.ndarray:
+  out = np.full(altitude.shape, -56.46)
+  low = altitude < 11e3
+  high = altitude >= 25e3
+  out[low] = 15.04 - 6.49e-3 * altitude[low]
+  out[high] = -131.21 + 0.00299 * altitude[high]
+  return Utils.kelvin(out)
+
+
+def _pressure_array(altitude: np.ndarray, K: np.ndarray) -> np.ndarray:
+  out = np.empty(altitude.shape)
+  low = altitude < 11e3
+  high = altitude >= 25e3
+  mid = ~(low | high)
+  out[low] = P_sl0 * (K[low]/288.08)**5.256
+  out[mid] = P_sl1 * np.exp(1.73 - 0.000157*altitude[mid])
+  out[high] = P_sl2 * (K[high]/216.6)**(-11.388)
+  return out
+
+
+class TabulatedAtmosphere:
   '''
-  Calculates the air density in kilogram/cubic meter at altitude in meter
+  The same atmosphere, precomputed on an altitude grid of `step` meters from
+  `bottom` to `top` and read back by linear interpolation.
+
+  Has the `temperature`, `pressure`, `density` and `state` functions of this
+  module, for floats or arrays, so it can replace it (see `Balloon.air`).
+  A lookup is one index computation and one interpolation, no `exp` or
+  powers. The layer limits (11 and 25 km) are exact when `step` divides
+  1 km; the relative error is under 1e-6 with the default 10 m step.
+  Outside the grid the first or last cell is extrapolated.
   '''
-  P_kpa = pressure(altitude)
-  K = temperature(altitude)
-  p = P_kpa / (286.9 * K)
-  return p
 
+  def __init__(self, step: float = 10.0, bottom: float = -1e3, top: float = 50e3) -> None:
+    self.step = step
+    self.bottom = bottom
+    self.size = int(math.ceil((top - bottom) / step))
+    self._inverse_step = 1 / step
+    start = bottom + step * np.arange(self.size)
+    # Cell ends are taken just below the next node, so a cell never mixes two layers
+    end = np.nextafter(start + step, -np.inf)
+    self._start = np.stack(state(start))
+    self._slope = (np.stack(state(end)) - self._start) / step
+    # One (T, P, rho, dT, dP, drho, altitude) tuple per cell for float lookups
+    self._cells_list = list(zip(*self._start.tolist(), *self._slope.tolist(), start.tolist()))
+
+  def state(self, altitude: float) -> tuple:
+    '''
+    Temperature (K), pressure (Pa) and density (kg/m3) at altitude in meters
+    '''
+    if isinstance(altitude, np.ndarray) and altitude.ndim > 0:
+      return tuple(self._column(column, altitude) for column in range(3))
+    i = int((altitude - self.bottom) * self._inverse_step)
+    if i < 0:
+      i = 0
+    elif i >= self.size:
+      i = self.size - 1
+    T, P, rho, dT, dP, drho, start = self._cells_list[i]
+    if altitude < start and i > 0:
+      # Rounded up into the next cell
+      T, P, rho, dT, dP, drho, start = self._cells_list[i - 1]
+    dz = altitude - start
+    return T + dT * dz, P + dP * dz, rho + drho * dz
+
+  def temperature(self, altitude: float) -> float:
+    return self._column(0, altitude)
+
+  def pressure(self, altitude: float) -> float:
+    return self._column(1, altitude)
+
+  def density(self, altitude: float) -> float:
+    return self._column(2, altitude)
+
+  def _column(self, column: int, altitude: float) -> float:
+    if isinstance(altitude, np.ndarray) and altitude.ndim > 0:
+      i = ((altitude - self.bottom) * self._inverse_step).astype(np.intp)
+      np.clip(i, 0, self.size - 1, out=i)
+      # Rounded up into the next cell
+      i -= (altitude < self.bottom + i * self.step) & (i > 0)
+      dz = altitude - (self.bottom + i * self.step)
+      return np.take(self._start[column], i) + np.take(self._slope[column], i) * dz
+    return self.state(altitude)[column]
+
+
+@functools.lru_cache(maxsize=None)
+def tabulated(step: float = 10.0) -> TabulatedAtmosphere:
+  '''
+  Shared `TabulatedAtmosphere` with the given resolution, built on first use
+  '''
+  return TabulatedAtmosphere(step)
@@ -2,11 +2,11 @@
 import numpy as np
 import Air
 from Universe import radius_sphere, vol_sphere, molar_mass_he, g, R
-from Instrument import probe
+from Events import Event
 from numpy import ndarray
-from datetime import datetime, timedelta
+from datetime import datetime
 from thirdparty.GFS import GFS_Handler
-from thirdparty.global_tools import dirspeed2uv, m2deg
+from thirdparty.global_tools import m2deg
 from typing import Callable
 
 # ? Mass:           Kilogram
@@ -20,6 +20,136 @@ from typing import Callable
 # ? Acceleration:   m/s^2
 
 
+# Flight phases, stored in the `phase` row of the state
+ASCENT = 0
+BURST = 1
+LANDED = 2
+
+# Absolute tolerance of each row of the state for the adaptive integrator
+# (`Simulate(..., method='rk45', atol=STATE_ATOL)`), in its own units: about
+# a centimeter of altitude and position. The phase, valve and controller
+# rows don't change during a step.
+STATE_ATOL = np.vstack([1e-2,  # altitude (m)
+                        1e-3,  # velocity (m/s)
+                        1e-6,  # gas mass (kg)
+                        1e-7,  # latitude (deg)
+                        1e-7,  # longitude (deg)
+                        1.0,  # phase
+                        1.0,  # valve flow
+                        1.0,  # valve controller last error
+                        1.0  # valve controller error sum
+                        ])
+
+
+class ValveController():
+    """
+    PID controller of the gas valve.
+
+    It only holds the gains: the last error and the error sum are rows of
+    the state (`valve_error` and `valve_sum`), given to `update` and
+    returned by it once per accepted step (see `Balloon.Update`), with the
+    command held in the `valve` row until the next step. Nothing changes
+    the controller, so one can be shared by any number of simulations.
+    """
+
+    def __init__(self, P: float = 0.1, I: float = 0.0, D: float = 0.01, setpoint: float = 0,
+                 min_altitude: float = 19e3, enabled: bool = False) -> None:
+        self.P = P
+        self.I = I
+        self.D = D
+        self.setpoint = setpoint
+        self.min_altitude = min_altitude
+        self.enabled = enabled
+
+    def update(self, altitude: ndarray, velocity: ndarray, last_error: ndarray, acc_error: ndarray) -> tuple:
+        """
+        Valve flow (m3/s) to hold until the next step, one per member, with
+        the new last error and error sum.
+
+        A disabled controller keeps the valve closed and its memory as it
+        is, so that it leaves the state alone (the adaptive integrator then
+        reuses its last stage, see `Simulator.Simulate`).
+        """
+        if not self.enabled:
+            return 0 * velocity, last_error, acc_error
+        r = 0.01
+        area = np.pi * r * r
+        # vazao = area * (np.sqrt(2 * (self.pressure() - Air.pressure(altitude))))
+
+        error = velocity - self.setpoint
+        vazao = self.P * error + self.I * acc_error + \
+            self.D * (error - last_error)
+        vazao = vazao * (altitude > self.min_altitude) * self.enabled
+
+        acc_error = acc_error + error
+
+        acc_error = acc_error * (acc_error < 10)
+
+        return vazao, error, acc_error
+
+
+def _gas_volume(m_gas, temperature, pressure):
+    """Ideal gas volume (m3) of `m_gas` kilograms of Helium."""
+    return m_gas * R * temperature / pressure / molar_mass_he
+
+
+def _forces(mass, volume, gas_density, air_density, area, drag_coeff, velocity) -> tuple:
+    """
+    Weight, buoyancy, drag and the acceleration they give, from floats or
+    arrays. Shared by `Evaluation` and `Balloon.derived`, which only choose
+    the balloon or the parachute values for each phase.
+    """
+    weight = -mass * g
+    buoyancy = g * volume * (air_density - gas_density)
+    drag = -(1/2) * drag_coeff * air_density * area * (abs(velocity)*velocity)
+    return weight, buoyancy, drag, (buoyancy + weight + drag) / mass
+
+
+def _landed_acceleration(velocity):
+    """Acceleration stopping the balloon on the ground."""
+    # ! Assumption: Contact time of 0.5s
+    return (0 - velocity)/(0.5 - 0)
+
+
+class Evaluation():
+    """
+    Derived quantities of the balloon at one state, made by each model call
+    (and by `Balloon.Observe`) for its own state and shared by all the terms
+    of the derivative.
+
+    The atmosphere is evaluated once per altitude and the volume, radius,
+    mass and forces once per (altitude, velocity, m_gas, phase), instead of
+    once for every force that needs them.
+    """
+    __slots__ = ('temperature', 'pressure', 'air_density', 'volume', 'radius', 'gas_density',
+                 'mass', 'weight', 'buoyancy', 'drag', 'acceleration')
+
+    def __init__(self, balloon: 'Balloon', altitude: float, velocity: float, m_gas: float,
+                 phase: int = ASCENT) -> None:
+        self.temperature, self.pressure, self.air_density = balloon.air.state(altitude)
+
+        if phase != ASCENT:
+            # The balloon is gone, only the parachute is left
+            self.volume: float = 0
+            self.radius: float = 0
+            self.gas_density: float = 0
+            self.mass: float = balloon.m_payload + m_gas
+            area = np.pi * balloon.parachute_r ** 2
+            drag_coeff = balloon.parachute_Dcoeff
+        else:
+            self.volume = _gas_volume(m_gas, self.temperature, self.pressure)
+            self.radius: float = radius_sphere(self.volume)
+            self.gas_density = m_gas / self.volume
+            self.mass = balloon.m_payload + balloon.m_balloon + m_gas
+            area = np.pi * self.radius * self.radius
+            drag_coeff = balloon.drag_coeff
+
+        self.weight, self.buoyancy, self.drag, self.acceleration = _forces(
+            self.mass, self.volume, self.gas_density, self.air_density, area, drag_coeff, velocity)
+        if phase == LANDED:
+            self.acceleration = _landed_acceleration(velocity)
+
+
 class Balloon():
     """Contains the numeric models to simulate the balloon ascent."""
 
@@ -37,10 +167,10 @@ class Balloon():
     r_f: float
     # Balllon Drag Coefficient
     drag_coeff: float
-    # Helps check if this iteration is a burst
-    burst: bool
-    # Check if it hit the ground
-    touchdown: bool
+    # Gas valve, updated between steps (see `Update`)
+    controller: ValveController
+    # Atmosphere model: the `Air` module or anything with its functions
+    air: object
 
     # Parachute Drag Coefficient
     parachute_Dcoeff: float
@@ -52,11 +182,12 @@ class Balloon():
     # All are generated with signature: (latitude, longitude, altitude, gfs_time) -> float
     forecast_pressure = Callable[[float, float, float, float], float]
     forecast_temperature = Callable[[float, float, float, float], float]
-    forecast_wind_dir = Callable[[float, float, float, float], float]
-    forecast_wind_spd = Callable[[float, float, float, float], float]
+    # Wind components together: (latitude, longitude, altitude, gfs_time) -> [u, v] in m/s
+    forecast_wind = Callable[[float, float, float, float], ndarray]
     gfs_link: GFS_Handler
+    gfs_start: float
 
-    def __init__(self, balloon_mass: float, payload_mass: float, initial_volume: float, burst_diameter: float, drag_coef: float, parachute_diameter: float, initial_loc: tuple[float, float], start_date: datetime, parachute_drag_coeff: float) -> None:
+    def __init__(self, balloon_mass: float, payload_mass: float, initial_volume: float, burst_diameter: float, drag_coef: float, parachute_diameter: float, initial_loc: tuple[float, float], start_date: datetime, parachute_drag_coeff: float, gfs_link: GFS_Handler = None, atmosphere=Air, forecast_cache: str = None) -> None:
         """
         Create balloon object.
 
@@ -67,6 +198,9 @@ class Balloon():
         drag_coef: Drag Coefficient
         parachute_diameter:
         parachute_drag_coeff:
+        gfs_link: already downloaded forecast, skips the GFS download if given
+        atmosphere: `Air` (default) or an `Air.TabulatedAtmosphere`
+        forecast_cache: directory where downloaded forecasts are kept, a cycle already there isn't downloaded again
         """
         self.m_balloon = balloon_mass * 1e-3
         self.m_payload = payload_mass
@@ -77,8 +211,8 @@ class Balloon():
         self.parachute_Dcoeff = parachute_drag_coeff
         self.parachute_r = parachute_diameter / 2
         self.initial_m_gas = self.vol_gas * Air.p_he
-        self.touchdown = False
-        self.burst = False
+        self.controller = ValveController()
+        self.air = atmosphere
         self.start_date = start_date
         self.initial_loc = initial_loc
 
@@ -93,167 +227,191 @@ class Balloon():
         print(
             f"Parachute: \n \tOpen Diameter: {parachute_diameter:.2f}m\n \tDrag Coefficient: {parachute_drag_coeff:.3f}")
 
-        self.gfs_link = GFS_Handler(
-            self.initial_loc[0], self.initial_loc[1], self.start_date)
-        print(f"Downloading Forecast data from NASA's GFS...")
-        self.gfs_link.downloadForecast()
-        print(f"Complete")
+        if gfs_link is None:
+            gfs_link = GFS_Handler(
+                self.initial_loc[0], self.initial_loc[1], self.start_date, cache_dir=forecast_cache)
+            print(f"Downloading Forecast data from NASA's GFS...")
+            gfs_link.downloadForecast()
+            print(f"Complete")
+        self.gfs_link = gfs_link
         getTemp, getPress = self.gfs_link.interpolateData('temperature', 'pressure')
-        getDir, getSpd = self.gfs_link.interpolateData('wind_direction', 'wind_speed')
         self.forecast_temperature = getTemp
         self.forecast_pressure = getPress
-        self.forecast_wind_dir = getDir
-        self.forecast_wind_spd = getSpd
+        self.forecast_wind = self.gfs_link.interpolateStacked('wind_u', 'wind_v')
+        # GFS time (in days) of the launch, simulation times are added to it
+        self.gfs_start = self.gfs_link.getGFStime(self.start_date)
+
+    def gas_volume(self, altitude: float, m_gas: float) -> float:
+        """Ideal gas volume of `m_gas` kilograms of Helium at altitude in meters, in cubic meters."""
+        # ! Assumption: the gas is at the pressure and temperature of the air
+        return _gas_volume(m_gas, self.air.temperature(altitude), self.air.pressure(altitude))
+
+    def initial_state(self) -> ndarray:
+        """Launch state: on the ground, still, ascending with the valve closed."""
+        return np.vstack([0.0,  # altitude
+                          0.0,  # velocity
+                          self.initial_m_gas,  # gas mass
+                          self.initial_loc[0],
+                          self.initial_loc[1],
+                          ASCENT,  # phase
+                          0.0,  # valve flow
+                          0.0,  # valve controller last error
+                          0.0  # valve controller error sum
+                          ])
+
+    def events(self) -> list[Event]:
+        """
+        Burst and touchdown events, to be passed to the Simulator.
 
-    def volume(self, altitude: float, m_gas: float) -> float:
-        """Calculate (simplified) the balloon's volume in cubic meters at altitude in meters."""
-        if (self.burst):
-            return 0
+        They change the flight phase (the `phase` row of the state) at the
+        exact time it happens, the touchdown also ends the simulation. They
+        also work for `SimulateEnsemble`, one value per member.
+        """
+        def burst(t: float, state: ndarray) -> float:
+            # in theory the gas reaching this volume means burst
+            altitude, m_gas = state[0], state[2]
+            if len(altitude) == 1:
+                # A single member: floats are faster for the atmosphere
+                altitude, m_gas = altitude[0], m_gas[0]
+            return self.gas_volume(altitude, m_gas) - vol_sphere(self.r_f)
+
+        def touchdown(t: float, state: ndarray) -> float:
+            return state[0]
+
+        def change_phase(phase: int):
+            def action(t: float, state: ndarray) -> ndarray:
+                state = state.copy()
+                state[5] = phase
+                return state
+            return action
+
+        return [Event('burst', burst, direction=1, action=change_phase(BURST)),
+                Event('touchdown', touchdown, direction=-1, terminal=True, action=change_phase(LANDED))]
+
+    def Update(self, t: float, state: ndarray) -> ndarray:
+        """
+        Step hook, called by the Simulator once per accepted step with the
+        (9, N) state.
 
-        burst_vol: float = vol_sphere(self.r_f)
+        Changes the flight phase when burst or touchdown happened during the
+        step (without `events`, this is how the phase changes) and holds the
+        new valve command, with the controller's own rows. `state` is
+        updated in place and returned.
+        """
+        altitude, velocity, m_gas, phase = state[0], state[1], state[2], state[5]
 
-        # Ideal Gas Law
-        # initial gas mass
-        # m_0: float  = vol_sphere(self.r_i) * Air.p_he
-        # m_gas = m_0                                     #! Assumption
+        phase = np.where((phase == ASCENT) & (self.gas_volume(altitude, m_gas) > vol_sphere(self.r_f)),
+                         BURST, phase)
+        phase = np.where((phase == BURST) & (altitude < 1e-3), LANDED, phase)
+        state[5] = phase
+        state[6], state[7], state[8] = self.controller.update(altitude, velocity, state[7], state[8])
+        return state
 
-        pressure: float = Air.pressure(altitude)          # ! Assumption
-        # pressure =    4/3 * np.pi * g * self.density(altitude, m_gas) * altitude
-        temperature: float = Air.temperature(altitude)    # ! Assumption
-        vol: float = m_gas * R * temperature / pressure / molar_mass_he
+    def delta_loc(self, lat, lng, alt, velocity: float, time) -> float:
+        """Latitude and longitude rates (deg/s), for floats or arrays of coordinates."""
+        gfs_time = self.gfs_start + time / 86400.
+        # eastward and northward wind in [m/s]
+        u, v = self.forecast_wind(lat, lng, alt, gfs_time)
+        return m2deg(u, v, lat)
 
-        # radius = self.r_f + (self.r_i - self.r_f)/(Air.P_sl0 -
-        #                                            Air.P_sl2)*(Air.pressure(altitude) - Air.P_sl2)
-        # vol = vol_sphere(radius)
+    def Model(self, t: float, state: list[list[float]]) -> ndarray:
+        """
+        Calculate the derivative (delta state) to be integrated on simulation step.
 
-        if vol > burst_vol:  # in theory this condition means burst
-            self.burst = True
+        It only depends on `t` and `state` (the phase, the valve command and
+        the controller are part of it), and changes nothing, neither the
+        balloon nor anything shared between calls.
+        """
+        delta = self.ScalarModel(t, np.ravel(state).tolist())
+        return np.array(delta).reshape((len(delta), 1))
 
-        return vol
+    def ScalarModel(self, t: float, state: list[float]) -> tuple:
+        """
+        Same as `Model`, on plain floats: `state` is a flat sequence of the
+        9 states and the derivative is returned as a tuple.
+        """
+        current_altitude, current_velocity, current_m_gas, current_lat, current_lng, phase, flow = state[:7]
+        ev = Evaluation(self, current_altitude, current_velocity, current_m_gas, phase)
+
+        delta = (current_velocity,  # altitude
+                 ev.acceleration,  # velocity
+                 -flow * ev.gas_density,  # volume
+                 *self.delta_loc(current_lat, current_lng,
+                                 current_altitude, current_velocity, t), # lat, lng
+                 0.0,  # phase
+                 0.0,  # valve
+                 0.0,  # valve controller last error
+                 0.0   # valve controller error sum
+                 )
+        return delta
 
-    def drag(self, altitude: float, velocity: float, m_gas: float) -> float:
-        """Calculate the drag force at altitude in meters while moving at velocity in meters per second."""
-        if (self.burst):
-            self.drag_coeff = self.parachute_Dcoeff
-            area = np.pi * (self.parachute_r) ** 2
-        else:
-            radius = radius_sphere(self.volume(altitude, m_gas))
-            area: float = np.pi * radius * radius
-
-        d: float = -(1/2) * self.drag_coeff * \
-            Air.density(altitude) * area * (abs(velocity)*velocity)
-        return d
-
-    def mass(self, m_gas: float) -> float:
-        """Calculate current system mass."""
-        # Expected Helium Mass
-        # m_gas: float = vol_sphere(self.r_i) * Air.p_he
-
-        if (self.burst):
-            self.m_balloon = 0
-            self.m_gas = 0
-
-        mass: float = self.m_payload + self.m_balloon + m_gas
-        return mass
-
-    def weight(self, m_gas: float) -> float:
-        """Total Weight."""
-        # m_gas: float = vol_sphere(self.r_i) * Air.p_he
-        return -(self.mass(m_gas)) * g
-
-    def density(self, altitude: float, m_gas: float) -> float:
-        """Calculate current gas density inside balloon (He)."""
-        if (self.burst):
-            return 0
-
-        # m_gas: float =  vol_sphere(self.r_i) * Air.p_he
-        rho_he = m_gas / self.volume(altitude, m_gas)
-        return rho_he
-
-    def buoyancy(self, altitude: float, m_gas: float) -> float:
-        """Calculate the Buoyancy force at a given altitude."""
-        return g * self.volume(altitude, m_gas) * (Air.density(altitude) - self.density(altitude, m_gas))
-
-    def acceleration(self, altitude: float, velocity: float, m_gas: float) -> float:
-        """Calculate acceleration in m/s2 from altitude and (previous dt) velocity."""
-        acc: float = (self.buoyancy(altitude, m_gas) + self.weight(m_gas) +
-                      self.drag(altitude, velocity, m_gas)) / self.mass(m_gas)
-        self.r_i += 0.1
-        if (self.touchdown):
-            # ! Assumption: Contact time of 0.5s
-            acc = (0 - velocity)/(0.5 - 0)
-        return acc
-
-    last_error = 0
-    acc_error = 0
-
-    def valve(self, altitude: float, current_m_gas: float, velocity: float) -> float:
-        """Gas Mass change by valve"""
-        r = 0.01
-        area = np.pi * r * r
-        # vazao = area * (np.sqrt(2 * (self.pressure() - Air.pressure(altitude))))
+    def Observe(self, t: float, state) -> dict:
+        """
+        Derived quantities at an accepted step, as named channels (the
+        `observer` of `Simulate`), from one `Evaluation` of the state.
+        """
+        altitude, velocity, m_gas, lat, lng, phase = np.ravel(state)[:6].tolist()
+        ev = Evaluation(self, altitude, velocity, m_gas, phase)
+        return {'volume': ev.volume, 'buoyancy': ev.buoyancy, 'drag': ev.drag,
+                'acceleration': ev.acceleration, 'weight': ev.weight,
+                'temperature': ev.temperature, 'pressure': ev.pressure,
+                'density': ev.air_density}
+
+    def ensemble(self, members: int) -> ndarray:
+        """The (9, members) initial state."""
+        return np.repeat(self.initial_state(), members, axis=1)
+
+    def EnsembleModel(self, t: float, state: ndarray) -> ndarray:
+        """
+        Same as `Model`, for a (9, N) state where every column is a member.
 
-        vazao = 0
+        Burst and touchdown are read from each member's phase. Balloon
+        parameters may also be set to (N,) arrays to give each member its
+        own value.
+        """
+        altitude, velocity, m_gas, lat, lng, phase, flow = state[:7]
+        derived = self.derived(altitude, velocity, m_gas, phase)
 
-        P = 0.1
-        I = 0.0
-        D = 0.01
+        # The forecast is queried for all the members at once
+        d_lat, d_lng = self.delta_loc(lat, lng, altitude, velocity, t)
 
-        setpoint = 0
-        error = velocity - setpoint
-        if (altitude > 19e3 and False):
-            vazao = P * error + I * (self.acc_error) + \
-                D * (error - self.last_error)
+        zeros = np.zeros_like(m_gas)
+        return np.vstack([velocity, derived['acceleration'], -flow * derived['gas_density'],
+                          d_lat, d_lng, zeros, zeros, zeros, zeros])
 
-        self.last_error = error
-        self.acc_error += error
+    # Channels given by `Derive`
+    derived_channels = ('volume', 'buoyancy', 'drag', 'acceleration',
+                        'weight', 'temperature', 'pressure', 'density')
 
-        self.acc_error = self.acc_error if self.acc_error < 10 else 0
+    def derived(self, altitude: ndarray, velocity: ndarray, m_gas: ndarray, phase: ndarray) -> dict:
+        """
+        Same quantities as `Evaluation`, for arrays of states, in one
+        vectorized pass: a dict of arrays named as `derived_channels`, plus
+        the gas density.
+        """
+        altitude, velocity, m_gas, phase = (np.asarray(x, dtype=float) for x in (altitude, velocity, m_gas, phase))
+        burst = phase != ASCENT
 
-        return -vazao * self.density(altitude, current_m_gas)
+        temperature, pressure, air_density = self.air.state(altitude)
+        vol = np.where(burst, 0.0, _gas_volume(m_gas, temperature, pressure))
+        gas_density = np.divide(m_gas, vol, out=np.zeros_like(vol), where=~burst)
+        mass = self.m_payload + np.where(burst, 0.0, self.m_balloon) + m_gas
+        area = np.where(burst, np.pi * self.parachute_r ** 2,
+                        np.pi * radius_sphere(vol) ** 2)
+        drag_coeff = np.where(burst, self.parachute_Dcoeff, self.drag_coeff)
 
-    _i = 0
+        weight, buoyancy, drag, acc = _forces(mass, vol, gas_density, air_density, area, drag_coeff, velocity)
+        acc = np.where(phase == LANDED, _landed_acceleration(velocity), acc)
 
-    def delta_loc(self, lat, lng, alt, velocity: float, time) -> float:
-        # direction in [degrees] clockwise from north
-        dir_deg = self.forecast_wind_dir(lat, lng, alt, self.gfs_link.getGFStime(
-            self.start_date+timedelta(seconds=time)))
-        # speed in [knots]
-        spd_knots = self.forecast_wind_spd(lat, lng, alt, self.gfs_link.getGFStime(
-            self.start_date+timedelta(seconds=time)))
-        spd = spd_knots * 0.514444 # m/s
-        u,v = dirspeed2uv(dir_deg, spd)
-        return m2deg(u, v, lat)
+        return {'volume': vol, 'buoyancy': buoyancy, 'drag': drag, 'acceleration': acc,
+                'weight': weight, 'temperature': temperature, 'pressure': pressure,
+                'density': air_density, 'gas_density': gas_density}
 
-    def Model(self, t: float, state: list[list[float]]) -> ndarray:
-        """Calculate the derivative (delta state) to be integrated on simulation step."""
-        current_altitude: float = state[0][0]          # altitude
-        current_velocity: float = state[1][0]          # velocity
-        current_m_gas: float = state[2][0]
-        current_lat: float = state[3][0]
-        current_lng: float = state[4][0]
-
-        if self.burst and current_altitude < 1e-3:
-            self.touchdown = True
-
-        delta = np.vstack([current_velocity,  # altitude
-                           self.acceleration(
-                               current_altitude, current_velocity, current_m_gas),  # velocity
-                           self.valve(current_altitude,
-                                      current_m_gas, current_velocity), # volume
-                           *self.delta_loc(current_lat, current_lng,
-                                          current_altitude, current_velocity, t) # lat, lng
-                           ])
-
-        probe(self.volume(current_altitude, current_m_gas), 0)
-        probe(self.buoyancy(current_altitude, current_m_gas), 1)
-        probe(self.drag(current_altitude, current_velocity, current_m_gas), 2)
-        probe(self.acceleration(current_altitude,
-                                current_velocity, current_m_gas), 3)
-        probe(self.weight(current_m_gas), 4)
-        probe(Air.temperature(current_altitude), 5)
-        probe(Air.pressure(current_altitude), 6)
-        probe(Air.density(current_altitude), 7)
-
-        self._i += 1
-        return delta
+    def Derive(self, trajectory) -> dict:
+        """
+        `derived` quantities of every sample of a finished `Trajectory`, to
+        be attached with `Trajectory.add_derived`, so that they are only
+        computed if they are read.
+        """
+        return self.derived(trajectory['altitude'], trajectory['velocity'],
+                            trajectory['gas_mass'], trajectory['phase'])
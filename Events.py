@@ -0,0 +1,115 @@
+from typing import Callable, NamedTuple
+import numpy as np
+from numpy import ndarray
+
+'''
+Zero crossing events, checked by the Simulator after every step
+'''
+
+
+class EventRecord(NamedTuple):
+    '''
+    An event that happened during the simulation
+    '''
+    name: str
+    time: float
+    state: ndarray
+
+
+class Event:
+    '''
+    Happens when `function(t, state)` crosses zero.
+
+    `direction` limits it to rising (1) or falling (-1) crossings, 0 takes both.
+    A `terminal` event stops the simulation at the crossing.
+    `action(t, state)`, if given, is called at the crossing and returns the
+    state the simulation continues from, for example with a new flight phase.
+
+    `function` may also be given a (9, N) ensemble state and return one value
+    per member; for a single member the value is a float either way.
+    '''
+
+    def __init__(self, name: str, function: Callable[[float, ndarray], float], direction: int = 0,
+                 terminal: bool = False, action: Callable[[float, ndarray], ndarray] = None) -> None:
+        self.name = name
+        self.function = function
+        self.direction = direction
+        self.terminal = terminal
+        self.action = action
+
+    def __call__(self, t: float, state: ndarray) -> float:
+        value = self.function(t, state)
+        if np.ndim(value) and np.size(value) == 1:
+            return np.ravel(value)[0].item()
+        return value
+
+    def crossed(self, value_prev: float, value_next: float) -> bool:
+        if self.direction >= 0 and value_prev < 0 <= value_next:
+            return True
+        if self.direction <= 0 and value_prev > 0 >= value_next:
+            return True
+        return False
+
+    def crossings(self, value_prev: ndarray, value_next: ndarray) -> ndarray:
+        '''`crossed` for arrays of values, one per ensemble member'''
+        crossed = np.zeros(np.shape(value_next), dtype=bool)
+        if self.direction >= 0:
+            crossed |= (value_prev < 0) & (value_next >= 0)
+        if self.direction <= 0:
+            crossed |= (value_prev > 0) & (value_next <= 0)
+        return crossed
+
+
+def hermite(state_prev: ndarray, state_next: ndarray, t_step: float,
+            d_prev: ndarray, d_next: ndarray = None) -> Callable[[float], ndarray]:
+    '''
+    Interpolates the state inside a step, from its ends and derivatives.
+
+    Returns a function of the fraction of the step (0 to 1). It is cubic when
+    both derivatives are known, quadratic when only `d_prev` is.
+    '''
+    delta = state_next - state_prev
+    if d_next is None:
+        def interpolant(s: float) -> ndarray:
+            return state_prev + s * t_step * d_prev + s * s * (delta - t_step * d_prev)
+    else:
+        def interpolant(s: float) -> ndarray:
+            h00 = 2 * s**3 - 3 * s**2 + 1
+            h10 = s**3 - 2 * s**2 + s
+            h01 = -2 * s**3 + 3 * s**2
+            h11 = s**3 - s**2
+            return (h00 * state_prev + h10 * t_step * d_prev
+                    + h01 * state_next + h11 * t_step * d_next)
+    return interpolant
+
+
+def locate(event: Event, interpolant: Callable[[float], ndarray], t_now: float, t_step: float,
+           value_prev: float, value_next: float, tolerance: float = 1e-6):
+    '''
+    Finds where `event` crosses zero inside the step, by regula falsi
+    (Illinois variant) on the interpolated state.
+
+    Returns the time of the event and the state at that time
+    '''
+    a, b = 0.0, 1.0
+    ga, gb = value_prev, value_next
+    side = 0
+    s = b
+    state = interpolant(s)
+    for _ in range(100):
+        s = (a * gb - b * ga) / (gb - ga)
+        state = interpolant(s)
+        g = event(t_now + s * t_step, state)
+        if g == 0 or (b - a) * t_step < tolerance:
+            break
+        if np.sign(g) == np.sign(gb):
+            b, gb = s, g
+            if side == -1:
+                ga /= 2
+            side = -1
+        else:
+            a, ga = s, g
+            if side == 1:
+                gb /= 2
+            side = 1
+    return t_now + s * t_step, state
@@ -1,29 +1,83 @@
 import numpy as np
+from numpy import ndarray
+
+'''
+Recording of named quantities that are not part of the simulation state,
+such as the ones observed at every step (see `Simulate`)
+'''
+
 
 class Prober:
-    def __init__(self, count) -> None:
-        self.data = []
-        self.count = [0]
-
-        self.data.append([])
-        for _ in range(1, count):
-            self.data.append([])
-            self.count.append(0)
-        
-    def __call__(self, v, offset=0):
-        self.count[offset] = self.count[offset] + 1
-        if(self.count[offset] % 4 == 0):
-            self.data[offset].append(v)
-    
-    def get(self):
-        if len(self.data[0]) == 0:
-            return np.array([])
-        
-        out = np.array(self.data[0]).squeeze()
-        for i in range(1, len(self.data)):
-            a = np.array(self.data[i]).squeeze()
-            out = np.column_stack((out, a))
-        return out
-
-    
-probe = Prober(8)
+    '''
+    Samples of named channels, recorded with
+
+    >>> probe(volume=v, drag=d, ...)
+
+    Only one call in `decimation` is kept (every call, by default). The
+    samples are stored in a preallocated float64 buffer with one contiguous
+    row per channel, which either grows in chunks when more than `capacity`
+    samples are kept or, with `ring`, keeps only the last `capacity` ones,
+    so an unbounded run takes constant memory. Channels left out of a kept
+    call are NaN.
+
+    Channels are read by name, oldest sample first:
+
+    >>> probe['volume'], probe.get()
+    '''
+
+    def __init__(self, channels: tuple, decimation: int = 1, capacity: int = 4096, ring: bool = False) -> None:
+        if decimation < 1:
+            raise ValueError(f"Decimation must be at least 1, not {decimation}")
+        self.channels = tuple(channels)
+        self.decimation = decimation
+        self.ring = ring
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._data = np.full((len(self.channels), max(capacity, 1)), np.nan)
+        self.reset()
+
+    def reset(self) -> None:
+        '''Drops every sample and restarts the decimation count'''
+        self.calls = 0
+        # Samples kept since the start, the last `capacity` of them in a ring
+        self.kept = 0
+        self._data.fill(np.nan)
+
+    def __call__(self, **values: float) -> None:
+        self.calls += 1
+        if self.calls % self.decimation:
+            return
+        if self.kept == self._data.shape[1] and not self.ring:
+            self._grow()
+        column = self.kept % self._data.shape[1]
+        if len(values) == len(self.channels):
+            self._data[:, column] = [values[name] for name in self.channels]
+        else:
+            # Channels not given may hold a sample of the last lap
+            self._data[:, column] = np.nan
+            for name, value in values.items():
+                self._data[self._index[name], column] = value
+        self.kept += 1
+
+    def __len__(self) -> int:
+        return min(self.kept, self._data.shape[1])
+
+    def __getitem__(self, name: str) -> ndarray:
+        return self._ordered()[self._index[name]]
+
+    def get(self) -> ndarray:
+        '''(samples, channels) array of every stored sample'''
+        return self._ordered().T
+
+    def _ordered(self) -> ndarray:
+        '''(channels, samples) view of the stored samples, oldest first'''
+        capacity = self._data.shape[1]
+        if self.kept <= capacity:
+            return self._data[:, :self.kept]
+        # The ring wrapped around: the oldest sample is the next to go
+        start = self.kept % capacity
+        return np.concatenate((self._data[:, start:], self._data[:, :start]), axis=1)
+
+    def _grow(self) -> None:
+        data = np.full((len(self.channels), 2 * self._data.shape[1]), np.nan)
+        data[:, :self.kept] = self._data[:, :self.kept]
+        self._data = data
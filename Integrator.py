@@ -7,16 +7,18 @@ This is from a previous project, I'm trying to reuse code
 '''
 
 
-def RK4(model: Callable[[float, ndarray], ndarray], state_prev: ndarray, t_now: float, t_step: float):
+def RK4(model: Callable[[float, ndarray], ndarray], state_prev: ndarray, t_now: float, t_step: float,
+        k_first: ndarray = None):
     '''
     Range-Kutta 4\nIntegra o estado `state_prev` pelo modelo `model`
     no passo `t_now` até o passo `t_now + t_step`
+
+    `state_prev` may also be a (9, N) ensemble, one member per column.
+    `k_first` is the model already evaluated at `state_prev`, if known
     '''
-    len = 2 + 1 + 2
-    state_prev = np.ravel(state_prev)
-    state_prev = np.reshape(state_prev, (len, 1))
+    state_prev = np.reshape(state_prev, (np.shape(state_prev)[0], -1))
 
-    k1: ndarray = model(t_now, state_prev)
+    k1: ndarray = model(t_now, state_prev) if k_first is None else k_first
     k2: ndarray = model(t_now+t_step/2., state_prev + (k1 * t_step/2.))
     k3: ndarray = model(t_now+t_step/2., state_prev + (k2 * t_step/2.))
     k4: ndarray = model(t_now+t_step, state_prev + k3 * t_step)
@@ -26,3 +28,61 @@ def RK4(model: Callable[[float, ndarray], ndarray], state_prev: ndarray, t_now:
     state_next:  ndarray = state_prev + delta_state
 
     return state_next
+
+
+def RK4Scalar(model: Callable[[float, list], tuple], state: list, t_now: float, t_step: float,
+              k_first: tuple = None) -> list:
+    '''
+    Range-Kutta 4 on plain floats: `state` is a list, updated in place (and
+    returned), and `model` returns the derivative as a tuple
+    '''
+    half = t_step/2.
+    k1 = model(t_now, state) if k_first is None else k_first
+    k2 = model(t_now+half, [y + k * half for y, k in zip(state, k1)])
+    k3 = model(t_now+half, [y + k * half for y, k in zip(state, k2)])
+    k4 = model(t_now+t_step, [y + k * t_step for y, k in zip(state, k3)])
+
+    sixth = t_step/6.
+    for i in range(len(state)):
+        state[i] += sixth * (k1[i] + 2*k2[i] + 2*k3[i] + k4[i])
+    return state
+
+
+# Dormand-Prince 5(4) coefficients
+_c = (0, 1/5, 3/10, 4/5, 8/9, 1, 1)
+_a = ((),
+      (1/5,),
+      (3/40, 9/40),
+      (44/45, -56/15, 32/9),
+      (19372/6561, -25360/2187, 64448/6561, -212/729),
+      (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+      (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84))
+# 5th order weights are the last row of `_a`, the error is 5th - 4th order
+_e = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+
+def RK45(model: Callable[[float, ndarray], ndarray], state_prev: ndarray, t_now: float, t_step: float,
+         rtol: float = 1e-6, atol: float = 1e-6, k_first: ndarray = None):
+    '''
+    Dormand-Prince 5(4)\nTries one step of `state_prev` by `model` from
+    `t_now` to `t_now + t_step`.
+
+    Returns the 5th order `state_next`, the model evaluated at `state_next`
+    (pass it back as `k_first` on the next step, it is the same as its first
+    stage) and the error estimate normalized by `rtol` and `atol`. The step
+    should only be accepted if the error is at most 1.
+    '''
+    state_prev = np.reshape(state_prev, (np.shape(state_prev)[0], -1))
+
+    k = [model(t_now, state_prev) if k_first is None else k_first]
+    for i in range(1, 6):
+        stage = state_prev + t_step * sum(a * k_j for a, k_j in zip(_a[i], k) if a)
+        k.append(model(t_now + _c[i] * t_step, stage))
+    state_next = state_prev + t_step * sum(a * k_j for a, k_j in zip(_a[6], k) if a)
+    k.append(model(t_now + t_step, state_next))
+
+    error = t_step * sum(e * k_j for e, k_j in zip(_e, k) if e)
+    scale = atol + rtol * np.maximum(np.abs(state_prev), np.abs(state_next))
+    error_norm = np.sqrt(np.mean((error / scale) ** 2))
+
+    return state_next, k[-1], error_norm
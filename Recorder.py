@@ -0,0 +1,169 @@
+import json
+import os
+import struct
+import numpy as np
+from numpy import ndarray
+from numpy.lib.recfunctions import structured_to_unstructured
+from Events import EventRecord
+from Trajectory import Trajectory
+
+'''
+Simulation results written to disk while the simulation runs
+'''
+
+
+class Recorder:
+    '''
+    Writes the `Trajectory` chunks of a simulation (see
+    `Simulator.SimulateChunks`) as they come, to `path`.npy with one float64
+    record per sample: a field for the time, each state column and each
+    channel, such as the observed ones. The events and the fields go to the
+    `path`.json sidecar.
+
+    The .npy file is only appended to. The number of records in its header
+    is rewritten once they are written, every `flush_every` chunks (with
+    `sync`, they are also forced to the disk), so a run that crashes leaves
+    a valid file with everything flushed until then. Being a standard .npy
+    file, it can be mapped without loading it:
+
+    >>> records = np.load('flight.npy', mmap_mode='r')
+    >>> records['altitude'], pandas.DataFrame(records)
+
+    The fields are the ones of the first chunk written.
+    '''
+
+    def __init__(self, path: str, flush_every: int = 1, sync: bool = False) -> None:
+        if flush_every < 1:
+            raise ValueError(f"flush_every must be at least 1, not {flush_every}")
+        self.path = _base(path)
+        self.flush_every = flush_every
+        self.sync = sync
+        self.fields: list[str] = []
+        self.events: list[EventRecord] = []
+        self.size = 0
+        self.chunks = 0
+        self._dtype = None
+        self._file = None
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # What was written is kept, but not marked complete, if the run failed
+        self.close(complete=exc_type is None)
+
+    def write(self, chunk: Trajectory) -> None:
+        '''Appends the samples and events of `chunk`'''
+        if self._file is None:
+            self._open(['time'] + chunk.columns + chunk.channels)
+        records = np.empty(len(chunk), dtype=self._dtype)
+        records['time'] = chunk.time
+        for name in self.fields[1:]:
+            records[name] = chunk[name]
+        self._file.write(records.tobytes())
+        self.size += len(chunk)
+        self.events.extend(chunk.events)
+        self.chunks += 1
+        if self.chunks % self.flush_every == 0:
+            self.flush()
+
+    def record(self, chunks):
+        '''Writes each of `chunks` and passes it on, for other consumers'''
+        for chunk in chunks:
+            self.write(chunk)
+            yield chunk
+
+    def flush(self, complete: bool = False) -> None:
+        '''Makes everything written so far part of the files'''
+        if self._file is None:
+            return
+        self._sync()
+        # The records are in the file before the header counts them
+        self._file.seek(0)
+        self._file.write(_header(self._dtype, self.size))
+        self._file.seek(0, os.SEEK_END)
+        self._sync()
+        self._save_info(complete)
+
+    def close(self, complete: bool = True) -> None:
+        '''Flushes and closes the files, marking the run `complete`'''
+        if self._file is None:
+            return
+        self.flush(complete)
+        self._file.close()
+        self._file = None
+
+    def _open(self, fields: list[str]) -> None:
+        self.fields = fields
+        self._dtype = np.dtype([(name, np.float64) for name in fields])
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path + '.npy', 'wb')
+        self._file.write(_header(self._dtype, 0))
+        self._save_info(complete=False)
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def _save_info(self, complete: bool) -> None:
+        info = {'fields': self.fields,
+                'samples': self.size,
+                'complete': complete,
+                'events': [{'name': event.name, 'time': event.time, 'state': np.ravel(event.state).tolist()}
+                           for event in self.events]}
+        # Written aside and renamed, so a crash can't leave a partial file
+        temporary = self.path + '.json.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(info, f, indent=1)
+        os.replace(temporary, self.path + '.json')
+
+
+def read(path: str) -> tuple[ndarray, dict]:
+    '''
+    The records written by a `Recorder` to `path`, mapped from the file and
+    not loaded, and the information of its sidecar, with the events as
+    `EventRecord`s
+    '''
+    path = _base(path)
+    with open(path + '.json') as f:
+        info = json.load(f)
+    info['events'] = [EventRecord(event['name'], event['time'], np.reshape(event['state'], (-1, 1)))
+                      for event in info['events']]
+    if info['samples'] == 0:
+        # An empty file can't be mapped
+        return np.load(path + '.npy'), info
+    return np.load(path + '.npy', mmap_mode='r'), info
+
+
+def export_csv(path: str, csv_path: str = None, block: int = 65536) -> str:
+    '''
+    Writes the records of `path` to `csv_path` (`path`.csv by default), with
+    a header line of the field names, `block` records at a time so that the
+    whole file is never loaded. The values are written in full precision.
+
+    Returns the path of the CSV file
+    '''
+    records, _ = read(path)
+    csv_path = csv_path or _base(path) + '.csv'
+    with open(csv_path, 'w') as f:
+        f.write(','.join(records.dtype.names) + '\n')
+        for start in range(0, len(records), block):
+            np.savetxt(f, structured_to_unstructured(records[start:start + block]), fmt='%.17g', delimiter=',')
+    return csv_path
+
+
+def _base(path: str) -> str:
+    return path[:-len('.npy')] if path.endswith('.npy') else path
+
+
+def _header(dtype: np.dtype, rows: int) -> bytes:
+    '''
+    .npy (version 1.0) header of `rows` records of `dtype`. Its length only
+    depends on `dtype`, so it can be rewritten in place as rows are added
+    '''
+    description = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+    # Room for any row count, and the data aligned to 64 bytes
+    reserved = len(description) - len(str(rows)) + 20
+    length = -(-(10 + reserved + 1) // 64) * 64 - 10
+    return np.lib.format.magic(1, 0) + struct.pack('<H', length) + description.ljust(length - 1).encode('latin1') + b'\n'
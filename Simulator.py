@@ -1,6 +1,9 @@
 from typing import Callable
 import numpy as np
-from Integrator import RK4
+from Integrator import RK4, RK4Scalar, RK45
+from Events import Event, EventRecord, hermite, locate
+from Trajectory import Trajectory, STATE_COLUMNS
+from Instrument import Prober
 from Local import *
 from numpy import ndarray
 
@@ -16,17 +19,419 @@ def s(progress: float):
     pass
 
 
-def Simulate(state: ndarray, model, time_start: float = 0, time_end: float = 30,  time_step: float = 1, status=s):
+def Simulate(state: ndarray, model, time_start: float = 0, time_end: float = 30,  time_step: float = 1, status=s,
+             method: str = 'rk4', rtol: float = 1e-6, atol: float = 1e-6, min_step: float = 1e-3, max_step: float = 60,
+             events: list[Event] = (), columns: tuple = STATE_COLUMNS, update=None, observer=None) -> Trajectory:
     '''
     Run simulation of `model` from `time_start` to `time_end`
+
+    `method` selects the integrator:
+     - 'rk4': fixed step of `time_step` seconds
+     - 'rk4_scalar': same, on plain floats: `model` takes the state as a
+       list and returns a tuple (see `Balloon.ScalarModel`)
+     - 'rk45': adaptive Dormand-Prince, starting from `time_step` and kept
+       between `min_step` and `max_step`, with the local error held under
+       `rtol` and `atol` (which can also be a (9, 1) array, one per state)
+
+    `events` are checked after every step and located inside it; a terminal
+    event ends the simulation at the time it happens.
+
+    `update(t, state)`, if given, is called once after every accepted step
+    and returns the state to carry on with (see `Balloon.Update`). This is
+    where anything that must not change during the model stages, such as
+    the flight phase or a controller, is changed.
+
+    `observer(t, state)`, if given, is called for every state stored (after
+    the update) and returns a dict of named values, such as derived
+    quantities of the model (see `Balloon.Observe`). They are attached to
+    the `Trajectory` as channels of the same names. Without an observer,
+    nothing at all is done for it.
+
+    Returns a `Trajectory` with the state after every step (named by
+    `columns`), the time of each of them and the `EventRecord`s that happened.
+    To get it piece by piece while the simulation runs, use `SimulateChunks`
     '''
+    # A single chunk, the whole trajectory
+    for view in SimulateChunks(state, model, time_start, time_end, time_step, status, method, rtol, atol,
+                               min_step, max_step, events, columns, update, observer, chunk_size=None):
+        return view
+    return Trajectory(columns)
+
+
+def SimulateChunks(state: ndarray, model, time_start: float = 0, time_end: float = 30,  time_step: float = 1, status=s,
+                   method: str = 'rk4', rtol: float = 1e-6, atol: float = 1e-6, min_step: float = 1e-3,
+                   max_step: float = 60, events: list[Event] = (), columns: tuple = STATE_COLUMNS, update=None,
+                   observer=None, chunk_size: int = 1000):
+    '''
+    Run simulation of `model` as `Simulate` does, yielding the trajectory
+    as it goes: a `Trajectory` of the next `chunk_size` samples (one more
+    if an event cut the last step), with their observed channels and the
+    events that happened during them, and finally one with what is left.
+    `chunk_size=None` yields the whole trajectory at once.
+
+    The simulation only moves on when the next chunk is asked for, and no
+    chunk is kept once yielded, so a consumer writing, plotting or
+    publishing them needs memory for one chunk only, however long the
+    flight. `Trajectory.concatenate` joins them back.
+    '''
+    if chunk_size is None:
+        chunk_size = np.inf
+    elif chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+
+    if method == 'rk45':
+        return _simulate_adaptive(state, model, time_start, time_end, time_step, status,
+                                  rtol, atol, min_step, max_step, events, columns, update, observer, chunk_size)
+    elif method == 'rk4_scalar':
+        return _simulate_scalar(state, model, time_start, time_end, time_step, status, events, columns, update,
+                                observer, chunk_size)
+    elif method == 'rk4':
+        return _simulate_fixed(state, model, time_start, time_end, time_step, status, events, columns, update,
+                               observer, chunk_size)
+    raise ValueError(f"Unknown integration method '{method}'")
+
+
+def _simulate_fixed(state: ndarray, model, time_start: float, time_end: float, time_step: float, status,
+                    events: list[Event], columns: tuple, update, observer, chunk_size):
     print(
         f"Simulating from {time_start}s to {time_end}s with dt of {time_step}s")
     time = np.arange(time_start, time_end, time_step, dtype=float)
 
-    view_state = []
+    # Each event may add one sample
+    capacity = int(min(len(time) + len(events), chunk_size + 1))
+    view, append = _chunk(columns, observer, capacity)
+    terminal = {event.name for event in events if event.terminal}
+    values = [event(time_start, state) for event in events]
+
+    def finish(t: float, state: ndarray, t_step: float):
+        k_first = model(t, state)
+        state_next = RK4(model, state, t, t_step, k_first)
+        return state_next, hermite(state, state_next, t_step, k_first)
+
+    for i in range(len(time)):
+        status(i/len(time))
+        k_first = model(time[i], state)
+        state_next = RK4(model, state, time[i], time_step, k_first)
+
+        # The step is finished from its events, keeping the time grid
+        values, _, state_next, stop = _step_events(events, terminal, values, view.events, append, time[i],
+                                                   time_step, state_next,
+                                                   hermite(state, state_next, time_step, k_first), finish)
+        if stop is not None:
+            break
+
+        state = state_next
+        if update is not None:
+            state = update(time[i] + time_step, state)
+        append(time[i] + time_step, state)
+        if len(view) >= chunk_size:
+            yield _finish(view, append)
+            view, append = _chunk(columns, observer, capacity)
+    if len(view) or view.events:
+        yield _finish(view, append)
+
+
+def _simulate_adaptive(state: ndarray, model, time_start: float, time_end: float, time_step: float, status,
+                       rtol: float, atol: float, min_step: float, max_step: float, events: list[Event],
+                       columns: tuple, update, observer, chunk_size):
+    print(
+        f"Simulating from {time_start}s to {time_end}s with adaptive dt (rtol={rtol}, atol={atol})")
+    capacity = int(min(4096, chunk_size + 1))
+    view, append = _chunk(columns, observer, capacity)
+    terminal = {event.name for event in events if event.terminal}
+    values = [event(time_start, state) for event in events]
+    t = time_start
+    dt = time_step
+    k_first = model(t, state)
+    while t < time_end:
+        status((t - time_start)/(time_end - time_start))
+        dt = min(dt, time_end - t)
+        state_next, k_last, error = RK45(model, state, t, dt, rtol, atol, k_first)
+
+        if error <= 1 or dt <= min_step:
+            values, t_stop, state_stop, stop = _step_events(events, terminal, values, view.events, append, t, dt,
+                                                            state_next, hermite(state, state_next, dt, k_first, k_last))
+            if stop is not None:
+                if stop.name in terminal:
+                    break
+                # Restart from the event, the model has changed
+                t = t_stop
+                state = state_stop
+                k_first = model(t, state)
+                continue
+
+            t += dt
+            state = state_next
+            k_first = k_last
+            if update is not None:
+                state = update(t, state_next.copy())
+                # FSAL only holds if the update left the state alone
+                if not np.array_equal(state, state_next):
+                    k_first = model(t, state)
+            append(t, state)
+            if len(view) >= chunk_size:
+                yield _finish(view, append)
+                view, append = _chunk(columns, observer, capacity)
+
+        # Standard step size control, growth limited to 5x and shrink to 1/5
+        factor = 5 if error == 0 else min(5, max(0.2, 0.9 * error ** (-1/5)))
+        dt = min(max(dt * factor, min_step), max_step)
+    if len(view) or view.events:
+        yield _finish(view, append)
+
+
+def _simulate_scalar(state: ndarray, model, time_start: float, time_end: float, time_step: float, status,
+                     events: list[Event], columns: tuple, update, observer, chunk_size):
+    print(
+        f"Simulating from {time_start}s to {time_end}s with dt of {time_step}s")
+    time = np.arange(time_start, time_end, time_step, dtype=float)
+
+    # Each event may add one sample
+    capacity = int(min(len(time) + len(events), chunk_size + 1))
+    view, append = _chunk(columns, observer, capacity)
+    # The state is one list updated in place, arrays are only made for events
+    state = np.ravel(state).tolist()
+    terminal = {event.name for event in events if event.terminal}
+    values = [event(time_start, _column(state)) for event in events]
+
+    def finish(t: float, state: ndarray, t_step: float):
+        state_next = np.ravel(state).tolist()
+        k_first = model(t, state_next)
+        RK4Scalar(model, state_next, t, t_step, k_first)
+        return _column(state_next), hermite(state, _column(state_next), t_step, _column(k_first))
+
+    for i in range(len(time)):
+        status(i/len(time))
+        if not events:
+            RK4Scalar(model, state, time[i], time_step)
+        else:
+            state_prev = _column(state)
+            k_first = model(time[i], state)
+            RK4Scalar(model, state, time[i], time_step, k_first)
+            state_next = _column(state)
+
+            # The step is finished from its events, keeping the time grid
+            values, _, state_end, stop = _step_events(events, terminal, values, view.events, append, time[i],
+                                                      time_step, state_next,
+                                                      hermite(state_prev, state_next, time_step, _column(k_first)),
+                                                      finish)
+            if stop is not None:
+                break
+            if state_end is not state_next:
+                state = np.ravel(state_end).tolist()
+
+        if update is not None:
+            state = np.ravel(update(time[i] + time_step, _column(state))).tolist()
+        append(time[i] + time_step, state)
+        if len(view) >= chunk_size:
+            yield _finish(view, append)
+            view, append = _chunk(columns, observer, capacity)
+    if len(view) or view.events:
+        yield _finish(view, append)
+
+
+def _column(values) -> ndarray:
+    return np.reshape(values, (len(values), 1))
+
+
+class _Observed:
+    '''
+    Appends the states to a `Trajectory`, recording what `observer(t, state)`
+    returns for each of them
+    '''
+
+    def __init__(self, view: Trajectory, observer, capacity: int) -> None:
+        self.view = view
+        self.observer = observer
+        self.capacity = capacity
+        self.probe = None
+
+    def __call__(self, t: float, state) -> None:
+        self.view.append(t, state)
+        values = self.observer(t, state)
+        if self.probe is None:
+            # The channels are the ones of the first observation
+            self.probe = Prober(tuple(values), decimation=1, capacity=self.capacity)
+        self.probe(**values)
+
+
+def _chunk(columns: tuple, observer, capacity: int):
+    '''
+    A new `Trajectory` and the function storing each state in it:
+    `view.append` itself without an observer
+    '''
+    view = Trajectory(columns, capacity=capacity)
+    return view, view.append if observer is None else _Observed(view, observer, capacity)
+
+
+def _finish(view: Trajectory, append) -> Trajectory:
+    '''Attaches the observed channels, if any, to `view`'''
+    if isinstance(append, _Observed) and append.probe is not None:
+        view.add_channels(append.probe.channels, append.probe.get())
+    return view
+
+
+def _step_events(events: list[Event], terminal: set, values: list[float], records: list[EventRecord], append,
+                 t: float, t_step: float, state_next: ndarray, interpolant, finish=None):
+    '''
+    Checks `events` over the step from `t` to `t + t_step`, which ends at
+    `state_next` (see `_check_events`), and stores the state at every event
+    that cuts the step with `append`.
+
+    Unless the event is `terminal`, `finish(t, state, t_step)` then steps
+    from it to the end of the step and returns the state there and its
+    interpolant, and that rest of the step is checked in turn, since more
+    events may happen in it. Without `finish`, the step ends at the event.
+
+    Returns the event values, the time and state the step ends at, and the
+    record of the event it ended at (None if it went to its end)
+    '''
+    t_end = t + t_step
+    while events:
+        values, stop, stop_state = _check_events(events, values, records, t, t_step, interpolant)
+        if stop is None:
+            break
+        append(stop.time, stop_state)
+        if stop.name in terminal or finish is None:
+            return values, stop.time, stop_state, stop
+        t, t_step = stop.time, t_end - stop.time
+        state_next, interpolant = finish(t, stop_state, t_step)
+    return values, t_end, state_next, None
+
+
+def _check_events(events: list[Event], values: list[float], records: list[EventRecord],
+                  t: float, t_step: float, interpolant):
+    '''
+    Checks `events` over the step from `t` to `t + t_step`, appending the ones
+    that happened to `records` in time order and running their actions.
+
+    Returns the event values, the record of the event where the step has
+    to be cut (a terminal event, or one with an action, since it changes the
+    model for the rest of the step) and the state to continue from, as
+    returned by its action. The values are the ones at that event, or at the
+    end of the step when it isn't cut.
+    '''
+    state_next = interpolant(1)
+    values_next = [event(t + t_step, state_next) for event in events]
+
+    happened = []
+    for event, value_prev, value_next in zip(events, values, values_next):
+        if event.crossed(value_prev, value_next):
+            event_time, event_state = locate(event, interpolant, t, t_step, value_prev, value_next)
+            happened.append((EventRecord(event.name, event_time, event_state), event))
+
+    for record, event in sorted(happened, key=lambda h: h[0].time):
+        records.append(record)
+        if event.terminal or event.action is not None:
+            state = record.state
+            if event.action is not None:
+                state = event.action(record.time, state)
+            # The event that stopped the step stays on the side it crossed to
+            values_stop = [values_next[i] if e is event else e(record.time, state)
+                           for i, e in enumerate(events)]
+            return values_stop, record, state
+    return values_next, None, None
+
+
+def SimulateEnsemble(state: ndarray, model, time_start: float = 0, time_end: float = 30,  time_step: float = 1, status=s,
+                     events: list[Event] = (), columns: tuple = STATE_COLUMNS, update=None,
+                     observer=None) -> list[Trajectory]:
+    '''
+    Run simulation of `model` for every member (column) of the (9, N) `state`
+    in lockstep, from `time_start` to `time_end`, with a fixed RK4 step.
+
+    `events`, `update` and `observer` are the ones of `Simulate`, called with
+    the states of all the members at once, so that the event functions and
+    the observer give one value per member. The events are then located
+    for each member on its own. A member stopped by a terminal event is
+    frozen at the event: it is still stepped with the others, but its state
+    is put back after every step. The run ends when all of them are stopped.
+
+    Returns the `Trajectory` of every member, as `Simulate` would give it
+    '''
+    print(
+        f"Simulating {state.shape[1]} members from {time_start}s to {time_end}s with dt of {time_step}s")
+    time = np.arange(time_start, time_end, time_step, dtype=float)
+    members = state.shape[1]
+
+    view_state = np.empty((len(time),) + state.shape)
+    observed = {}
+    # Samples of each member at its events, and the number of steps it made
+    records = [[] for _ in range(members)]
+    extra = [[] for _ in range(members)]
+    steps = np.full(members, len(time))
+    stopped = np.zeros(members, dtype=bool)
+    terminal = {event.name for event in events if event.terminal}
+    values = _member_values(events, time_start, state)
     for i in range(len(time)):
         status(i/len(time))
-        state = RK4(model, state, time[i], time_step)
-        view_state.append(state[:, 0])
-    return view_state, time
+        k_first = model(time[i], state) if events else None
+        state_next = RK4(model, state, time[i], time_step, k_first)
+
+        if events:
+            values_next = _member_values(events, time[i] + time_step, state_next)
+            crossed = ~stopped & np.any([event.crossings(value_prev, value_next) for event, value_prev, value_next
+                                         in zip(events, values, values_next)], axis=0)
+            for j in np.flatnonzero(crossed):
+                member_values, _, state_next[:, [j]], stop = _step_events(
+                    events, terminal, [value[j] for value in values], records[j],
+                    lambda t, state: extra[j].append((t, state)), time[i], time_step, state_next[:, [j]],
+                    hermite(state[:, [j]], state_next[:, [j]], time_step, k_first[:, [j]]),
+                    _member_finish(model, state_next, j))
+                if stop is not None:
+                    stopped[j] = True
+                    steps[j] = i
+                for value, member_value in zip(values_next, member_values):
+                    value[j] = member_value
+            values = values_next
+
+        frozen = state_next[:, stopped]
+        state = state_next
+        if update is not None:
+            state = update(time[i] + time_step, state)
+        state[:, stopped] = frozen
+        view_state[i] = state
+        if observer is not None:
+            for name, value in observer(time[i] + time_step, state).items():
+                if name not in observed:
+                    observed[name] = np.empty((len(time), members))
+                observed[name][i] = value
+        if stopped.all():
+            break
+
+    trajectories = []
+    for j in range(members):
+        # The event samples go first, to come before the end of their step
+        times = np.concatenate([[t for t, _ in extra[j]], time[:steps[j]] + time_step])
+        order = np.argsort(times, kind='stable')
+        samples = np.hstack([s for _, s in extra[j]] + [view_state[:steps[j], :, j].T])
+        trajectory = Trajectory.from_samples(times[order], samples[:, order], columns)
+        trajectory.events = records[j]
+        if observer is not None:
+            names = list(observed)
+            at_events = [observer(t, s) for t, s in extra[j]]
+            values = np.column_stack([np.concatenate([np.ravel([o[name] for o in at_events]),
+                                                      observed[name][:steps[j], j]]) for name in names])
+            trajectory.add_channels(names, values[order])
+        trajectories.append(trajectory)
+    return trajectories
+
+
+def _member_finish(model, ensemble: ndarray, j: int):
+    '''
+    `finish` of `_step_events` for the member `j` of `ensemble`: the rest of
+    the step is made with the whole ensemble, as the members may have
+    balloon parameters of their own
+    '''
+    def finish(t: float, state: ndarray, t_step: float):
+        restart = ensemble.copy()
+        restart[:, [j]] = state
+        k_first = model(t, restart)
+        state_next = RK4(model, restart, t, t_step, k_first)[:, [j]]
+        return state_next, hermite(state, state_next, t_step, k_first[:, [j]])
+    return finish
+
+
+def _member_values(events: list[Event], t: float, state: ndarray) -> list[ndarray]:
+    '''The value of every event for each member of `state`, copied, not views of it'''
+    return [np.array(np.ravel(event(t, state)), dtype=float) for event in events]
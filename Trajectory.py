@@ -0,0 +1,137 @@
+import numpy as np
+from numpy import ndarray
+from Events import EventRecord
+
+'''
+Simulation results, stored column by column
+'''
+
+# Names of the rows of the simulation state
+STATE_COLUMNS = ('altitude', 'velocity', 'gas_mass', 'lat', 'lng', 'phase', 'valve', 'valve_error', 'valve_sum')
+
+
+class Trajectory:
+    '''
+    Time history of a simulation.
+
+    The states are kept in a preallocated float64 buffer with one contiguous
+    row per column (altitude, velocity, ...), which grows in chunks if more
+    than `capacity` samples are appended. Columns are read by name and are
+    views of the buffer, no copy is made:
+
+    >>> trajectory['altitude'], trajectory.time
+
+    Extra channels, such as the observed quantities, can be attached with
+    `add_channels`, or with `add_derived` to be computed from the finished
+    trajectory the first time one of them is read.
+    '''
+
+    def __init__(self, columns: tuple = STATE_COLUMNS, capacity: int = 4096) -> None:
+        self.columns = list(columns)
+        self.size = 0
+        self.events: list[EventRecord] = []
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._data = np.empty((len(self.columns), max(capacity, 1)), dtype=np.float64)
+        self._time = np.empty(max(capacity, 1), dtype=np.float64)
+        self._channels: dict[str, ndarray] = {}
+        # Channels not computed yet, and the function giving them
+        self._derived: dict[str, object] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index or name in self._channels or name in self._derived
+
+    def __getitem__(self, name: str) -> ndarray:
+        if name in self._index:
+            return self._data[self._index[name], :self.size]
+        if name in self._derived:
+            self._derive(self._derived[name])
+        return self._channels[name]
+
+    @property
+    def time(self) -> ndarray:
+        return self._time[:self.size]
+
+    @property
+    def state(self) -> ndarray:
+        '''(columns, samples) view of the whole state history'''
+        return self._data[:, :self.size]
+
+    @property
+    def channels(self) -> list[str]:
+        '''Names of the extra channels, attached or derived'''
+        return list(self._channels) + list(self._derived)
+
+    def append(self, t: float, state: ndarray) -> None:
+        '''Stores `state` (one value per column) at time `t`'''
+        if self.size == self._time.shape[0]:
+            self._grow()
+        self._data[:, self.size] = np.ravel(state)
+        self._time[self.size] = t
+        self.size += 1
+
+    def add_channels(self, names: list[str], values: ndarray) -> None:
+        '''
+        Attaches extra channels, `values` has one column per name and one row
+        per sample
+        '''
+        values = np.asarray(values, dtype=np.float64).reshape(len(self), len(names))
+        for i, name in enumerate(names):
+            self._channels[name] = values[:, i]
+
+    def add_derived(self, names: list[str], function) -> None:
+        '''
+        Attaches channels computed only when one of them is first read:
+        `function(trajectory)` returns a dict with an array of every sample
+        for each of `names`, all made in the same call
+        '''
+        for name in names:
+            self._derived[name] = function
+
+    def _derive(self, function) -> None:
+        names = [name for name, f in self._derived.items() if f is function]
+        values = function(self)
+        for name in names:
+            self._channels[name] = np.asarray(values[name], dtype=np.float64).reshape(len(self))
+            del self._derived[name]
+
+    @classmethod
+    def from_samples(cls, time: ndarray, state: ndarray, columns: tuple = STATE_COLUMNS) -> 'Trajectory':
+        '''A `Trajectory` holding (a copy of) the (columns, samples) `state` at `time`'''
+        trajectory = cls(columns, capacity=len(time))
+        trajectory.size = len(time)
+        trajectory._data[:, :trajectory.size] = state
+        trajectory._time[:trajectory.size] = time
+        return trajectory
+
+    @classmethod
+    def concatenate(cls, chunks: list['Trajectory']) -> 'Trajectory':
+        '''
+        One `Trajectory` with the samples and events of `chunks` in order, such
+        as the ones of `Simulator.SimulateChunks`. The channels attached to all
+        of them are joined too, the derived ones not computed yet are not
+        '''
+        chunks = list(chunks)
+        if not chunks:
+            return cls()
+        size = sum(len(chunk) for chunk in chunks)
+        joined = cls(chunks[0].columns, capacity=size)
+        joined.size = size
+        np.concatenate([chunk.state for chunk in chunks], axis=1, out=joined._data[:, :joined.size])
+        np.concatenate([chunk.time for chunk in chunks], out=joined._time[:joined.size])
+        for chunk in chunks:
+            joined.events.extend(chunk.events)
+        for name in chunks[0]._channels:
+            if all(name in chunk._channels for chunk in chunks):
+                joined._channels[name] = np.concatenate([chunk._channels[name] for chunk in chunks])
+        return joined
+
+    def _grow(self) -> None:
+        capacity = 2 * self._time.shape[0]
+        data = np.empty((len(self.columns), capacity), dtype=np.float64)
+        data[:, :self.size] = self._data[:, :self.size]
+        time = np.empty(capacity, dtype=np.float64)
+        time[:self.size] = self._time[:self.size]
+        self._data, self._time = data, time
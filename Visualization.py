@@ -1,24 +1,26 @@
 from matplotlib import pyplot as plt
 import numpy as np
 from Utils import celcius
+from Trajectory import Trajectory
 import plotly.express as px
 
-def Viz(data, time) -> None:
-    altitudes = data[:, 0] * 1e-3
-    speed = data[:, 1]
-    volume = data[:, 2]
-    lats = data[:, 3]
-    lngs = data[:, 4]
-    volumes = data[:, 5]
-    buoyancy = data[:, 6]
-    drag = data[:, 7]
-    acceleration = data[:, 8]
-    weights = data[:, 9]
-    temperature = data[:, 10]
-    pressure = data[:, 11]
-    density = data[:, 12]
-
-    time_step = time[1] - time[0]
+def Viz(trajectory: Trajectory) -> None:
+    time = trajectory.time
+    altitudes = trajectory['altitude'] * 1e-3
+    speed = trajectory['velocity']
+    volume = trajectory['gas_mass']
+    lats = trajectory['lat']
+    lngs = trajectory['lng']
+    volumes = trajectory['volume']
+    buoyancy = trajectory['buoyancy']
+    drag = trajectory['drag']
+    acceleration = trajectory['acceleration']
+    weights = trajectory['weight']
+    temperature = trajectory['temperature']
+    pressure = trajectory['pressure']
+    density = trajectory['density']
+    events = trajectory.events
+
     minutes = time / 60
 
     def find_burst(x: list[float], y: list[float]):
@@ -31,7 +33,13 @@ def Viz(data, time) -> None:
             i += 1
         return (x[i], y[i], i)
 
-    burst_time, burst_altitude, i = find_burst(minutes, altitudes)
+    burst = [e for e in events if e.name == 'burst']
+    if burst:
+        burst_time = burst[0].time / 60
+        burst_altitude = burst[0].state[0][0] * 1e-3
+        i = int(np.searchsorted(minutes, burst_time))
+    else:
+        burst_time, burst_altitude, i = find_burst(minutes, altitudes)
     print(f"Burst: {burst_time:.2f}min, {burst_altitude:.2f}km")
 
     fig = plt.figure(figsize=(14, 8))
@@ -45,7 +53,7 @@ def Viz(data, time) -> None:
         linear_burst_time = (burst_altitude - coefs[1]) / coefs[0]
         print(
             f"Linear Approx. Burst: {linear_burst_time:.2f}min, {line(linear_burst_time):.2f}km")
-        i = int(linear_burst_time / time_step * 60)
+        i = int(np.searchsorted(minutes, linear_burst_time))
         plt.plot(minutes, altitudes, linewidth=2,
                  color="black", label='Altitude ($h$)')
         plt.plot(minutes[:i], line(minutes[:i]), color='red')
@@ -0,0 +1,51 @@
+'''
+Atmosphere evaluation throughput, on floats and on arrays:
+ - `Air.temperature`, `Air.pressure` and `Air.density` called one after the
+   other
+ - `Air.state`, which returns the three in one pass
+ - `Air.TabulatedAtmosphere.state`, the lookup table version, whose error
+   against `Air.state` is printed first (tests/test_atmosphere.py holds it
+   to its tolerance)
+
+Run from the repository root:
+  $ python3 -m benchmarks.atmosphere
+'''
+import time as t
+import numpy as np
+import Air
+
+points = 1_000_000
+calls = 100_000
+
+
+def separate(altitude):
+    return Air.temperature(altitude), Air.pressure(altitude), Air.density(altitude)
+
+
+def rate(function, altitudes) -> float:
+    '''Points per second of `function` over `altitudes`, one call per item'''
+    start = t.perf_counter()
+    for altitude in altitudes:
+        function(altitude)
+    return len(altitudes) / (t.perf_counter() - start)
+
+
+def main():
+    table = Air.TabulatedAtmosphere()
+    altitudes = np.random.default_rng(0).uniform(0, 35e3, points)
+    # The layer limits, where a table could mix two layers
+    altitudes[:4] = [11e3, 25e3, np.nextafter(11e3, 0), np.nextafter(25e3, 0)]
+
+    error = max(np.max(np.abs(tabulated / exact - 1))
+                for tabulated, exact in zip(table.state(altitudes), Air.state(altitudes)))
+    print(f"table step {table.step:g} m: max relative error {error:.1e}")
+
+    functions = {'separate': separate, 'Air.state': Air.state, 'tabulated': table.state}
+    for name, inputs, size in (('float', altitudes[:calls].tolist(), 1), ('array', [altitudes], points)):
+        rates = {f: rate(function, inputs) * size for f, function in functions.items()}
+        print(f"{name}: " + ", ".join(f"{f} {r:10.0f} points/s ({r / rates['separate']:.1f}x)"
+                                      for f, r in rates.items()))
+
+
+if __name__ == '__main__':
+    main()
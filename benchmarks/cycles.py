@@ -0,0 +1,85 @@
+'''
+Time to find the newest available GFS cycle for the default scenario, when
+the latest cycles are not on the server yet, from a local stand-in of the
+NOAA DODS server (see `benchmarks.download`):
+ - one at a time: a data request per cycle, going back until one answers,
+   as it used to be
+ - concurrent: `GFS_Handler._availableCycle`, probing several cycles at once
+   with single point requests
+ - indexed: the same again with the cycle index left by the first run, and
+   once the missing cycles have expired from it
+ - cached: once the forecast of the cycle found is in the cache, with the
+   missing cycles expired: the cached cycle is used without any request
+
+Run from the repository root:
+  $ python3 -m benchmarks.cycles
+'''
+import tempfile
+import threading
+import time as t
+from datetime import timedelta
+from thirdparty.GFS import GFS_Handler
+from benchmarks.download import StandIn, start_date, initial_loc
+
+latency = 0.2  # s, per request
+# Cycles not published yet, newest first
+missing = 3
+
+
+def one_at_a_time(handler: GFS_Handler):
+    '''The newest available cycle, probed in turn with a data request'''
+    for pastCycle in range(25):
+        cycle = start_date - timedelta(hours=pastCycle * 6)
+        requestTime = handler._requestTime(start_date, cycle)
+        if handler._NOAA_request('tmpprs', cycle, [requestTime[0], requestTime[0] + 1]):
+            return cycle, requestTime
+
+
+def find(server: StandIn, function, handler: GFS_Handler):
+    server.requests = 0
+    start = t.perf_counter()
+    found = function(handler)
+    return found, t.perf_counter() - start, server.requests
+
+
+def main():
+    server = StandIn(GFS_Handler(*initial_loc, start_date, HD=True))
+    server.latency = latency
+    server.missing = {(start_date - timedelta(hours=6 * i)).strftime('%Y%m%d%H') for i in range(missing)}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def available(handler):
+        return handler._availableCycle(start_date, start_date)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def handler():
+            return GFS_Handler(*initial_loc, start_date, HD=True, server_url=server.url, cache_dir=cache_dir)
+
+        serial = find(server, one_at_a_time, handler())
+        concurrent = find(server, available, handler())
+        indexed = find(server, available, handler())
+        expired = handler()
+        expired.cycleIndex.missingTTL = 0
+        expired = find(server, available, expired)
+        handler().downloadForecast()
+        cached = handler()
+        cached.cycleIndex.missingTTL = 0
+        cached = find(server, available, cached)
+    server.shutdown()
+
+    expected = start_date - timedelta(hours=6 * missing)
+    for found, _, _ in (serial, concurrent, indexed, expired, cached):
+        assert found[0] == expected
+    assert indexed[2] == 0
+    assert expired[2] == missing
+    assert cached[2] == 0
+
+    print(f"{missing} missing cycles, {latency * 1e3:.0f} ms latency each request")
+    for name, (_, seconds, requests) in (('one at a time', serial), ('concurrent', concurrent),
+                                         ('indexed', indexed), ('missing expired', expired),
+                                         ('cached', cached)):
+        print(f"{name + ':':16s} {seconds * 1e3:7.1f} ms, {requests} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+'''
+Derived quantities of the default flight (volume, forces, atmosphere)
+computed after the simulation from the whole trajectory at once
+(`Balloon.Derive`, attached with `Trajectory.add_derived`), compared with
+recording them at every step with the `observer` of `Simulate`.
+
+Run from the repository root:
+  $ python3 -m benchmarks.derived
+'''
+import time as t
+import numpy as np
+from Balloon import Balloon
+from Simulator import Simulate
+from benchmarks.scenario import make_balloon
+
+tfinal = 3 * 60 * 60
+time_step = .5
+tolerance = 1e-9  # relative
+
+
+def run(observe: bool):
+    balloon = make_balloon()
+    start = t.perf_counter()
+    result = Simulate(balloon.initial_state(), balloon.ScalarModel, time_end=tfinal, time_step=time_step,
+                      method='rk4_scalar', events=balloon.events(), update=balloon.Update,
+                      observer=balloon.Observe if observe else None)
+    return balloon, result, t.perf_counter() - start
+
+
+def main():
+    _, observed, observed_time = run(observe=True)
+    balloon, derived, plain_time = run(observe=False)
+    assert np.array_equal(observed.state, derived.state)
+
+    calls = [0]
+
+    def derive(trajectory):
+        calls[0] += 1
+        return balloon.Derive(trajectory)
+    derived.add_derived(Balloon.derived_channels, derive)
+    assert calls[0] == 0, 'computed before being read'
+
+    start = t.perf_counter()
+    derived['volume']
+    derive_time = t.perf_counter() - start
+    for name in Balloon.derived_channels:
+        difference = np.max(np.abs(derived[name] - observed[name]) / np.maximum(np.abs(observed[name]), 1e-12))
+        assert difference < tolerance, (name, difference)
+    assert calls[0] == 1
+
+    print(f"{len(derived)} samples, {len(Balloon.derived_channels)} channels, "
+          f"agreement within {tolerance:.0e}")
+    print(f"observer:       {observed_time:6.2f} s")
+    print(f"derived after:  {plain_time:6.2f} s + {derive_time * 1e3:.1f} ms "
+          f"({derive_time / len(derived) * 1e9:.0f} ns/sample)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+'''
+Download time of an HD forecast (with its high altitude SD part) of the
+default scenario from a local stand-in of the NOAA DODS server, which serves
+the synthetic responses with a made-up network latency:
+ - serial: every url fetched in turn with `urlopen`, as it used to be
+ - batch: all the urls fetched at once by `thirdparty.download.Downloader`
+ - forecast: the whole `GFS_Handler.downloadForecast`, parsing included
+The stand-in then fails some of the requests, to check that they are
+retried and the forecast comes out the same.
+
+Run from the repository root:
+  $ python3 -m benchmarks.download
+'''
+import re
+import threading
+import time as t
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+import numpy
+from thirdparty.GFS import GFS_Handler
+from benchmarks.synthetic import dods_response
+
+start_date = datetime(2023, 3, 1, 12)
+initial_loc = (-21.9, -47.0)
+latency = 0.05  # s, per request
+
+request_pattern = re.compile(r'gfs_\w+_(\d+)z\.ascii\?(\w+)' + r'\[(\d+):(\d+)\]' * 4)
+# What the GrADS server answers for a cycle it doesn't have (yet)
+missing_response = b'<html><body>GrADS Data Server - error: not an available dataset</body></html>'
+
+
+class StandIn(ThreadingHTTPServer):
+    '''The NOAA DODS server, answering with the responses of `handler`'''
+    daemon_threads = True
+
+    def __init__(self, handler: GFS_Handler):
+        super().__init__(('127.0.0.1', 0), Respond)
+        self.handler = handler
+        self.responses = {}
+        self.lock = threading.Lock()
+        # Every failEvery-th request gets a 503, if set
+        self.failEvery = None
+        # Cycles (as YYYYMMDDHH) the server doesn't have
+        self.missing = set()
+        # Status always answered to a path, instead of its response
+        self.statuses = {}
+        self.latency = latency
+        self.reset()
+
+    def reset(self) -> None:
+        '''Clears the request, connection and concurrency counts'''
+        self.requests = 0
+        self.connections = 0
+        # Requests being answered, and the most there were at once
+        self.active = 0
+        self.peak = 0
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%d/' % self.server_address[1]
+
+    def response(self, path: str) -> bytes:
+        path = urllib.parse.unquote(path)
+        hour, requestVar, *window = request_pattern.search(path).groups()
+        if re.search(r'gfs(\d{8})/', path).group(1) + hour in self.missing:
+            return missing_response
+        if path not in self.responses:
+            handler = self.handler if '0p25' in path else self.handler._highAltitudeGFS
+            time, altitude, latitude, longitude = (window[i:i + 2] for i in range(0, 8, 2))
+            self.responses[path] = dods_response(handler, requestVar, time, longitude,
+                                                 altitude, latitude).encode()
+        return self.responses[path]
+
+
+class Respond(BaseHTTPRequestHandler):
+    # Keep-alive
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            fail = server.failEvery and server.requests % server.failEvery == 0
+        try:
+            t.sleep(server.latency)
+            status = server.statuses.get(self.path, 503 if fail else 200)
+            if status != 200:
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.answer(server.response(self.path))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def answer(self, body: bytes):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def forecast_urls(handler: GFS_Handler) -> list:
+    '''The urls of the HD and high altitude SD forecasts of the first cycle'''
+    requestTime = [0, 3]
+    cycle = start_date
+    return [h._get_NOAA_REST_url(var, requestLongitude, cycle, requestTime)
+            for h in (handler, handler._highAltitudeGFS)
+            for var in h.weatherParameters
+            for requestLongitude in h.requestLongitudes]
+
+
+def download(server: StandIn):
+    handler = GFS_Handler(*initial_loc, start_date, HD=True, server_url=server.url)
+    handler.downloader.backoff = 0.01
+    start = t.perf_counter()
+    handler.downloadForecast()
+    return handler, t.perf_counter() - start
+
+
+def assert_same(a: GFS_Handler, b: GFS_Handler):
+    for h, g in ((a, b), (a._highAltitudeGFS, b._highAltitudeGFS)):
+        for data in ('altitudeData', 'temperatureData', 'windUData', 'windVData'):
+            assert numpy.array_equal(getattr(h, data), getattr(g, data))
+        assert h.windsMap.mappingCoordinates == g.windsMap.mappingCoordinates
+
+
+def main():
+    server = StandIn(GFS_Handler(*initial_loc, start_date, HD=True))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = forecast_urls(GFS_Handler(*initial_loc, start_date, HD=True, server_url=server.url))
+    # Generate the responses beforehand, they aren't part of the timing
+    for url in urls:
+        server.response(url[len(server.url) - 1:])
+
+    start = t.perf_counter()
+    serial = {url: urlopen(url).read().decode('utf-8') for url in urls}
+    serial_time = t.perf_counter() - start
+
+    downloader = GFS_Handler(*initial_loc, start_date, HD=True, server_url=server.url).downloader
+    start = t.perf_counter()
+    batch = downloader.fetch(urls)
+    batch_time = t.perf_counter() - start
+    assert batch == serial
+
+    server.reset()
+    handler, forecast_time = download(server)
+    requests, connections = server.requests, server.connections
+    # The HD data is the one in the serial responses
+    for data, var in (('temperatureData', 'tmpprs'), ('windUData', 'ugrdprs')):
+        matrix, _ = handler._generate_matrix([serial[url] for url in urls if '?%s[' % var in url and '0p25' in url])
+        if var == 'tmpprs':
+            matrix -= 273.15
+        assert numpy.array_equal(getattr(handler, data), matrix)
+
+    server.failEvery = 3
+    flaky, flaky_time = download(server)
+    assert_same(handler, flaky)
+    server.shutdown()
+
+    size = sum(len(text) for text in serial.values()) / 1e6
+    print(f"{len(urls)} requests, {size:.1f} MB, {latency * 1e3:.0f} ms latency each")
+    print(f"serial:   {serial_time * 1e3:7.1f} ms")
+    print(f"batch:    {batch_time * 1e3:7.1f} ms ({serial_time / batch_time:.1f}x)")
+    print(f"forecast: {forecast_time * 1e3:7.1f} ms ({requests} requests over {connections} connections)")
+    print(f"forecast, every 3rd request failing: {flaky_time * 1e3:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Ensemble throughput: steps x members per second of `SimulateEnsemble`
+compared with running the scalar `Simulate` once per member, both with the
+burst and touchdown events. Each rate is the best of `repeat` runs.
+
+Run from the repository root:
+  $ python3 -m benchmarks.ensemble
+'''
+import time as t
+from Simulator import Simulate, SimulateEnsemble
+from benchmarks.scenario import make_balloon
+
+steps = 100
+time_step = .5
+repeat = 5
+
+
+def best(run) -> float:
+    '''Shortest time (s) of `repeat` calls of `run`'''
+    times = []
+    for _ in range(repeat):
+        start = t.perf_counter()
+        run()
+        times.append(t.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    balloon = make_balloon()
+
+    scalar = steps / best(lambda: Simulate(balloon.initial_state(), balloon.Model, time_end=steps * time_step,
+                                           time_step=time_step, events=balloon.events(), update=balloon.Update))
+    print(f"scalar Simulate: {scalar:.0f} steps x members/s")
+
+    for members in (1, 10, 100):
+        elapsed = best(lambda: SimulateEnsemble(balloon.ensemble(members), balloon.EnsembleModel,
+                                                time_end=steps * time_step, time_step=time_step,
+                                                events=balloon.events(), update=balloon.Update))
+        rate = steps * members / elapsed
+        print(f"ensemble N={members:4d}: {rate:.0f} steps x members/s "
+              f"({rate / scalar:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
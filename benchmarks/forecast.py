@@ -0,0 +1,58 @@
+'''
+Forecast loading time of `GFS_Handler.downloadForecast` for the default
+scenario, on synthetic NOAA responses (no network, so the cold start here is
+only the parsing; a real one adds tens of seconds of downloads):
+ - cold: responses parsed with `_generate_matrix` and stored in the cache
+ - warm: the same cycle loaded back from the cache
+ - bundle: the processed forecast opened with `GFS_Handler.fromBinary`
+
+Run from the repository root:
+  $ python3 -m benchmarks.forecast
+'''
+import os
+import tempfile
+import time as t
+from datetime import datetime
+import numpy
+from thirdparty.GFS import GFS_Handler
+from benchmarks.synthetic import offline
+
+start_date = datetime(2023, 3, 1, 12)
+initial_loc = (-21.9, -47.0)
+
+
+def load(cache_dir: str, responses: dict):
+    handler = offline(GFS_Handler(*initial_loc, start_date, HD=False, cache_dir=cache_dir), responses)
+    start = t.perf_counter()
+    handler.downloadForecast()
+    return handler, t.perf_counter() - start
+
+
+def main():
+    # Generate the responses beforehand, they aren't part of the timing
+    responses = {}
+    load(None, responses)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold, cold_time = load(cache_dir, responses)
+        warm, warm_time = load(cache_dir, responses)
+
+        bundle_dir = os.path.join(cache_dir, 'bundle')
+        cold.saveBinary(bundle_dir)
+        start = t.perf_counter()
+        bundle = GFS_Handler.fromBinary(bundle_dir)
+        bundle_time = t.perf_counter() - start
+        for data in ('altitudeData', 'temperatureData', 'windUData', 'windVData'):
+            assert numpy.array_equal(getattr(cold, data), getattr(bundle, data))
+
+    for data in ('altitudeData', 'temperatureData', 'windUData', 'windVData'):
+        assert numpy.array_equal(getattr(cold, data), getattr(warm, data))
+    assert cold.windsMap.mappingCoordinates == warm.windsMap.mappingCoordinates
+
+    print(f"grid: {cold.altitudeData.shape} (lat, lon, pressure, time)")
+    print(f"cold (parse): {cold_time * 1e3:8.1f} ms")
+    print(f"warm (cache): {warm_time * 1e3:8.1f} ms ({cold_time / warm_time:.0f}x)")
+    print(f"bundle:       {bundle_time * 1e3:8.1f} ms ({cold_time / bundle_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+'''
+Fixed step RK4 against adaptive RK45 on the default scenario: number of
+`Balloon.Model` calls, run time and landing point error with respect to a
+fine step RK4 reference.
+
+RK45 makes about 4.4x fewer calls than RK4 at dt=0.5, and about 2x fewer than
+RK4 at dt=1, whatever the tolerance. Both are held back by stability, not
+accuracy: the velocity relaxes to its terminal value at a rate of 0.4 to
+1.5 1/s, and explicit methods diverge above a few seconds of step (RK4 does
+at dt=2 here). The median RK45 step is about 3.8s on the ascent and 1.8s on
+the parachute, far below max_step, so a larger max_step for the descent
+changes nothing. Tighter or looser tolerances, the per row tolerances of
+`Balloon.STATE_ATOL` and PI step control all end within a few percent of these
+calls (looser ones make more, from rejected steps).
+
+Run from the repository root:
+  $ python3 -m benchmarks.integrators
+'''
+import time as t
+import numpy as np
+from Balloon import ASCENT, BURST, STATE_ATOL
+from Simulator import Simulate
+from benchmarks.scenario import make_balloon
+from thirdparty.global_tools import haversine
+
+tfinal = 3 * 60 * 60
+reference_step = .1
+
+
+def run(**options):
+    balloon = make_balloon()
+    calls = [0]
+
+    def model(time, state):
+        calls[0] += 1
+        return balloon.Model(time, state)
+
+    state = balloon.initial_state()
+    start = t.perf_counter()
+    result = Simulate(state, model, time_start=0, time_end=tfinal,
+                      events=balloon.events(), update=balloon.Update, **options)
+    elapsed = t.perf_counter() - start
+    return result, calls[0], elapsed
+
+
+def main():
+    reference, _, _ = run(time_step=reference_step)
+    landing = reference['lat'][-1], reference['lng'][-1]
+
+    cases = {'rk4 dt=0.5': dict(time_step=.5),
+             'rk4 dt=1': dict(time_step=1),
+             'rk45 rtol=1e-6': dict(time_step=.5, method='rk45', rtol=1e-6),
+             'rk45 rtol=1e-8': dict(time_step=.5, method='rk45', rtol=1e-8),
+             'rk45 atol rows': dict(time_step=.5, method='rk45', rtol=1e-6, atol=STATE_ATOL)}
+    baseline = None
+    for name, options in cases.items():
+        result, calls, elapsed = run(**options)
+        baseline = baseline or calls
+        error = haversine(*landing, result['lat'][-1], result['lng'][-1]) * 1e3
+        # Median step of each phase: far below max_step (60s) on the parachute
+        steps, phase = np.diff(result.time), result['phase'][1:]
+        print(f"{name:16s} {calls:8d} model calls ({baseline / calls:.1f}x fewer) {elapsed:7.2f}s "
+              f"landing error {error:8.2f}m, median step {np.median(steps[phase == ASCENT]):.2f}s ascent "
+              f"{np.median(steps[phase == BURST]):.2f}s descent")
+
+
+if __name__ == '__main__':
+    main()
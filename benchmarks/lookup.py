@@ -0,0 +1,66 @@
+'''
+Calls per second of `Linear4DInterpolator` with its `AxisLocator`s (last
+cell cache, index arithmetic on uniform axes, binary search on pressure)
+compared with finding every cell with `numpy.digitize`, as it used to. The
+points follow a smooth trajectory, as in a simulation, or are spread at
+random over the grid. Both lookups are checked to give the same results.
+
+Run from the repository root:
+  $ python3 -m benchmarks.lookup
+'''
+import time as t
+from datetime import datetime
+import numpy
+from thirdparty.interpolate import Linear4DInterpolator
+from benchmarks.synthetic import synthetic_handler
+
+calls = 20000
+
+
+class Digitize:
+    '''Cell lookup by numpy.digitize, with the AxisLocator interface'''
+    monotonic = True
+
+    def __init__(self, values):
+        self.values = values
+
+    def __call__(self, x):
+        i = numpy.digitize([x], self.values)[0]
+        return i - 1 if i == len(self.values) else i
+
+
+def rate(function, points) -> float:
+    start = t.perf_counter()
+    for point in points:
+        function(*point)
+    return len(points) / (t.perf_counter() - start)
+
+
+def main():
+    start_date = datetime(2023, 3, 1, 12)
+    handler = synthetic_handler(-21.9, -47.0, start_date)
+    dmap = handler.windsMap.mappingCoordinates
+    time = handler.getGFStime(start_date)
+    rng = numpy.random.default_rng(0)
+
+    steps = numpy.arange(calls)
+    trajectory = list(zip((-21.9 + 1e-5 * steps).tolist(), (-47.0 + 2e-5 * steps).tolist(),
+                          (1000 - 0.04 * steps).tolist(), (time + 1e-5 * steps).tolist()))
+    spread = list(zip(rng.uniform(-25, -19, calls).tolist(), rng.uniform(-53, -41, calls).tolist(),
+                      rng.uniform(1, 1000, calls).tolist(), (time + rng.uniform(0, 0.375, calls)).tolist()))
+
+    located = Linear4DInterpolator(handler.windUData, dmap)
+    digitized = Linear4DInterpolator(handler.windUData, dmap)
+    digitized._locators = [Digitize(dmap[axis]) for axis in range(4)]
+
+    for name, points in (('trajectory', trajectory), ('spread', spread)):
+        assert all(located(*point) == digitized(*point) for point in points)
+        before = rate(digitized, points)
+        after = rate(located, points)
+        print(f"{name}:")
+        print(f"  numpy.digitize: {before:8.0f} calls/s")
+        print(f"  AxisLocator:    {after:8.0f} calls/s ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+'''
+Cost of one `Balloon.ScalarModel` call, with every derived quantity computed
+once per call (`Evaluation`), compared with the force methods the model used
+to call one by one, kept here as the baseline.
+
+The balloon physics (acceleration and gas density) is timed on its own,
+then the whole model. The baseline keeps the location rates as they were,
+with the GFS time found from a datetime at every call, where
+`Balloon.delta_loc` adds the simulation time to the GFS time of the launch.
+The wind is held constant so the forecast isn't timed.
+
+The model ends about 2 to 2.5x cheaper, short of 3x: what is left is one
+pass of the atmosphere and of the forces, about half of it the Python calls
+and attribute stores themselves, which no further sharing removes.
+
+Run from the repository root:
+  $ python3 -m benchmarks.model
+'''
+import time as t
+from datetime import timedelta
+from math import atan, cos, pi, radians, tan
+import numpy as np
+from Balloon import ASCENT, BURST, LANDED, Evaluation
+from Universe import radius_sphere, molar_mass_he, g, R
+from benchmarks.scenario import make_balloon
+
+calls = 20000
+repeat = 7
+
+
+class PerMethod:
+    '''The force methods of `Balloon` before `Evaluation`, each evaluating what it needs'''
+
+    def __init__(self, balloon) -> None:
+        self.balloon = balloon
+        self.air = balloon.air
+
+    def volume(self, altitude: float, m_gas: float, burst: bool = False) -> float:
+        if burst:
+            return 0
+        return m_gas * R * self.air.temperature(altitude) / self.air.pressure(altitude) / molar_mass_he
+
+    def drag(self, altitude: float, velocity: float, m_gas: float, burst: bool = False) -> float:
+        if burst:
+            drag_coeff = self.balloon.parachute_Dcoeff
+            area = np.pi * self.balloon.parachute_r ** 2
+        else:
+            drag_coeff = self.balloon.drag_coeff
+            radius = radius_sphere(self.volume(altitude, m_gas))
+            area = np.pi * radius * radius
+        return -(1/2) * drag_coeff * self.air.density(altitude) * area * (abs(velocity)*velocity)
+
+    def mass(self, m_gas: float, burst: bool = False) -> float:
+        return self.balloon.m_payload + (0 if burst else self.balloon.m_balloon) + m_gas
+
+    def weight(self, m_gas: float, burst: bool = False) -> float:
+        return -self.mass(m_gas, burst) * g
+
+    def density(self, altitude: float, m_gas: float, burst: bool = False) -> float:
+        if burst:
+            return 0
+        return m_gas / self.volume(altitude, m_gas)
+
+    def buoyancy(self, altitude: float, m_gas: float, burst: bool = False) -> float:
+        return g * self.volume(altitude, m_gas, burst) * (self.air.density(altitude) - self.density(altitude, m_gas, burst))
+
+    def acceleration(self, altitude: float, velocity: float, m_gas: float, phase: int = ASCENT) -> float:
+        if phase == LANDED:
+            return (0 - velocity)/(0.5 - 0)
+        burst = phase == BURST
+        return (self.buoyancy(altitude, m_gas, burst) + self.weight(m_gas, burst) +
+                self.drag(altitude, velocity, m_gas, burst)) / self.mass(m_gas, burst)
+
+    def physics(self, state: list[float]) -> tuple:
+        altitude, velocity, m_gas, lat, lng, phase, flow = state[:7]
+        return (self.acceleration(altitude, velocity, m_gas, phase),
+                -flow * self.density(altitude, m_gas, phase != ASCENT))
+
+    def delta_loc(self, lat: float, lng: float, alt: float, velocity: float, time: float) -> tuple:
+        gfs_time = self.balloon.gfs_link.getGFStime(self.balloon.start_date + timedelta(seconds=time))
+        u, v = self.balloon.forecast_wind(lat, lng, alt, gfs_time)
+        beta = atan(0.99664719 * tan(radians(abs(lat))))
+        return u / 111100, v / ((pi / 180) * 6378137 * cos(beta))
+
+    def model(self, t: float, state: list[float]) -> tuple:
+        altitude, velocity, m_gas, lat, lng, phase, flow = state[:7]
+        acceleration, gas_rate = self.physics(state)
+        return (velocity, acceleration, gas_rate,
+                *self.delta_loc(lat, lng, altitude, velocity, t), 0.0, 0.0, 0.0, 0.0)
+
+
+def best(functions: list, states) -> list[float]:
+    '''
+    Best time per call (s) of each `function(state)` over `repeat` runs,
+    taking turns so that they all see the same load on the machine
+    '''
+    times = [[] for _ in functions]
+    for _ in range(repeat):
+        for function, runs in zip(functions, times):
+            start = t.perf_counter()
+            for state in states:
+                function(state)
+            runs.append((t.perf_counter() - start) / len(states))
+    return [min(runs) for runs in times]
+
+
+def main():
+    balloon = make_balloon()
+    balloon.forecast_wind = lambda lat, lng, alt, time: (-5.14444, 0.0)
+    baseline = PerMethod(balloon)
+
+    # States spread over the flight, every phase and atmosphere layer
+    rng = np.random.default_rng(0)
+    altitudes = rng.uniform(0, 30e3, calls)
+    phases = rng.choice([ASCENT, ASCENT, BURST, LANDED], calls)
+    states = [[a, 5.0, balloon.initial_m_gas, *balloon.initial_loc, float(p), 1e-3, 0.0, 0.0]
+              for a, p in zip(altitudes, phases)]
+
+    for state in states[:1000]:
+        assert np.allclose(balloon.ScalarModel(0, state), baseline.model(0, state), rtol=1e-12)
+
+    def evaluation(state):
+        altitude, velocity, m_gas, lat, lng, phase, flow = state[:7]
+        ev = Evaluation(balloon, altitude, velocity, m_gas, phase)
+        return ev.acceleration, -flow * ev.gas_density
+
+    physics_before, physics_after, model_before, model_after = best(
+        [baseline.physics, evaluation,
+         lambda state: baseline.model(0, state), lambda state: balloon.ScalarModel(0, state)], states)
+
+    print(f"physics, force methods: {physics_before * 1e6:6.1f} us/call")
+    print(f"physics, Evaluation:    {physics_after * 1e6:6.1f} us/call ({physics_before / physics_after:.1f}x)")
+    print(f"model, force methods:   {model_before * 1e6:6.1f} us/call")
+    print(f"model, Evaluation:      {model_after * 1e6:6.1f} us/call ({model_before / model_after:.1f}x), "
+          f"{(model_after - physics_after) * 1e6:.1f} us of it in the location rates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+'''
+Cost of recording the derived quantities of the default scenario with the
+`observer` of `Simulate` (`Balloon.Observe`, once per accepted step),
+compared with no recording at all and with the model probing every stage
+and keeping one call in four, as it used to. Also counts the `Evaluation`s
+made per step, and checks the samples line up with the steps of RK45,
+which the one-in-four probe can't do.
+
+Run from the repository root:
+  $ python3 -m benchmarks.observer
+'''
+import time as t
+import numpy as np
+import Balloon as balloon_module
+from Instrument import Prober
+from Simulator import Simulate
+from benchmarks.scenario import make_balloon
+
+steps = 4000
+repeat = 3
+time_step = .5
+channels = ('volume', 'buoyancy', 'drag', 'acceleration',
+            'weight', 'temperature', 'pressure', 'density')
+
+
+class Counted(balloon_module.Evaluation):
+    '''`Evaluation` counting how many are made'''
+    __slots__ = ()
+    made = 0
+
+    def __init__(self, *args) -> None:
+        Counted.made += 1
+        super().__init__(*args)
+
+
+def probing(balloon, probe: Prober):
+    '''The model recording the channels at every call, as it used to'''
+    def model(time, state):
+        delta = balloon.Model(time, state)
+        altitude, velocity, m_gas, lat, lng, phase = np.ravel(state)[:6].tolist()
+        ev = balloon_module.Evaluation(balloon, altitude, velocity, m_gas, phase)
+        probe(volume=ev.volume, buoyancy=ev.buoyancy, drag=ev.drag,
+              acceleration=ev.acceleration, weight=ev.weight,
+              temperature=ev.temperature, pressure=ev.pressure,
+              density=ev.air_density)
+        return delta
+    return model
+
+
+def run(observe: bool = False, probe: Prober = None):
+    '''The balloon, trajectory, best time and evaluations per step of a flight'''
+    times = []
+    for _ in range(repeat):
+        balloon = make_balloon()
+        if probe is not None:
+            probe.reset()
+        model = balloon.Model if probe is None else probing(balloon, probe)
+        Counted.made = 0
+        start = t.perf_counter()
+        result = Simulate(balloon.initial_state(), model, time_end=steps * time_step, time_step=time_step,
+                          update=balloon.Update, observer=balloon.Observe if observe else None)
+        times.append(t.perf_counter() - start)
+    return balloon, result, min(times), Counted.made / len(result)
+
+
+def main():
+    balloon_module.Evaluation = Counted
+
+    _, plain, plain_time, plain_evaluations = run()
+    balloon, observed, observed_time, observed_evaluations = run(observe=True)
+    probe = Prober(channels, decimation=4)
+    _, probed, probed_time, probed_evaluations = run(probe=probe)
+
+    # Same flight, and the observed values are the ones of the stored states
+    assert np.array_equal(plain.state, observed.state)
+    for i in (0, len(observed) // 2, len(observed) - 1):
+        values = balloon.Observe(observed.time[i], observed.state[:, i])
+        assert all(observed[name][i] == values[name] for name in channels)
+    # The probe got the last stage of each step, not the state stored
+    difference = np.max(np.abs(probe['volume'] - observed['volume']))
+
+    balloon = make_balloon()
+    adaptive = Simulate(balloon.initial_state(), balloon.Model, time_end=steps * time_step, time_step=time_step,
+                        method='rk45', update=balloon.Update, observer=balloon.Observe)
+    assert len(adaptive['volume']) == len(adaptive)
+
+    print(f"{steps} RK4 steps")
+    print(f"no recording: {plain_time * 1e3:7.1f} ms, {plain_evaluations:.2f} evaluations/step")
+    print(f"probe:        {probed_time * 1e3:7.1f} ms, {probed_evaluations:.2f} evaluations/step, "
+          f"volume off by up to {difference:.1e} m3")
+    print(f"observer:     {observed_time * 1e3:7.1f} ms, {observed_evaluations:.2f} evaluations/step")
+    print(f"RK45: {len(adaptive)} steps, {len(adaptive['volume'])} observed samples")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Parsing throughput (MB/s) of `GFS_Handler._generate_matrix` on a synthetic
+HD (0.25 deg, 26 levels) NOAA ASCII response of the default scenario, with
+some fill values, compared with parsing it one line and one value at a time
+as it used to.
+
+Run from the repository root:
+  $ python3 -m benchmarks.parser
+'''
+import re
+import time as t
+from datetime import datetime
+import numpy
+from thirdparty.GFS import GFS_Handler
+from benchmarks.synthetic import dods_response
+
+repeat = 5
+
+
+def per_line(dataStream: str):
+    '''The matrix of one response, parsed line by line'''
+    dataLines = dataStream.split('\n')
+    timePoints = int(dataLines[0].split()[1].split('][')[0][1:])
+    pressurePoints = int(dataLines[0].split()[1].split('][')[1])
+    latitudePoints = int(dataLines[0].split()[1].split('][')[2])
+    longitudePoints = int(dataLines[0].split()[1].split('][')[3][:-1])
+    results = numpy.zeros((latitudePoints, longitudePoints, pressurePoints, timePoints))
+    for line in dataLines[1:-12]:
+        if line == '': continue
+        timeIndex = int(line.split(',')[0].split('][')[0][1:])
+        pressureIndex = int(line.split(',')[0].split('][')[1])
+        latitudeIndex = int(line.split(',')[0].split('][')[2][:-1])
+        results[latitudeIndex, :, pressureIndex, timeIndex] = [
+            float(x) if float(x) < 1e8 else 0 for x in line.split(',')[1:]]
+    return results
+
+
+def best(function, *args) -> float:
+    times = []
+    for _ in range(repeat):
+        start = t.perf_counter()
+        function(*args)
+        times.append(t.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    handler = GFS_Handler(-21.9, -47.0, datetime(2023, 3, 1, 12), HD=True)
+    response = dods_response(handler, 'tmpprs', [0, 2], handler.requestLongitudes[0])
+    # Missing data, as NOAA sends it
+    header, data = response.split('\n', 1)
+    response = header + '\n' + re.sub(r', [-0-9.e+]+', ', 9.999e+20', data, count=500)
+    size = len(response.encode()) / 1e6
+
+    matrix, _ = handler._generate_matrix([response])
+    assert numpy.array_equal(matrix, per_line(response))
+    assert (matrix == 0).sum() == 500
+
+    before = size / best(per_line, response)
+    after = size / best(handler._generate_matrix, [response])
+    print(f"response: {size:.1f} MB, grid {matrix.shape} (lat, lon, pressure, time)")
+    print(f"per line:   {before:6.1f} MB/s")
+    print(f"vectorized: {after:6.1f} MB/s ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
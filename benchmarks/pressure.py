@@ -0,0 +1,76 @@
+'''
+Calls per second of `GFS_Handler._pressure_interpolator` (altitude to
+pressure inversion of the forecast) over the default scenario, compared
+with fitting a `scipy.interpolate.UnivariateSpline` to the altitude column
+and taking its root on every call, as it used to.
+
+The altitude columns are the 1976 standard atmosphere, which isn't
+exponential in pressure, and the differences of both to its true pressure
+are printed too (tests/test_pressure.py holds them to their tolerances).
+
+Run from the repository root:
+  $ python3 -m benchmarks.pressure
+'''
+import time as t
+from datetime import datetime
+import numpy
+from scipy.interpolate import UnivariateSpline
+from benchmarks.synthetic import standard_handler, isa_pressure, first_gfs_time
+
+calls = 20000
+
+
+def spline(handler, lat, lon, alt, time):
+    '''The pressure from a spline through the altitude column'''
+    column = handler._altitude_column(lat, lon, time)
+    if column[0] > alt:
+        return handler.altitudeMap.fwdPressure[0]
+    elif column[-1] < alt:
+        return handler.altitudeMap.fwdPressure[-1]
+    f = UnivariateSpline(handler.altitudeMap.fwdPressure[::-1], column[::-1] - alt, s=0)
+    return f.roots()[0]
+
+
+def exact(handler, lat, lon, alt, time):
+    '''The pressure of the standard atmosphere, where it is within the levels'''
+    pressure = float(isa_pressure(alt - 20 * (lat - handler.lat) - 5 * (time - first_gfs_time)))
+    return min(max(pressure, handler.altitudeMap.fwdPressure[-1]), handler.altitudeMap.fwdPressure[0])
+
+
+def rate(function, points) -> float:
+    start = t.perf_counter()
+    for point in points:
+        function(*point)
+    return len(points) / (t.perf_counter() - start)
+
+
+def main():
+    start_date = datetime(2023, 3, 1, 12)
+    handler = standard_handler(-21.9, -47.0, start_date)
+    rng = numpy.random.default_rng(0)
+    points = list(zip(rng.uniform(-23, -21, calls).tolist(),
+                      rng.uniform(-48, -46, calls).tolist(),
+                      rng.uniform(0, 35e3, calls).tolist(),
+                      handler.getGFStime(start_date) + rng.uniform(0, 0.3, calls)))
+
+    def difference(f, g):
+        return max(abs(f(*point) / g(*point) - 1) for point in points[:2000])
+
+    def spline_(*point):
+        return spline(handler, *point)
+
+    def exact_(*point):
+        return exact(handler, *point)
+
+    print(f"max relative difference to the spline: {difference(handler._pressure_interpolator, spline_):.1e}")
+    print(f"max relative error to the standard atmosphere: spline {difference(spline_, exact_):.1e}, "
+          f"log-pressure {difference(handler._pressure_interpolator, exact_):.1e}")
+
+    before = rate(spline_, points)
+    after = rate(handler._pressure_interpolator, points)
+    print(f"spline:        {before:8.0f} calls/s")
+    print(f"log-pressure:  {after:8.0f} calls/s ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Cost of recording the 8 model channels with `Instrument.Prober` (named
+channels in a preallocated buffer), compared with the list per offset it
+used to be, and the memory taken by a long run, growing or in a ring.
+
+Run from the repository root:
+  $ python3 -m benchmarks.probe
+'''
+import time as t
+import tracemalloc
+import numpy as np
+from Instrument import Prober
+
+calls = 200000
+repeat = 3
+channels = ('volume', 'buoyancy', 'drag', 'acceleration',
+            'weight', 'temperature', 'pressure', 'density')
+
+
+class ListProber:
+    '''The Prober as it used to be: one list per offset, one call in four kept'''
+
+    def __init__(self, count) -> None:
+        self.data = [[] for _ in range(count)]
+        self.count = [0] * count
+
+    def __call__(self, v, offset=0):
+        self.count[offset] = self.count[offset] + 1
+        if self.count[offset] % 4 == 0:
+            self.data[offset].append(v)
+
+    def get(self):
+        out = np.array(self.data[0]).squeeze()
+        for i in range(1, len(self.data)):
+            out = np.column_stack((out, np.array(self.data[i]).squeeze()))
+        return out
+
+
+def record_list(probe, values):
+    for v in values:
+        probe(v[0], 0)
+        probe(v[1], 1)
+        probe(v[2], 2)
+        probe(v[3], 3)
+        probe(v[4], 4)
+        probe(v[5], 5)
+        probe(v[6], 6)
+        probe(v[7], 7)
+    return probe.get()
+
+
+def record_named(probe, values):
+    for v in values:
+        probe(volume=v[0], buoyancy=v[1], drag=v[2], acceleration=v[3],
+              weight=v[4], temperature=v[5], pressure=v[6], density=v[7])
+    return probe.get()
+
+
+def measure(function, make, values):
+    seconds = []
+    for _ in range(repeat):
+        start = t.perf_counter()
+        out = function(make(), values)
+        seconds.append(t.perf_counter() - start)
+    # Memory measured apart, tracing slows everything down
+    tracemalloc.start()
+    function(make(), values)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, min(seconds), peak
+
+
+def main():
+    values = np.random.default_rng(0).normal(size=(calls, len(channels))).tolist()
+
+    before, before_time, before_memory = measure(record_list, lambda: ListProber(len(channels)), values)
+    after, after_time, after_memory = measure(record_named, lambda: Prober(channels, decimation=4), values)
+    ring, ring_time, ring_memory = measure(record_named, lambda: Prober(channels, decimation=4, capacity=1000, ring=True),
+                                           values)
+
+    assert np.array_equal(before, after)
+    assert np.array_equal(ring, after[-1000:])
+
+    print(f"{calls} calls of {len(channels)} channels, {len(after)} samples kept")
+    print(f"lists:          {before_time / calls * 1e6:5.2f} us/call, peak {before_memory / 1e6:6.2f} MB")
+    print(f"buffer:         {after_time / calls * 1e6:5.2f} us/call, peak {after_memory / 1e6:6.2f} MB "
+          f"({before_time / after_time:.1f}x)")
+    print(f"ring (1000):    {ring_time / calls * 1e6:5.2f} us/call, peak {ring_memory / 1e6:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+'''
+The default flight written to disk by a `Recorder` as it is simulated, in
+chunks from `SimulateChunks`: the cost of writing, the mapped file being the
+trajectory of `Simulate`, a run killed halfway keeping what was flushed, and
+the CSV export reading back to the same values.
+
+Run from the repository root:
+  $ python3 -m benchmarks.record
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import time as t
+import numpy as np
+from Recorder import Recorder, read, export_csv
+from Simulator import Simulate, SimulateChunks
+from benchmarks.scenario import make_balloon
+
+tfinal = 3 * 60 * 60
+time_step = .5
+chunk_size = 1000
+killed_after = 5  # chunks
+
+
+def chunks(balloon):
+    return SimulateChunks(balloon.initial_state(), balloon.ScalarModel, time_end=tfinal, time_step=time_step,
+                          method='rk4_scalar', events=balloon.events(), update=balloon.Update,
+                          observer=balloon.Observe, chunk_size=chunk_size)
+
+
+def crash(path: str) -> None:
+    '''Records the flight and dies without closing anything after a few chunks'''
+    with Recorder(path) as recorder:
+        for i, _ in enumerate(recorder.record(chunks(make_balloon()))):
+            if i + 1 == killed_after:
+                os._exit(1)
+
+
+def main():
+    balloon = make_balloon()
+    reference = Simulate(balloon.initial_state(), balloon.ScalarModel, time_end=tfinal, time_step=time_step,
+                         method='rk4_scalar', events=balloon.events(), update=balloon.Update,
+                         observer=balloon.Observe)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'flight')
+
+        write_time = 0
+        with Recorder(path) as recorder:
+            for chunk in chunks(make_balloon()):
+                start = t.perf_counter()
+                recorder.write(chunk)
+                write_time += t.perf_counter() - start
+
+        records, info = read(path)
+        assert isinstance(records, np.memmap) and info['complete']
+        assert len(records) == len(reference)
+        assert np.array_equal(records['time'], reference.time)
+        for name in reference.columns + reference.channels:
+            assert np.array_equal(records[name], reference[name]), name
+        assert [(e.name, e.time) for e in info['events']] == [(e.name, e.time) for e in reference.events]
+        size = os.path.getsize(path + '.npy') / 1e6
+
+        start = t.perf_counter()
+        csv_path = export_csv(path)
+        export_time = t.perf_counter() - start
+        exported = np.loadtxt(csv_path, delimiter=',', skiprows=1)
+        assert np.array_equal(exported[:, list(records.dtype.names).index('altitude')], reference['altitude'])
+
+        killed = os.path.join(directory, 'killed')
+        code = subprocess.call([sys.executable, '-c', f'from benchmarks.record import crash; crash({killed!r})'],
+                               stdout=subprocess.DEVNULL)
+        assert code == 1
+        partial, info = read(killed)
+        assert not info['complete'] and len(partial) == killed_after * chunk_size
+        assert np.array_equal(partial['altitude'], reference['altitude'][:len(partial)])
+
+    print(f"{len(reference)} samples of {len(records.dtype.names)} fields, {size:.2f} MB, "
+          f"identical to Simulate when mapped")
+    print(f"writing {recorder.chunks} chunks: {write_time * 1e3:5.1f} ms "
+          f"({write_time / len(reference) * 1e9:.0f} ns/sample)")
+    print(f"CSV export:       {export_time * 1e3:5.0f} ms, exact when read back")
+    print(f"killed after {killed_after} chunks: {len(partial)} samples kept")
+
+
+if __name__ == '__main__':
+    main()
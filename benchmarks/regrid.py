@@ -0,0 +1,64 @@
+'''
+Calls per second of the forecast interpolators (temperature, u and v winds
+and pressure) on the pressure levels, compared with the same
+lookups after `GFS_Handler.regridAltitude`, which resamples the forecast on
+altitude levels once at load time. The two are checked to agree within
+`tolerance` first; the time taken by the regridding is printed too.
+
+Run from the repository root:
+  $ python3 -m benchmarks.regrid
+'''
+import time as t
+from datetime import datetime
+import numpy
+from benchmarks.synthetic import synthetic_handler
+
+calls = 5000
+altitude_step = 50.
+# Differences allowed against the pressure levels: relative for the
+# pressure, absolute (K and m/s) for the others
+tolerance = {'p': 1e-3, 't': 0.1, 'u': 0.1, 'v': 0.1}
+
+
+def rate(interpolators, points) -> float:
+    start = t.perf_counter()
+    for point in points:
+        for interpolator in interpolators:
+            interpolator(*point)
+    return len(points) / (t.perf_counter() - start)
+
+
+def main():
+    start_date = datetime(2023, 3, 1, 12)
+    handler = synthetic_handler(-21.9, -47.0, start_date)
+    rng = numpy.random.default_rng(0)
+    points = list(zip(rng.uniform(-23, -21, calls).tolist(),
+                      rng.uniform(-48, -46, calls).tolist(),
+                      rng.uniform(0, 35e3, calls).tolist(),
+                      (handler.getGFStime(start_date) + rng.uniform(0, 0.3, calls)).tolist()))
+
+    variables = ('t', 'u', 'v', 'p')
+    levels = dict(zip(variables, handler.interpolateData(*variables)))
+    start = t.perf_counter()
+    handler.regridAltitude(altitude_step)
+    print(f"regridding every {altitude_step:.0f} m: {t.perf_counter() - start:.2f} s")
+    regridded = dict(zip(variables, handler.interpolateData(*variables)))
+
+    for variable in variables:
+        before = numpy.array([levels[variable](*point) for point in points[:1000]])
+        after = numpy.array([regridded[variable](*point) for point in points[:1000]])
+        if variable == 'p':
+            error = numpy.max(numpy.abs(after / before - 1))
+        else:
+            error = numpy.max(numpy.abs(after - before))
+        print(f"max difference '{variable}': {error:.1e} (tolerance {tolerance[variable]:.0e})")
+        assert error < tolerance[variable]
+
+    before = rate(levels.values(), points)
+    after = rate(regridded.values(), points)
+    print(f"pressure levels: {before:8.0f} points/s")
+    print(f"altitude levels: {after:8.0f} points/s ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+'''
+Steps per second of the default `main.py` scenario with the array model
+(`Balloon.Model` + `RK4`) and with the scalar fast path
+(`Balloon.ScalarModel` + `RK4Scalar`).
+
+Run from the repository root:
+  $ python3 -m benchmarks.scalar
+'''
+import time as t
+from Simulator import Simulate
+from benchmarks.scenario import make_balloon
+
+steps = 2000
+time_step = .5
+
+
+def run(method: str, forecast: bool = True) -> float:
+    balloon = make_balloon()
+    if not forecast:
+        # Constant wind, to time the model and integrator alone
+        balloon.forecast_wind = lambda lat, lng, alt, time: (-5.14444, 0.0)
+    model = balloon.ScalarModel if method == 'rk4_scalar' else balloon.Model
+    state = balloon.initial_state()
+    start = t.perf_counter()
+    Simulate(state, model, time_end=steps * time_step, time_step=time_step,
+             method=method)
+    return steps / (t.perf_counter() - start)
+
+
+def main():
+    for forecast in (True, False):
+        array = run('rk4', forecast)
+        scalar = run('rk4_scalar', forecast)
+        print("GFS forecast:" if forecast else "Constant wind:")
+        print(f"  Model + RK4:             {array:8.0f} steps/s")
+        print(f"  ScalarModel + RK4Scalar: {scalar:8.0f} steps/s ({scalar / array:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
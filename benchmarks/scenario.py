@@ -0,0 +1,21 @@
+'''
+The default `main.py` scenario, on top of the synthetic forecast.
+'''
+from datetime import datetime
+from Balloon import Balloon
+from benchmarks.synthetic import synthetic_handler
+
+
+def make_balloon() -> Balloon:
+    start_date = datetime(2023, 3, 1, 12)
+    initial_loc = (-21.9, -47.0)
+    return Balloon(balloon_mass=3000,
+                   payload_mass=3,
+                   initial_volume=8,
+                   burst_diameter=13.0,
+                   drag_coef=0.35,
+                   parachute_diameter=1.5,
+                   initial_loc=initial_loc,
+                   start_date=start_date,
+                   parachute_drag_coeff=0.6,
+                   gfs_link=synthetic_handler(*initial_loc, start_date))
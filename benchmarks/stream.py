@@ -0,0 +1,93 @@
+'''
+The default flight streamed in chunks with `SimulateChunks`, to a consumer
+keeping only the latest position and the events, compared with the whole
+`Trajectory` of `Simulate`: peak memory, and the chunks joined back being
+the same trajectory, for every integrator and a few chunk sizes.
+
+Run from the repository root:
+  $ python3 -m benchmarks.stream
+'''
+import tracemalloc
+import numpy as np
+from Simulator import Simulate, SimulateChunks
+from Trajectory import Trajectory
+from benchmarks.scenario import make_balloon
+
+tfinal = 3 * 60 * 60
+time_step = .5
+chunk_size = 1000
+
+
+def arguments(balloon, method: str, time_end: float) -> dict:
+    return dict(time_end=time_end, time_step=time_step, method=method, events=balloon.events(),
+                update=balloon.Update, observer=balloon.Observe)
+
+
+def model(balloon, method: str):
+    return balloon.ScalarModel if method == 'rk4_scalar' else balloon.Model
+
+
+def whole(balloon, method: str = 'rk4_scalar', time_end: float = tfinal) -> Trajectory:
+    return Simulate(balloon.initial_state(), model(balloon, method), **arguments(balloon, method, time_end))
+
+
+def streamed(balloon, method: str = 'rk4_scalar', time_end: float = tfinal, size: int = chunk_size):
+    return SimulateChunks(balloon.initial_state(), model(balloon, method), chunk_size=size,
+                          **arguments(balloon, method, time_end))
+
+
+def assert_same(joined: Trajectory, reference: Trajectory) -> None:
+    assert np.array_equal(joined.time, reference.time)
+    assert np.array_equal(joined.state, reference.state)
+    assert [(e.name, e.time) for e in joined.events] == [(e.name, e.time) for e in reference.events]
+    for name in reference._channels:
+        assert np.array_equal(joined[name], reference[name]), name
+
+
+def peak(function, *args):
+    '''Result and peak memory (MB) allocated by `function(*args)`'''
+    tracemalloc.start()
+    result = function(*args)
+    memory = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, memory
+
+
+def publish(balloon) -> tuple:
+    '''Consumes the chunks as they come, keeping the landing prediction only'''
+    chunks = samples = 0
+    position = None
+    events = []
+    for chunk in streamed(balloon):
+        chunks += 1
+        samples += len(chunk)
+        position = chunk['lat'][-1], chunk['lng'][-1], chunk['altitude'][-1]
+        events.extend(event.name for event in chunk.events)
+    return chunks, samples, position, events
+
+
+def main():
+    # The forecast is loaded before, only the simulation is measured
+    reference, whole_memory = peak(whole, make_balloon())
+    (chunks, samples, position, events), stream_memory = peak(publish, make_balloon())
+    assert samples == len(reference)
+    assert position == (reference['lat'][-1], reference['lng'][-1], reference['altitude'][-1])
+    assert events == [event.name for event in reference.events]
+
+    checked = []
+    for method in ('rk4', 'rk4_scalar', 'rk45'):
+        reference = whole(make_balloon(), method, time_end=1800)
+        for size in (1, 7, 1000):
+            pieces = list(streamed(make_balloon(), method, time_end=1800, size=size))
+            assert all(len(piece) <= size + 1 for piece in pieces)
+            assert_same(Trajectory.concatenate(pieces), reference)
+        checked.append(f"{method} ({len(reference)} samples)")
+
+    print(f"{samples} samples, {len(events)} events")
+    print(f"whole trajectory:    {whole_memory:6.2f} MB peak")
+    print(f"{chunks} chunks of {chunk_size}: {stream_memory:6.2f} MB peak")
+    print(f"joined chunks identical to Simulate for {', '.join(checked)}, chunks of 1, 7 and 1000")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+'''
+Offline stand-in for the GFS forecast used by the benchmarks.
+
+Builds a `GFS_Handler` filled with a smooth, made-up forecast on the same
+grid layout `downloadForecast` produces, so the simulator can be timed
+without touching the network. The same forecast can also be served as the
+NOAA ASCII responses (see `offline`), to time the download path itself.
+'''
+from datetime import datetime
+import numpy as np
+from thirdparty.GFS import GFS_Handler, GFS_Map
+
+# Pressure levels in mbar, highest pressure first (same order as NOAA)
+levels = [1000, 975, 950, 925, 900, 850, 800, 750, 700, 650, 600, 550, 500,
+          450, 400, 350, 300, 250, 200, 150, 100, 70, 50, 30, 20, 10, 7, 5,
+          3, 2, 1]
+
+# The levels of the HD (0.25 deg) service, indexed by `requestAltitude`, are
+# the first 26 of these, down to 10 mbar
+# The 47 levels of the SD (0.5 deg) service, indexed by `requestAltitude`
+sd_levels = [1000, 975, 950, 925, 900, 875, 850, 825, 800, 775, 750, 725,
+             700, 675, 650, 625, 600, 575, 550, 525, 500, 475, 450, 425, 400,
+             375, 350, 325, 300, 275, 250, 225, 200, 175, 150, 125, 100, 70,
+             50, 30, 20, 10, 7, 5, 3, 2, 1]
+
+# Arbitrary GFS time (days) of the first dataset
+first_gfs_time = 738000.0
+
+
+def _map(lats, lons, press, times) -> GFS_Map:
+    return GFS_Map.fromAxes(lats, lons, press, times)
+
+
+def _fields(la, lo, p, t, lat: float, lon: float) -> dict:
+    '''
+    The synthetic forecast around (lat, lon) at the given coordinates, keyed
+    by NOAA variable name, in NOAA units
+    '''
+    # Scale height atmosphere with a small horizontal/time tilt
+    altitude = -7000 * np.log(p / 1013.25) + 20 * (la - lat) + 5 * (t - first_gfs_time)
+    temperature = np.maximum(15 - 6.5e-3 * altitude, -56.5) + 0.1 * (lo - lon)
+    u = 5 + 25 * np.exp(-((altitude - 12e3) / 4e3) ** 2) + 0.2 * (la - lat)
+    v = -2 + 0.5 * (lo - lon) + 3 * np.sin(altitude / 5e3)
+    return {'hgtprs': altitude, 'tmpprs': temperature + 273.15, 'ugrdprs': u, 'vgrdprs': v}
+
+
+def synthetic_handler(lat: float, lon: float, start_date: datetime) -> GFS_Handler:
+    '''
+    Create a SD `GFS_Handler` around (lat, lon) with a synthetic forecast
+    starting at `start_date`
+    '''
+    handler = GFS_Handler(lat, lon, start_date, HD=False)
+    step = handler.latStep
+    lats = np.arange(round(lat) - 3, round(lat) + 3 + step, step)
+    lons = np.arange(round(lon) - 6, round(lon) + 6 + step, step)
+    times = first_gfs_time + 0.125 * np.arange(4)
+    press = np.array(levels, dtype=float)
+
+    la, lo, p, t = np.meshgrid(lats, lons, press, times, indexing='ij')
+    fields = _fields(la, lo, p, t, lat, lon)
+
+    handler.cycleDateTime = start_date
+    handler.firstAvailableTime = start_date
+    handler.altitudeData = fields['hgtprs']
+    handler.temperatureData = fields['tmpprs'] - 273.15
+    handler.windUData = fields['ugrdprs']
+    handler.windVData = fields['vgrdprs']
+
+    data_map = _map(lats, lons, press, times)
+    handler.altitudeMap = data_map
+    handler.temperatureMap = data_map
+    handler.windsMap = data_map
+    return handler
+
+
+# Layers of the 1976 standard atmosphere up to 51 km: base altitude (m),
+# base temperature (K) and lapse rate (K/m)
+isa_layers = [(0, 288.15, -6.5e-3), (11e3, 216.65, 0), (20e3, 216.65, 1e-3),
+              (32e3, 228.65, 2.8e-3), (47e3, 270.65, 0)]
+
+
+def _isa_ratio(z, temperature: float, lapse: float):
+    '''Pressure ratio `z` meters above the base of a standard atmosphere layer'''
+    exponent = 9.80665 * 0.0289644 / 8.3144598
+    if lapse == 0:
+        return np.exp(-exponent * z / temperature)
+    return (1 + lapse * z / temperature) ** (-exponent / lapse)
+
+
+def isa_pressure(altitude) -> np.ndarray:
+    '''
+    Pressure (mbar) of the 1976 standard atmosphere at `altitude` (m): it is
+    continuous, and only exponential in its isothermal layers
+    '''
+    altitude = np.asarray(altitude, dtype=float)
+    pressure = np.empty(altitude.shape)
+    base_pressure = 1013.25
+    for i, (base, temperature, lapse) in enumerate(isa_layers):
+        top = isa_layers[i + 1][0] if i + 1 < len(isa_layers) else np.inf
+        # The first layer also covers negative altitudes
+        inside = (altitude < top) & ((altitude >= base) | (i == 0))
+        pressure[inside] = base_pressure * _isa_ratio(altitude[inside] - base, temperature, lapse)
+        if np.isfinite(top):
+            base_pressure *= _isa_ratio(top - base, temperature, lapse)
+    return pressure
+
+
+def standard_altitudes(press) -> np.ndarray:
+    '''Altitudes (m) of the pressure levels `press` (mbar) in `isa_pressure`'''
+    heights = np.linspace(-1e3, 60e3, 610001)
+    # The pressure decreases with altitude, so the log is searched reversed
+    log = np.log(isa_pressure(heights))[::-1]
+    return np.interp(np.log(np.asarray(press, dtype=float)), log, heights[::-1])
+
+
+def standard_handler(lat: float, lon: float, start_date: datetime) -> GFS_Handler:
+    '''
+    Same as `synthetic_handler`, with the altitude of each level taken from
+    the standard atmosphere instead (plus the same horizontal/time tilt):
+    the columns aren't exponential in pressure
+    '''
+    handler = synthetic_handler(lat, lon, start_date)
+    la, lo, p, t = np.meshgrid(*(handler.altitudeMap.fwdLatitude, handler.altitudeMap.fwdLongitude,
+                                 handler.altitudeMap.fwdPressure, handler.altitudeMap.fwdTime), indexing='ij')
+    handler.altitudeData = standard_altitudes(p) + 20 * (la - lat) + 5 * (t - first_gfs_time)
+    return handler
+
+
+def dods_response(handler: GFS_Handler, requestVar: str, requestTime: list, requestLongitude: list,
+                  requestAltitude: list = None, requestLatitude: list = None) -> str:
+    '''
+    The NOAA ASCII (DODS) response of `handler` for one variable and index
+    window: a header with the shape, one line of longitudes per
+    [time][pressure][latitude] and the four axes at the end. The altitude and
+    latitude windows are the handler's, unless given
+    '''
+    def window(first, last):
+        return np.arange(int(first), int(last) + 1)
+
+    times = first_gfs_time + 0.125 * window(*requestTime)
+    press = np.array(levels if handler.HD else sd_levels, dtype=float)[
+        window(*(requestAltitude or handler.requestAltitude))]
+    lats = handler.latStep * window(*(requestLatitude or handler.requestLatitude)) - 90
+    lons = handler.lonStep * window(*requestLongitude)
+
+    t, p, la, lo = np.meshgrid(times, press, lats, lons, indexing='ij')
+    values = _fields(la, np.where(lo > 180, lo - 360, lo), p, t, handler.lat, handler.lon)[requestVar]
+
+    lines = ['%s, [%d][%d][%d][%d]' % ((requestVar,) + values.shape)]
+    for (i, j, k) in np.ndindex(values.shape[:3]):
+        # Values with 7 significant digits, as NOAA sends them
+        lines.append('[%d][%d][%d], ' % (i, j, k) + ', '.join('%.7g' % x for x in values[i, j, k]))
+    lines += ['', '', '']
+    for name, axis in (('time', times), ('lev', press), ('lat', lats), ('lon', lons)):
+        lines.append('%s, [%d]' % (name, len(axis)))
+        lines.append(', '.join(repr(float(x)) for x in axis))
+    return '\n'.join(lines) + '\n'
+
+
+def offline(handler: GFS_Handler, responses: dict = None) -> GFS_Handler:
+    '''
+    Make `handler` download the synthetic forecast instead of going to the
+    NOAA servers, through the same request and parsing path. The responses
+    are kept in `responses`, which can be shared so that they are only
+    generated once
+    '''
+    if responses is None:
+        responses = {}
+
+    def request(requestVar, cycle, requestTime):
+        results = []
+        for requestLongitude in handler.requestLongitudes:
+            key = (requestVar, tuple(requestTime), tuple(requestLongitude))
+            if key not in responses:
+                responses[key] = dods_response(handler, requestVar, requestTime, requestLongitude)
+            results.append(responses[key])
+        return results
+    handler.use_async = False
+    handler._NOAA_request = request
+    # Every cycle is available, no need to probe
+    handler._newestAvailableCycle = lambda candidates: candidates[0]
+    return handler
+
+
+def hd_handler(lat: float, lon: float, start_date: datetime) -> GFS_Handler:
+    '''
+    A HD `GFS_Handler` around (lat, lon) with the synthetic forecast, on the
+    HD levels and, above them, on the SD levels of its high altitude part,
+    downloaded through `offline`
+    '''
+    handler = offline(GFS_Handler(lat, lon, start_date, HD=True))
+    offline(handler._highAltitudeGFS)
+    handler.downloadForecast()
+    return handler
@@ -0,0 +1,66 @@
+'''
+Calls per second of the wind lookup of `Balloon.delta_loc`: separate u and v
+wind interpolators (`GFS_Handler.interpolateData`) compared
+with one `GFS_Handler.interpolateStacked` interpolator returning both, on the
+pressure levels and after `regridAltitude`, and the stacked one queried with
+arrays of all the points at once. All are checked to agree within
+`tolerance` first.
+
+Run from the repository root:
+  $ python3 -m benchmarks.wind
+'''
+import time as t
+from datetime import datetime
+import numpy
+from benchmarks.synthetic import synthetic_handler
+
+calls = 10000
+tolerance = 1e-9
+
+
+def rate(function, points) -> float:
+    start = t.perf_counter()
+    for point in points:
+        function(*point)
+    return len(points) / (t.perf_counter() - start)
+
+
+def main():
+    start_date = datetime(2023, 3, 1, 12)
+    handler = synthetic_handler(-21.9, -47.0, start_date)
+    rng = numpy.random.default_rng(0)
+    points = list(zip(rng.uniform(-23, -21, calls).tolist(),
+                      rng.uniform(-48, -46, calls).tolist(),
+                      rng.uniform(0, 35e3, calls).tolist(),
+                      (handler.getGFStime(start_date) + rng.uniform(0, 0.3, calls)).tolist()))
+
+    for levels in ('pressure', 'altitude'):
+        if levels == 'altitude':
+            handler.regridAltitude()
+        getU, getV = handler.interpolateData('wind_u', 'wind_v')
+        stacked = handler.interpolateStacked('wind_u', 'wind_v')
+
+        def separate(*point):
+            return getU(*point), getV(*point)
+
+        error = max(numpy.max(numpy.abs(numpy.subtract(separate(*point), stacked(*point))))
+                    for point in points[:1000])
+        print(f"{levels} levels, max difference: {error:.1e} (tolerance {tolerance:.0e})")
+        assert error < tolerance
+
+        before = rate(separate, points)
+        after = rate(stacked, points)
+        print(f"  separate: {before:8.0f} calls/s")
+        print(f"  stacked:  {after:8.0f} calls/s ({after / before:.1f}x)")
+
+        arrays = [numpy.array(coordinate) for coordinate in zip(*points)]
+        error = numpy.max(numpy.abs(stacked(*arrays).T - [stacked(*point) for point in points]))
+        assert error < tolerance
+        start = t.perf_counter()
+        stacked(*arrays)
+        batch = len(points) / (t.perf_counter() - start)
+        print(f"  arrays:   {batch:8.0f} points/s ({batch / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 import time as t
 import sys
-import numpy as np
-from Simulator import Simulate
-from Instrument import probe
+from Simulator import Simulate, SimulateChunks
+from Trajectory import Trajectory
+from Recorder import Recorder
 from Balloon import Balloon
 from Visualization import Viz
 from  datetime import datetime
@@ -36,24 +36,25 @@ def main():
                       parachute_diameter=1.5,
                       initial_loc=(-21.9, -47.0),
                       start_date=datetime.now(),
-                      parachute_drag_coeff=0.6)
+                      parachute_drag_coeff=0.6,
+                      forecast_cache='.gfs_cache')
 
-    state = np.vstack([0.0,  # velocity
-                       0.0,   # acceleration
-                       balloon.initial_m_gas,  # gas mass
-                       balloon.initial_loc[0],
-                       balloon.initial_loc[1]
-                       ])
+    state = balloon.initial_state()
 
-    data, time = Simulate(state, balloon.Model, time_start=0,
-                          time_end=tfinal, time_step=.5, status=status)
+    arguments = dict(time_start=0, time_end=tfinal, time_step=.5, status=status,
+                     events=balloon.events(), update=balloon.Update)
+    if len(sys.argv) > 1:
+        # Also written to the given path while it runs (see Recorder)
+        with Recorder(sys.argv[1]) as recorder:
+            result = Trajectory.concatenate(recorder.record(SimulateChunks(state, balloon.Model, **arguments)))
+    else:
+        result = Simulate(state, balloon.Model, **arguments)
 
-    # Plot Simulation Data
-    data = np.array(data)
-    # Join probed data
-    data = np.column_stack((data, probe.get()))
+    # Forces and atmosphere, computed from the trajectory when plotted
+    result.add_derived(Balloon.derived_channels, balloon.Derive)
 
-    Viz(data, time)
+    # Plot Simulation Data
+    Viz(result)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,7 @@
+'''
+Checks run by pytest, on the same offline synthetic forecast as the
+benchmarks, so no download is needed.
+
+Run from the repository root:
+  $ python3 -m pytest tests
+'''
@@ -0,0 +1,49 @@
+'''
+`Air.TabulatedAtmosphere` against the analytic atmosphere of `Air`
+'''
+import numpy as np
+import pytest
+import Air
+
+# Relative error allowed for the default 10 m table
+tolerance = 1e-6
+# Both sides of the layer limits, where a table could mix two layers
+edges = [11e3, 25e3, np.nextafter(11e3, 0), np.nextafter(25e3, 0), np.nextafter(11e3, np.inf),
+         np.nextafter(25e3, np.inf), 0.0]
+
+
+def altitudes() -> np.ndarray:
+    return np.concatenate([edges, np.random.default_rng(0).uniform(0, 35e3, 100_000)])
+
+
+def relative_error(tabulated, exact) -> float:
+    return max(np.max(np.abs(np.asarray(t) / np.asarray(e) - 1)) for t, e in zip(tabulated, exact))
+
+
+def test_arrays_within_tolerance():
+    table = Air.TabulatedAtmosphere()
+    z = altitudes()
+    assert relative_error(table.state(z), Air.state(z)) < tolerance
+
+
+def test_floats_within_tolerance():
+    table = Air.TabulatedAtmosphere()
+    for altitude in altitudes()[:2000].tolist():
+        assert relative_error(table.state(altitude), Air.state(altitude)) < tolerance, altitude
+
+
+@pytest.mark.parametrize('function', ['temperature', 'pressure', 'density'])
+def test_single_quantities_match_state(function):
+    table = Air.TabulatedAtmosphere()
+    z = altitudes()[:1000]
+    column = ['temperature', 'pressure', 'density'].index(function)
+    assert np.array_equal(getattr(table, function)(z), table.state(z)[column])
+    assert getattr(table, function)(float(z[-1])) == table.state(float(z[-1]))[column]
+
+
+def test_floats_match_arrays():
+    table = Air.TabulatedAtmosphere()
+    z = altitudes()[:2000]
+    arrays = np.stack(table.state(z))
+    floats = np.array([table.state(altitude) for altitude in z.tolist()]).T
+    assert np.allclose(floats, arrays, rtol=1e-14, atol=0)
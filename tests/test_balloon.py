@@ -0,0 +1,88 @@
+'''
+`Balloon.Model` as a pure function of time and state: nothing is kept on the
+balloon between calls, the valve controller included
+'''
+import contextlib
+import io
+import threading
+import numpy as np
+import pytest
+from Balloon import ASCENT, BURST
+from Simulator import Simulate
+from benchmarks.scenario import make_balloon
+
+
+@pytest.fixture
+def balloon():
+    with contextlib.redirect_stdout(io.StringIO()):
+        balloon = make_balloon()
+    # The valve opens from the ground up, so the controller rows change
+    balloon.controller.enabled = True
+    balloon.controller.min_altitude = 0
+    balloon.controller.I = 0.01
+    return balloon
+
+
+def state(altitude: float = 1000., velocity: float = 5., phase: int = ASCENT) -> list[float]:
+    return [altitude, velocity, 1.0, -21.9, -47.0, phase, 1e-3, 0.5, 2.0]
+
+
+@pytest.mark.parametrize('phase', [ASCENT, BURST])
+def test_model_sees_parameter_changes(balloon, phase):
+    before = balloon.ScalarModel(0, state(phase=phase))
+    balloon.m_payload *= 10
+    after = balloon.ScalarModel(0, state(phase=phase))
+    assert after[1] != before[1]
+    balloon.m_payload /= 10
+    assert balloon.ScalarModel(0, state(phase=phase)) == before
+
+
+def test_model_changes_nothing(balloon):
+    attributes = dict(vars(balloon))
+    controller = dict(vars(balloon.controller))
+    for altitude in (0., 1000., 20e3):
+        balloon.Model(10., np.vstack(state(altitude)))
+        balloon.EnsembleModel(10., np.repeat(np.vstack(state(altitude)), 3, axis=1))
+    assert vars(balloon) == attributes
+    assert vars(balloon.controller) == controller
+
+
+def test_controller_memory_in_the_state(balloon):
+    column = np.vstack(state(velocity=3.))
+    first = balloon.Update(0, column.copy())
+    # Stateless: the same state gives the same command
+    assert np.array_equal(balloon.Update(0, column.copy()), first)
+    error = 3. - balloon.controller.setpoint
+    assert first[7, 0] == error
+    assert first[8, 0] == 2.0 + error
+    assert first[6, 0] == pytest.approx(balloon.controller.P * error + balloon.controller.I * 2.0 +
+                                        balloon.controller.D * (error - 0.5))
+
+
+def test_disabled_controller_leaves_the_state(balloon):
+    balloon.controller.enabled = False
+    column = np.vstack(state(velocity=3.))
+    column[6] = 0.
+    # The adaptive integrator reuses its last stage only if nothing changed
+    assert np.array_equal(balloon.Update(0, column.copy()), column)
+
+
+def test_shared_between_threads(balloon):
+    def simulate():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Simulate(balloon.initial_state(), balloon.Model, time_end=300, time_step=1,
+                            events=balloon.events(), update=balloon.Update)
+
+    alone = simulate()
+    results = [None] * 4
+
+    def run(i):
+        results[i] = simulate()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert np.any(alone['valve'] != 0)
+    for result in results:
+        assert np.array_equal(result.state, alone.state)
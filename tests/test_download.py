@@ -0,0 +1,106 @@
+'''
+`thirdparty.download.Downloader` and the forecast download against the local
+stand-in of the NOAA DODS server (benchmarks/download.py)
+'''
+import socket
+import threading
+from datetime import timedelta
+from urllib.request import urlopen
+import pytest
+from thirdparty.GFS import GFS_Handler
+from thirdparty.download import Downloader
+from benchmarks.download import StandIn, forecast_urls, download, assert_same, initial_loc, start_date
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = StandIn(GFS_Handler(*initial_loc, start_date, HD=True))
+    server.latency = 0.002
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stand_in(server):
+    '''The server, answering every request again'''
+    server.failEvery = None
+    server.statuses = {}
+    server.missing = set()
+    server.reset()
+    return server
+
+
+@pytest.fixture(scope='module')
+def urls(server):
+    return forecast_urls(GFS_Handler(*initial_loc, start_date, HD=True, server_url=server.url))
+
+
+@pytest.fixture(scope='module')
+def serial(server, urls):
+    return {url: urlopen(url).read().decode('utf-8') for url in urls}
+
+
+def test_batch_equals_serial(stand_in, urls, serial):
+    downloader = Downloader(maxPerHost=4)
+    assert downloader.fetch(urls) == serial
+    assert stand_in.requests == len(urls)
+    # Kept alive, and never more requests at once than allowed
+    assert stand_in.connections <= downloader.maxPerHost
+    assert stand_in.peak <= downloader.maxPerHost
+
+
+def test_failed_requests_are_retried(stand_in, urls, serial):
+    stand_in.failEvery = 3
+    assert Downloader(backoff=0.001).fetch(urls) == serial
+    assert stand_in.requests > len(urls)
+
+
+def test_error_status_is_not_retried(stand_in, urls):
+    stand_in.statuses[urls[0][len(stand_in.url) - 1:]] = 404
+    assert Downloader(backoff=0.001).get(urls[0]) == ''
+    assert stand_in.requests == 1
+
+
+def test_permanent_failure_gives_none(stand_in, urls, serial):
+    stand_in.statuses[urls[0][len(stand_in.url) - 1:]] = 503
+    downloader = Downloader(retries=3, backoff=0.001)
+    responses = downloader.fetch(urls[:3])
+    assert responses[urls[0]] is None
+    assert responses[urls[1]] == serial[urls[1]]
+    assert stand_in.requests == 2 + downloader.retries + 1
+
+
+def test_unreachable_server_gives_none():
+    # A port nobody listens to
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    assert Downloader(retries=1, backoff=0.001).get('http://127.0.0.1:%d/' % port) is None
+
+
+def test_flaky_forecast_equals_clean(stand_in):
+    clean, _ = download(stand_in)
+    stand_in.failEvery = 3
+    flaky, _ = download(stand_in)
+    assert_same(clean, flaky)
+
+
+def test_cached_cycle_is_not_probed(stand_in, tmp_path):
+    def handler():
+        return GFS_Handler(*initial_loc, start_date, HD=True, server_url=stand_in.url, cache_dir=str(tmp_path))
+
+    # The latest cycle is not on the server yet: the one before is cached
+    stand_in.missing = {start_date.strftime('%Y%m%d%H')}
+    cold = handler()
+    cold.downloadForecast()
+    assert cold.cycleDateTime == start_date - timedelta(hours=6)
+
+    stand_in.reset()
+    warm = handler()
+    # Long after the missing cycle was checked
+    warm.cycleIndex.missingTTL = 0
+    warm.downloadForecast()
+    assert warm.cycleDateTime == cold.cycleDateTime
+    assert stand_in.requests == 0
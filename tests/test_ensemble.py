@@ -0,0 +1,78 @@
+'''
+`SimulateEnsemble` against `Simulate` run for each member on its own, with
+the burst and touchdown events of the default scenario. The balloons burst
+at 3.2 m (near 7 km) instead of 13, for short flights.
+'''
+import contextlib
+import io
+import numpy as np
+import pytest
+from Simulator import Simulate, SimulateEnsemble
+from benchmarks.scenario import make_balloon
+
+payloads = (2.5, 3.0, 3.5)
+time_end = 60 * 60
+time_step = 1.0
+
+
+def observe(balloon):
+    def observer(t, state):
+        return {'volume': balloon.derived(state[0], state[1], state[2], state[5])['volume']}
+    return observer
+
+
+@pytest.fixture(scope='module')
+def balloon():
+    with contextlib.redirect_stdout(io.StringIO()):
+        balloon = make_balloon()
+    balloon.r_f = 1.6
+    return balloon
+
+
+@pytest.fixture(scope='module')
+def members(balloon):
+    balloon.m_payload = np.array(payloads)
+    state = balloon.ensemble(len(payloads))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return SimulateEnsemble(state, balloon.EnsembleModel, time_end=time_end, time_step=time_step,
+                                    events=balloon.events(), update=balloon.Update, observer=observe(balloon))
+    finally:
+        balloon.m_payload = 3.0
+
+
+@pytest.fixture(scope='module')
+def alone(balloon):
+    trajectories = []
+    for payload in payloads:
+        balloon.m_payload = payload
+        with contextlib.redirect_stdout(io.StringIO()):
+            trajectories.append(Simulate(balloon.initial_state(), balloon.Model, time_end=time_end,
+                                         time_step=time_step, events=balloon.events(), update=balloon.Update))
+    balloon.m_payload = 3.0
+    return trajectories
+
+
+def test_members_match_simulate(members, alone):
+    for member, trajectory in zip(members, alone):
+        assert [e.name for e in member.events] == ['burst', 'touchdown']
+        assert [e.time for e in member.events] == pytest.approx([e.time for e in trajectory.events], abs=1e-9)
+        assert np.allclose(member.time, trajectory.time, rtol=1e-12, atol=0)
+        assert np.allclose(member.state, trajectory.state, rtol=1e-9, atol=1e-9)
+
+
+def test_members_stop_at_touchdown(members):
+    touchdowns = [member.events[-1].time for member in members]
+    # Heavier payloads land at other times, the first ones wait for the last
+    assert len(set(touchdowns)) == len(members)
+    for member, touchdown in zip(members, touchdowns):
+        assert member.time[-1] == touchdown
+        assert member['altitude'].min() >= -1e-6
+        assert member['phase'][-1] == 2
+
+
+def test_observer(balloon, members):
+    for member in members:
+        assert member.channels == ['volume']
+        expected = balloon.derived(member['altitude'], member['velocity'], member['gas_mass'], member['phase'])
+        assert np.allclose(member['volume'], expected['volume'], rtol=1e-12)
@@ -0,0 +1,71 @@
+'''
+Events of the Simulator on a state whose first row is the time itself, so
+that every crossing is known exactly
+'''
+import contextlib
+import io
+import numpy as np
+import pytest
+from Events import Event
+from Simulator import Simulate, SimulateEnsemble
+
+
+def model(t, state):
+    rates = np.zeros_like(state, dtype=float)
+    rates[0] = 1
+    return rates
+
+
+def scalar_model(t, state):
+    return (1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+def mark(phase: float):
+    def action(t, state):
+        state = state.copy()
+        state[5] = phase
+        return state
+    return action
+
+
+def crossing(level: float, phase: float, terminal: bool = False) -> Event:
+    return Event(f'at {level:g}', lambda t, state: state[0] - level, direction=1,
+                 terminal=terminal, action=mark(phase))
+
+
+def simulate(method: str, events: list[Event]):
+    options = dict(time_step=0.1, method='rk45', max_step=1) if method == 'rk45' else dict(time_step=1, method=method)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Simulate(np.zeros((9, 1)), scalar_model if method == 'rk4_scalar' else model,
+                        time_end=4, events=events, **options)
+
+
+@pytest.mark.parametrize('method', ['rk4', 'rk4_scalar', 'rk45'])
+def test_events_in_the_same_step(method):
+    # Both in the first step of the fixed step methods
+    result = simulate(method, [crossing(0.3, 1), crossing(0.7, 2)])
+    assert [e.name for e in result.events] == ['at 0.3', 'at 0.7']
+    assert [e.time for e in result.events] == pytest.approx([0.3, 0.7], abs=1e-9)
+    assert result['phase'][-1] == 2
+    assert result['altitude'][-1] == pytest.approx(4)
+
+
+@pytest.mark.parametrize('method', ['rk4', 'rk4_scalar', 'rk45'])
+def test_terminal_event_after_another(method):
+    result = simulate(method, [crossing(0.3, 1), crossing(0.7, 2, terminal=True)])
+    assert [e.time for e in result.events] == pytest.approx([0.3, 0.7], abs=1e-9)
+    assert result.time[-1] == pytest.approx(0.7)
+    assert result['phase'][-1] == 2
+
+
+def test_ensemble_events_in_the_same_step():
+    state = np.zeros((9, 2))
+    # The second member starts later, it sees both events in its second step
+    state[0, 1] = -0.5
+    with contextlib.redirect_stdout(io.StringIO()):
+        members = SimulateEnsemble(state, model, time_end=4, time_step=1,
+                                   events=[crossing(0.3, 1), crossing(0.7, 2, terminal=True)])
+    for member, start in zip(members, (0, 0.5)):
+        assert [e.time for e in member.events] == pytest.approx([0.3 + start, 0.7 + start], abs=1e-9)
+        assert member.time[-1] == pytest.approx(0.7 + start)
+        assert member['phase'][-1] == 2
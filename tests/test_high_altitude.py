@@ -0,0 +1,62 @@
+'''
+The interpolators of a HD forecast near the top of its levels (10 mbar), on
+the pressure levels and after `regridAltitude`: both go over to the high
+altitude SD data above it
+'''
+import contextlib
+import io
+from datetime import datetime
+import numpy as np
+import pytest
+from benchmarks.synthetic import hd_handler
+
+names = ('u', 'v', 't')
+
+
+@pytest.fixture(scope='module')
+def handler():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return hd_handler(-21.9, -47.0, datetime(2023, 3, 1, 12))
+
+
+@pytest.fixture(scope='module')
+def points(handler):
+    '''Random points of the grid, from 4 km below the top of the HD columns to 6 km above'''
+    altitudeMap = handler.altitudeMap
+    top = handler.altitudeData[:, :, -1, :].mean()
+    rng = np.random.default_rng(0)
+    axes = [altitudeMap.fwdLatitude, altitudeMap.fwdLongitude, altitudeMap.fwdTime]
+    lat, lon, time = [rng.uniform(np.min(axis), np.max(axis), 300) for axis in axes]
+    return lat, lon, rng.uniform(top - 4e3, top + 6e3, 300), time
+
+
+@pytest.fixture(scope='module')
+def paths(handler, points):
+    '''Each variable on the pressure levels and regridded, alone and stacked'''
+    values = {}
+    for path in ('pressure', 'regridded'):
+        if path == 'regridded':
+            with contextlib.redirect_stdout(io.StringIO()):
+                handler.regridAltitude()
+        values[path] = np.array([interpolator(*points) for interpolator in handler.interpolateData(*names)])
+        values[path + ' stacked'] = handler.interpolateStacked(*names)(*points)
+    return values
+
+
+def test_paths_agree(paths):
+    # Between the lowest column top and the local one, the regridded path
+    # already uses the SD data and the pressure levels still the HD data
+    for path, values in paths.items():
+        assert np.allclose(values, paths['pressure'], rtol=0, atol=0.05), path
+
+
+def test_high_altitude_data_above_the_top(handler, points, paths):
+    lat, lon, alt, time = points
+    sd = handler._highAltitudeGFS
+    # Above every column of the HD data
+    high = alt > handler.altitudeData[:, :, -1, :].max()
+    assert 0 < high.sum() < len(high)
+    expected = sd.interpolateStacked(*names)(lat[high], lon[high], alt[high], time[high])
+    # The SD handler is regridded too by then, to within its own regridding
+    for path, values in paths.items():
+        assert np.allclose(values[:, high], expected, rtol=0, atol=0.05), path
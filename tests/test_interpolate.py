@@ -0,0 +1,90 @@
+'''
+The array lookups of `thirdparty.interpolate` against the scalar ones, on
+the grid values themselves, where the cell boundary convention matters
+'''
+from datetime import datetime
+import numpy as np
+import pytest
+from thirdparty.interpolate import AxisLocator, Linear4DInterpolator
+from benchmarks.synthetic import synthetic_handler
+
+axes = {'uniform': np.arange(-30, 30.5, 0.5),
+        'irregular': np.array([1.0, 2.0, 5.0, 7.0, 10.0, 20.0, 30.0, 50.0]),
+        'decreasing': np.array([1000.0, 850.0, 700.0, 500.0, 300.0, 100.0, 10.0])}
+
+
+@pytest.mark.parametrize('name', list(axes))
+def test_locate_matches_scalar(name):
+    values = axes[name]
+    locator = AxisLocator(values)
+    rng = np.random.default_rng(0)
+    low, high = values.min(), values.max()
+    points = np.concatenate([values, rng.uniform(low, high, 1000), [low, high]])
+    expected = [AxisLocator(values)(x) for x in points.tolist()]
+    assert locator.locate(points).tolist() == expected
+    if not locator.decreasing:
+        # The convention of numpy.digitize, moved back by 1 past the upper limit
+        assert expected == np.minimum(np.digitize(points, values), len(values) - 1).tolist()
+
+
+def test_longitudes_across_180():
+    longitudes = np.concatenate([np.arange(178, 180.5, 0.5), np.arange(-179.5, -177.5, 0.5)])
+    axes = [np.arange(-2., 3.), longitudes, np.array([1000., 850., 700.]), np.arange(0., 1.5, 0.5)]
+    data = np.random.default_rng(0).normal(size=[len(axis) for axis in axes] + [2])
+    data_map = [axis.tolist() for axis in axes] + [{value: i for i, value in enumerate(axis.tolist())}
+                                                    for axis in axes]
+    interpolator = Linear4DInterpolator(data, data_map)
+    assert interpolator._locators[1] is None
+
+    rng = np.random.default_rng(1)
+    lon = np.concatenate([longitudes, rng.uniform(178, 180, 200), rng.uniform(-180, -178, 200)])
+    idx0, idx1 = interpolator._longitudeLocator.locate(lon)
+    assert [[i0, i1] for i0, i1 in zip(idx0.tolist(), idx1.tolist())] == \
+        [interpolator._longitudeIndices(x) for x in lon.tolist()]
+
+    lat, press, time = rng.uniform(-2, 2, len(lon)), rng.uniform(700, 1000, len(lon)), rng.uniform(0, 1, len(lon))
+    floats = np.array([interpolator(*point) for point in zip(lat.tolist(), lon.tolist(),
+                                                             press.tolist(), time.tolist())]).T
+    assert np.allclose(interpolator(lat, lon, press, time), floats, rtol=1e-12, atol=1e-12)
+
+
+@pytest.fixture(scope='module')
+def handler():
+    return synthetic_handler(-21.9, -47.0, datetime(2023, 3, 1, 12))
+
+
+def grid_points(handler):
+    '''Every combination of a few grid values of each axis, edges included'''
+    altitudeMap = handler.altitudeMap
+    axes = [altitudeMap.fwdLatitude, altitudeMap.fwdLongitude, altitudeMap.fwdTime]
+    picks = [[values[0], values[1], values[len(values) // 2], values[-1]] for values in axes]
+    return [np.ravel(axis) for axis in np.meshgrid(*picks, indexing='ij')]
+
+
+def test_interpolator_arrays_on_grid(handler):
+    interpolator = handler.interpolateStacked('u', 'v')
+    lat, lon, time = grid_points(handler)
+    pressures = handler.altitudeMap.fwdPressure
+    press = np.resize([pressures[0], pressures[len(pressures) // 2], pressures[-1]], len(lat))
+    arrays = interpolator(lat, lon, press, time)
+    floats = np.array([interpolator(*point) for point in zip(lat.tolist(), lon.tolist(),
+                                                             press.tolist(), time.tolist())]).T
+    assert np.allclose(arrays, floats, rtol=1e-12, atol=1e-12)
+
+
+def test_altitude_columns_on_grid(handler):
+    lat, lon, time = grid_points(handler)
+    columns = handler._altitude_columns(lat, lon, time)
+    for i, point in enumerate(zip(lat.tolist(), lon.tolist(), time.tolist())):
+        assert np.allclose(columns[i], handler._altitude_column(*point), rtol=1e-14, atol=0)
+
+
+def test_numpy_scalar_time(handler):
+    interpolator = handler.interpolateData('wind_u')
+    lat, lon, time = (float(np.mean(axis)) for axis in grid_points(handler))
+    expected = interpolator(lat, lon, 1000., time)
+    assert isinstance(expected, float)
+    for value in (np.float64(time), np.float32(time), np.array(time)):
+        assert interpolator(lat, lon, 1000., value) == pytest.approx(expected, rel=1e-6)
+    # Not in GFS units
+    assert interpolator(lat, lon, 1000., datetime(2023, 3, 1, 12)) is None
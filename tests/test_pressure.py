@@ -0,0 +1,69 @@
+'''
+Altitude to pressure inversion of the forecast (`_pressure_interpolator`)
+against the spline root it replaced, on columns taken from the standard
+atmosphere, which isn't exponential in pressure, so log-pressure
+interpolation isn't exact by construction
+'''
+from datetime import datetime
+import numpy as np
+import pytest
+from benchmarks.pressure import spline
+from benchmarks.synthetic import standard_handler, isa_pressure, first_gfs_time
+
+start_date = datetime(2023, 3, 1, 12)
+# Relative pressure difference allowed against the spline
+tolerance = 1e-2
+
+
+@pytest.fixture(scope='module')
+def handler():
+    return standard_handler(-21.9, -47.0, start_date)
+
+
+@pytest.fixture(scope='module')
+def points(handler):
+    rng = np.random.default_rng(1)
+    calls = 3000
+    return list(zip(rng.uniform(-23, -21, calls).tolist(),
+                    rng.uniform(-48, -46, calls).tolist(),
+                    rng.uniform(200, 45e3, calls).tolist(),
+                    (handler.getGFStime(start_date) + rng.uniform(0, 0.3, calls)).tolist()))
+
+
+def true_pressure(handler, lat, lon, alt, time) -> float:
+    '''Pressure of the profile the columns were made from (same tilt)'''
+    return float(isa_pressure(alt - 20 * (lat - handler.lat) - 5 * (time - first_gfs_time)))
+
+
+def test_agrees_with_spline(handler, points):
+    for point in points:
+        assert abs(handler._pressure_interpolator(*point) / spline(handler, *point) - 1) < tolerance, point
+
+
+def test_error_to_profile(handler, points):
+    low, high, spline_high = [], [], []
+    for point in points:
+        error = abs(handler._pressure_interpolator(*point) / true_pressure(handler, *point) - 1)
+        if point[2] < 16e3:
+            low.append(error)
+        else:
+            high.append(error)
+            spline_high.append(abs(spline(handler, *point) / true_pressure(handler, *point) - 1))
+    # The levels are close together in the troposphere, further apart above,
+    # where log-pressure follows the profile better than the spline
+    assert max(low) < 1e-3
+    assert max(high) < 1e-2
+    assert max(high) <= max(spline_high)
+
+
+def test_arrays_match_floats(handler, points):
+    floats = np.array([handler._pressure_interpolator(*point) for point in points])
+    arrays = handler._pressure_interpolator(*(np.array(axis) for axis in zip(*points)))
+    assert np.allclose(arrays, floats, rtol=1e-12, atol=0)
+
+
+def test_nearest_level_outside_columns(handler):
+    time = handler.getGFStime(start_date)
+    pressures = handler.altitudeMap.fwdPressure
+    assert handler._pressure_interpolator(-21.9, -47.0, -500.0, time) == pressures[0]
+    assert handler._pressure_interpolator(-21.9, -47.0, 60e3, time) == pressures[-1]
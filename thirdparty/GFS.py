@@ -10,19 +10,20 @@ documentation for use
 University of Southampton
 """
 from datetime import datetime, timedelta
-from math import floor, ceil
+from math import floor, ceil, exp
 # from six.moves import range, builtins
 import builtins
-from urllib.request import urlopen
+import json
+import os
 import logging
-import grequests
+import numbers
+import time
 import itertools
 import numpy
-from scipy.interpolate import UnivariateSpline
-import urllib.parse
 
 from . import global_tools as tools
-from .interpolate import Linear4DInterpolator
+from .download import Downloader
+from .interpolate import AxisLocator, Linear4DInterpolator, isScalar, LongitudeLocator
 
 # Error and warning logger
 logger = logging.getLogger(__name__)
@@ -38,40 +39,46 @@ except AttributeError:
         return func
 
 
-def get_urldict_async(urls_dict, hooks_dict=None):
-    """An asynchronous helper function for making multiple url requests per
-    key in url_dict
+def get_urldict_async(urls_dict, downloader=None, progressHandler=None):
+    """A helper function for making multiple url requests per key in
+    url_dict concurrently
 
-    Uses grequests to produce the requests concurrently.
+    Uses a download.Downloader to produce the requests concurrently.
 
     Parameters
     ----------
     url_dict : dict of lists
         (key: [url1, url2...]) pairs for logically related urls.
 
-    hooks_dict : dict
-        The post request hook for response processing (see requests lib for
-        examples)
+    [downloader] : :obj:`download.Downloader` (default None)
+        The downloader used for the requests. A new one is created if None.
+
+    [progressHandler] : function (default None)
+        Called with (completed, total) every time a request finishes.
 
     Returns
     -------
     results_dict: dict of list
-        (key: [reponse_text1, reponse_text2, ...]) for all keys in url_dict
+        (key: [reponse_text1, reponse_text2, ...]) for all keys in url_dict.
+        The value is None for the keys with any failed request, or with any
+        response not containing data (GFS cycle not found).
     """
+    if downloader is None:
+        downloader = Downloader()
     # first get all urls as a list
     urls_list = list(itertools.chain.from_iterable(urls_dict.values()))
-    reqs = (grequests.get(u, hooks=hooks_dict) for u in urls_list)
-    responses = grequests.map(reqs)
-    results = {urllib.parse.unquote(r.url): r.text for r in responses}
-    if any(result[0] == "<" for result in results.values()):
-        logger.debug("GFS cycle not found.")
-        return
-    else:
-        # get the url expected at each location for each key in url_dict, then
-        # insert the retrieved data at this location
-        results_dict = {key: [results[url] for url in url_list] for key, url_list in urls_dict.items()}
-        return results_dict
+    results = downloader.fetch(urls_list, progressHandler)
 
+    # get the url expected at each location for each key in url_dict, then
+    # insert the retrieved data at this location
+    results_dict = {}
+    for key, url_list in urls_dict.items():
+        responses = [results[url] for url in url_list]
+        if any(not response or response[0] == "<" for response in responses):
+            logger.debug("GFS cycle not found.")
+            responses = None
+        results_dict[key] = responses
+    return results_dict
 
 
 class GFS_Handler(object):
@@ -101,8 +108,9 @@ class GFS_Handler(object):
     [forecastDuration] : scalar (default 4)
         the duration in hours of the forecast data required.
     [use_async] : bool (default True)
-        Use an asynchronous request for downloads. This should speed up the
-        download, but may incur larger memory overhead for large forecastDuration.
+        Request all the variables (and, in HD, the high altitude SD data) in
+        one concurrent batch. This should speed up the download, but may
+        incur larger memory overhead for large forecastDuration.
     [requestSimultaneous] : bool (default True)
         If True, populate a dictionary of responses from the web download
         requests, then process the data. If False, each response will be
@@ -119,6 +127,19 @@ class GFS_Handler(object):
     [progressHandler] : function (default None)
         Progress for each downloaded parameter (in %) will be passed to this
         function, if provided.
+    [cache_dir] : string (default None)
+        If given, the parsed data matrices and maps of every download are
+        stored in this directory, one .npz file per variable, named after the
+        HD/SD service, the cycle and the requested index window. Later
+        downloads of the same cycle and window are loaded from there,
+        without any request to the NOAA servers: a cached cycle is used
+        without probing the newer ones again, unless the cycle index
+        already knows a newer one to be available.
+    [server_url] : string (default None)
+        Base URL of the GFS DODS service, under which the gfs_0p25/ and
+        gfs_0p50/ datasets are found. If None, the NOAA NOMADS server is
+        used. Mostly useful to point the downloads at a mirror or at a local
+        stand-in.
 
     Notes
     -----
@@ -151,7 +172,7 @@ class GFS_Handler(object):
 
     def __init__(self, lat, lon, date_time, HD=True, forecastDuration=4,
         use_async=True, requestSimultaneous=True, debugging=False,
-        progressHandler=None):
+        progressHandler=None, cache_dir=None, server_url=None):
         # Initialize Parameters
         self.launchDateTime = date_time
         self.lat = lat
@@ -162,12 +183,32 @@ class GFS_Handler(object):
         self.requestSimultaneous = requestSimultaneous
         self.cycleDateTime = None
         self.firstAvailableTime = None
+        self.cache_dir = cache_dir
+        self.serverURL = server_url or 'https://nomads.ncep.noaa.gov/dods/'
+        # Shared by all the requests, so that connections are reused
+        self.downloader = Downloader()
+        # Cycles known to be available or missing on the server, kept with
+        # the cache if there is one
+        self.cycleIndex = GFS_Cycle_Index(
+            os.path.join(cache_dir, 'gfs_cycles.json') if cache_dir else None)
+        # Log of the pressure levels of altitudeMap, as (map, levels)
+        self._logPressure = (None, None)
+        # Cell locators of the latitude, longitude and time of altitudeMap,
+        # as (map, locators)
+        self._columnLocators = (None, None)
+        # Same for arrays of coordinates, as (map, grid): the locators, axes
+        # and pressure levels as arrays
+        self._columnGrid = (None, None)
+        # altitudeData with the levels of each grid point contiguous, as
+        # (data, columns)
+        self._columnData = (None, None)
 
         # These are the 4D data matrices with all the information needed.
         self.altitudeData = None
         self.temperatureData = None
-        self.windDirData = None
-        self.windSpeedData = None
+        # Winds are kept as u (eastward) and v (northward) components in m/s
+        self.windUData = None
+        self.windVData = None
 
         # These are variables storing the mapping criteria of the 4D matrices.
         # They are arrays of dictionaries, one per dimension (i.e. axis) of the
@@ -177,6 +218,15 @@ class GFS_Handler(object):
         self.temperatureMap = None
         self.windsMap = None
 
+        # Temperature, winds and pressure resampled on geometric altitude
+        # levels by regridAltitude, and the map of these levels (its pressure
+        # axis holds altitudes). None until regridAltitude is called.
+        self.altitudeLevels = None
+        self.temperatureByAltitude = None
+        self.windUByAltitude = None
+        self.windVByAltitude = None
+        self.pressureByAltitude = None
+
         requestAllLongitudes = False
         multipleRequests = False
 
@@ -213,7 +263,9 @@ class GFS_Handler(object):
             #   self.HD is True
             # Prepare download of high altitude SD data
             self._highAltitudeGFS = GFS_High_Altitude_Handler(lat,
-                lon, date_time, forecastDuration, debugging)
+                lon, date_time, forecastDuration, debugging,
+                cache_dir=cache_dir, server_url=server_url)
+            self._highAltitudeGFS.downloader = self.downloader
             self._highAltitudePressure = None
         else:
             self.latStep = 0.5
@@ -304,9 +356,9 @@ class GFS_Handler(object):
                 }[self.HD]
 
         # The base URL depends on whether the HD service has been requested.
-        self.baseURL = {
-            True: 'https://nomads.ncep.noaa.gov/dods/gfs_0p25/',
-            False: 'https://nomads.ncep.noaa.gov/dods/gfs_0p50/'
+        self.baseURL = self.serverURL + {
+            True: 'gfs_0p25/',
+            False: 'gfs_0p50/'
         }[self.HD]
 
         if debugging:
@@ -317,7 +369,8 @@ class GFS_Handler(object):
         logger.setLevel(log_lev)
 
 
-    def _get_NOAA_REST_url(self, requestVar, requestLongitude, cycle, requestTime):
+    def _get_NOAA_REST_url(self, requestVar, requestLongitude, cycle, requestTime,
+                           requestAltitude=None, requestLatitude=None):
         """
         Parameters
         ----------
@@ -334,12 +387,20 @@ class GFS_Handler(object):
             The cycle datetime for which to obtain the forecast
         requestTime : :obj:`datetime.datetime`
             The launch datetime for which to obtain the forecast
+        [requestAltitude] : list of int, length 2 (default None)
+            The [start, end] window of altitude, if not self.requestAltitude
+        [requestLatitude] : list of int, length 2 (default None)
+            The [start, end] window of latitude, if not self.requestLatitude
 
         returns
         -------
         requestURL : string
             The noaa API request url
         """
+        if requestAltitude is None:
+            requestAltitude = self.requestAltitude
+        if requestLatitude is None:
+            requestLatitude = self.requestLatitude
         requestURL = '%sgfs%d%02d%02d/gfs_%s_%02dz.ascii?%s[%d:%d][%d:%d][%d:%d][%d:%d]' % (
                 self.baseURL,
                 cycle.year,
@@ -349,12 +410,23 @@ class GFS_Handler(object):
                 cycle.hour,
                 requestVar,
                 requestTime[0], requestTime[1],
-                self.requestAltitude[0], self.requestAltitude[1],
-                self.requestLatitude[0], self.requestLatitude[1],
+                requestAltitude[0], requestAltitude[1],
+                requestLatitude[0], requestLatitude[1],
                 requestLongitude[0], requestLongitude[1]
             )
         return requestURL
 
+    def _get_NOAA_probe_url(self, cycle, requestTime):
+        """
+        The url of a request for the temperature of a single point of the
+        grid at all the requested times: the smallest request that tells
+        whether the cycle has all the data needed.
+        """
+        return self._get_NOAA_REST_url('tmpprs', [self.requestLongitudes[0][0]] * 2,
+                                       cycle, requestTime,
+                                       requestAltitude=[self.requestAltitude[0]] * 2,
+                                       requestLatitude=[self.requestLatitude[0]] * 2)
+
     def _NOAA_request(self, requestVar, cycle, requestTime):
         """
         Parameters
@@ -375,28 +447,21 @@ class GFS_Handler(object):
         dataResults : list
             list of responses for each request longitude
         """
-        dataResults = []
-
         # Check if we need more than 1 request (ie if we are crossing
         # the Greenwich meridian)
-        for requestLongitude in self.requestLongitudes:
-
-            requestURL = self._get_NOAA_REST_url(requestVar, requestLongitude, cycle, requestTime)
-
+        requestURLs = [self._get_NOAA_REST_url(requestVar, requestLongitude, cycle, requestTime)
+                       for requestLongitude in self.requestLongitudes]
+        for requestURL in requestURLs:
             logger.debug('Requesting URL: %s' % requestURL)
 
-            try:
-                HTTPresponse = urlopen(requestURL)
-                response = HTTPresponse.read().decode('utf-8')
-            except:
-                logger.exception(
-                    'Error while connecting to the GFS server.')
-                return
-            if response[0] == "<":
-                logger.debug("GFS cycle not found.")
-                return
-            else:
-                dataResults.append(response)
+        responses = self.downloader.fetch(requestURLs)
+        dataResults = [responses[requestURL] for requestURL in requestURLs]
+        if any(response is None for response in dataResults):
+            logger.error('Error while connecting to the GFS server.')
+            return
+        if any(not response or response[0] == "<" for response in dataResults):
+            logger.debug("GFS cycle not found.")
+            return
         return dataResults
 
     @profile
@@ -488,11 +553,12 @@ class GFS_Handler(object):
 
     def _NOAA_request_all_async(self, cycle, requestTime, progressHandler):
         """Collects all urls for noaa data requests for parameters in
-        self.weatherParameters, then submits a combined request asynchronously.
+        self.weatherParameters, then submits a combined concurrent request.
 
-        Offers a concurrent, asynchronous alternative to the standard approach
-        for getting urls one at a time, as is done with self._NOAA_request.
-        This method uses asyncio. See notes for benchmarking.
+        Offers a concurrent alternative to the standard approach for getting
+        urls one at a time, as is done with self._NOAA_request. In HD, the
+        requests of the high altitude SD handler are made in the same batch,
+        and its forecast is stored if they all succeed.
 
         Parameters
         ----------
@@ -509,45 +575,65 @@ class GFS_Handler(object):
 
         Returns
         -------
-        result : list of strings
-            The (utf-8) decoded response string from the request
-
+        results : dict
+            ('noaa_name' : response) pairs as in _NOAA_request_all, or None
+            if any of the requests of this handler failed.
 
         Notes
         -----
-        * This method has been benchmarked, and should be approximately 80% than
-        the standard method in self._NOAA_request.
-        * asyncio was also trialled, for which it was found that the
-        performance difference was about the same, on average. asyncio also
-        required code that was less readable, and that also hid log messages.
+        * The requests go through self.downloader, which keeps the
+        connections alive, limits the simultaneous requests to the server and
+        retries the failed ones with exponential backoff. See
+        download.Downloader.
         """
-        urls = {}
         progressHandler(0, 1)
 
-        logger.debug('Requesting weather urls asynchronously: status will be sent to requests logger')
+        logger.debug('Requesting weather urls concurrently: status will be sent to the download logger')
 
-        for var in self.weatherParameters.keys():
-            urls[var] = [self._get_NOAA_REST_url(var, reqLon, cycle, requestTime)
-                for reqLon in self.requestLongitudes]
+        handlers = [self]
+        if self.HD and self._highAltitudeGFS.temperatureData is None:
+            handlers.append(self._highAltitudeGFS)
 
-        progress_increment = 1./sum([len(url_list) for url_list in urls.values()])
-        # Have to keep a mutable progress dict to be updated by the hook
-        # function:
-        progress = [0]
-        def increment_progress(reponse, *args, **kwargs):
-            # Hook function that updates a progress file via progressHandler.
-            # args do nothing, but will be passed by the request hook anyway,
-            # so need to do a type of hack that will ignore those inputs
-            progress[0] += progress_increment
-            logger.debug('Updating Download progress: {}%% complete'.format(100*progress[0]))
-            progressHandler(progress[0], 1)
-
-        # Note: currently omiting the hook function, as it doesn't seem to
-        # write to the file after the first update
-        results = get_urldict_async(urls, hooks_dict={'response': increment_progress})
+        urls = {}
+        for handler in handlers:
+            for var in handler.weatherParameters.keys():
+                urls[(handler, var)] = [handler._get_NOAA_REST_url(var, reqLon, cycle, requestTime)
+                    for reqLon in handler.requestLongitudes]
+
+        def increment_progress(completed, total):
+            logger.debug('Updating Download progress: {}%% complete'.format(100. * completed / total))
+            progressHandler(completed / total, 1)
+
+        results = get_urldict_async(urls, self.downloader, increment_progress)
+
+        if len(handlers) > 1:
+            highAltitudeResults = {var: results[(self._highAltitudeGFS, var)]
+                                   for var in self.weatherParameters.keys()}
+            if all(highAltitudeResults.values()):
+                self._highAltitudeGFS._storeDownload(cycle, requestTime, highAltitudeResults)
+            else:
+                # downloadForecast will look for it on its own
+                logger.debug('High altitude forecast not found for this cycle.')
 
+        results = {var: results[(self, var)] for var in self.weatherParameters.keys()}
+        if not all(results.values()):
+            return
         return results
 
+    def _storeDownload(self, cycle, requestTime, results):
+        """Parses and stores the responses of a download made on behalf of
+        this handler (see _NOAA_request_all_async), as getNOAAData and
+        downloadForecast would have done."""
+        data_matrices = {}
+        data_maps = {}
+        for requestVar, dataResults in results.items():
+            data_matrices[requestVar], data_maps[requestVar] =\
+                self._generate_matrix(dataResults)
+        self.cycleDateTime = cycle
+        self.firstAvailableTime = cycle + timedelta(hours=requestTime[0] * 3)
+        self._save_cache(cycle, requestTime, data_matrices, data_maps)
+        self._storeForecast(data_matrices, data_maps)
+
     def getNOAAMatricesMapsCycle(self, thisCycle, requestTime, progressHandler):
         """For an input cycle, this function will load all weather variables.
 
@@ -618,19 +704,17 @@ class GFS_Handler(object):
 
         else:
             for ivar, requestVar in enumerate(self.weatherParameters.keys()):
-                # Convert the data to matrix and map and store progress
-                for i in range(5):
-                    if requestVar not in data_matrices:
-                        data_matrix, data_map = \
-                            self.processNOAARequest(requestVar, thisCycle,
-                                                    requestTime)
-                        if data_map:
-                            progressHandler(1. / len(self.weatherParameters) * (ivar+1), 1)
-                            data_matrices[requestVar], data_maps[requestVar] =\
-                                data_matrix, data_map
-                        else:
-                            raise RuntimeError("'{}' data failed to download for this cycle. Cannot proceed.".format(requestVar))
-                            
+                # Convert the data to matrix and map and store progress. The
+                # downloader already retries the failed requests.
+                data_matrix, data_map = \
+                    self.processNOAARequest(requestVar, thisCycle,
+                                            requestTime)
+                if not data_map:
+                    raise RuntimeError("'{}' data failed to download for this cycle. Cannot proceed.".format(requestVar))
+                progressHandler(1. / len(self.weatherParameters) * (ivar+1), 1)
+                data_matrices[requestVar], data_maps[requestVar] =\
+                    data_matrix, data_map
+
         # If it got here, the GFS was found: break the outer loop
         return data_matrices, data_maps
 
@@ -661,6 +745,34 @@ class GFS_Handler(object):
         data_maps : dict
             keys as in data_matrices, but values instead contain the data_maps
         """
+        thisCycle, requestTime = self._availableCycle(simulationDateTime,
+                                                      latestCycleDateTime)
+        self.cycleDateTime = thisCycle
+        # This stores the actual time of the first dataset downloaded. It's
+        # going to be used to convert real time to GFS "time coordinates"
+        # (see getGFStime(time) function)
+        self.firstAvailableTime = self.cycleDateTime + timedelta(hours=requestTime[0] * 3)
+
+        # Already downloaded: no need to go to the server at all
+        cached = self._load_cache(thisCycle, requestTime)
+        if cached:
+            logger.debug('Cycle data loaded from the cache.')
+            return cached
+
+        # Main download
+        data_matrices, data_maps = self.getNOAAMatricesMapsCycle(
+            thisCycle, requestTime, progressHandler)
+
+        if not (data_matrices and data_maps):
+            raise RuntimeError('No available GFS cycles found!')
+        self._save_cache(thisCycle, requestTime, data_matrices, data_maps)
+        return data_matrices, data_maps
+
+    def _availableCycle(self, simulationDateTime, latestCycleDateTime):
+        """
+        Returns the (cycle, requestTime) of the newest cycle available on
+        the server, going back from latestCycleDateTime. See getNOAAData.
+        """
         #######################################################################
         # TRY TO DOWNLOAD DATA WITH THE LATEST CYCLE. IF NOT AVAILABLE, TRY
         # WITH AN EARLIER ONE
@@ -673,51 +785,156 @@ class GFS_Handler(object):
         # latest cycle is not guaranteed to be available. If data is not
         # available, it tries with 1 cycle older, until one is found with data
         # available. If no cycles are found, the method raises a runtime error.
-
+        # The cycles are looked for a few at a time, as many as the downloader
+        # requests at once from the server (see _newestAvailableCycle).
+        candidates = []
         for pastCycle in range(25):
-            logger.debug('Attempting to download cycle data.')
             thisCycle = latestCycleDateTime - timedelta(hours=pastCycle * 6)
-            self.cycleDateTime = thisCycle
-
-            # Initialize time parameter
-            timeFromForecast = simulationDateTime - thisCycle
-            hoursFromForecast = timeFromForecast.total_seconds() / 3600.
-
-            # GFS time index for the first dataset to be requested
-            # (1 GFS index = three hours)
-            requestTime = floor(hoursFromForecast / 3.)
-
-            # This stores the actual time of the first dataset downloaded. It's
-            # going to be used to convert real time to GFS "time coordinates"
-            # (see getGFStime(time) function)
-            self.firstAvailableTime = self.cycleDateTime + timedelta(hours=requestTime * 3)
-
-            # Always download an extra time dataset
-            # PChambers note: probably +1 because of the index slicing system
-            # used on the GFS servers, i.e., times 0:5 will get times
-            # 0, 1, 2, 3 and 4
-            requestTime = [requestTime, requestTime + ceil(
-                self.forecastDuration / 3.) + 1]
-            thisCycle = latestCycleDateTime - timedelta(hours=pastCycle * 6)
-            self.cycleDateTime = thisCycle
-
-            # Probe the system to see if data is available for this cycle:
-            dataResults = self._NOAA_request('tmpprs', thisCycle,
-                [requestTime[0], requestTime[0] + 1])
+            candidates.append((thisCycle, self._requestTime(simulationDateTime, thisCycle)))
+
+        # A cycle in the cache covers the whole simulation already: nothing
+        # is probed, a newer cycle is only used if the index knows that it is
+        # available
+        cached = self._newestCachedCycle(candidates)
+        if cached is not None:
+            for cycle, requestTime in candidates[:cached]:
+                if self.cycleIndex.lookup(self._cycle_key(cycle, requestTime)):
+                    return cycle, requestTime
+            return candidates[cached]
+
+        probeCycles = self.downloader.maxPerHost
+        for firstCycle in range(0, 25, probeCycles):
+            logger.debug('Looking for available cycles.')
+            found = self._newestAvailableCycle(candidates[firstCycle:firstCycle + probeCycles])
+            if found:
+                return found
+            logger.debug("Moving to older cycles")
+
+        raise RuntimeError('No available GFS cycles found!')
+
+    def _requestTime(self, simulationDateTime, cycle):
+        """The [first, last] GFS time indices to request from the cycle."""
+        # Initialize time parameter
+        timeFromForecast = simulationDateTime - cycle
+        hoursFromForecast = timeFromForecast.total_seconds() / 3600.
+
+        # GFS time index for the first dataset to be requested
+        # (1 GFS index = three hours)
+        requestTime = floor(hoursFromForecast / 3.)
+
+        # Always download an extra time dataset
+        # PChambers note: probably +1 because of the index slicing system
+        # used on the GFS servers, i.e., times 0:5 will get times
+        # 0, 1, 2, 3 and 4
+        return [requestTime, requestTime + ceil(self.forecastDuration / 3.) + 1]
+
+    def _newestCachedCycle(self, candidates):
+        """
+        Index of the first of the (cycle, requestTime) candidates with data
+        in the cache, or None if there is none or caching is off.
+        """
+        if self.cache_dir is None:
+            return None
+        for i, (cycle, requestTime) in enumerate(candidates):
+            if os.path.exists(self._cache_path('tmpprs', cycle, requestTime)):
+                return i
+        return None
+
+    def _newestAvailableCycle(self, candidates):
+        """
+        Returns the first of the (cycle, requestTime) candidates, newest
+        first, with data on the server, or None if there is none.
 
-            if (dataResults):
+        The candidates are looked up in self.cycleIndex first. Only the ones
+        still unknown are probed, all at once, with a request of a single
+        point of the grid (see _get_NOAA_probe_url), and the answers are
+        stored in the index.
+        """
+        keys = [self._cycle_key(cycle, requestTime) for cycle, requestTime in candidates]
+        available = []
+        for key in keys:
+            known = self.cycleIndex.lookup(key)
+            available.append(known)
+            # No need to know about the older ones
+            if known:
                 break
-            else:
-                logger.debug("Moving to next cycle")
 
-        # Main download
-        data_matrices, data_maps = self.getNOAAMatricesMapsCycle(
-            thisCycle, requestTime, progressHandler)
+        unknown = {i: self._get_NOAA_probe_url(*candidates[i])
+                   for i, known in enumerate(available) if known is None}
+        if unknown:
+            for requestURL in unknown.values():
+                logger.debug('Probing URL: %s' % requestURL)
+            responses = self.downloader.fetch(list(unknown.values()))
+            for i, requestURL in unknown.items():
+                response = responses[requestURL]
+                if response is None:
+                    # The server could not be reached: still unknown
+                    logger.error('Error while connecting to the GFS server.')
+                    continue
+                available[i] = bool(response) and response[0] != "<"
+                self.cycleIndex.record(keys[i], available[i])
+            self.cycleIndex.save()
+
+        for candidate, known in zip(candidates, available):
+            if known:
+                return candidate
+        logger.debug("GFS cycle not found.")
+        return None
 
-        if not (data_matrices and data_maps):
-            raise RuntimeError('No available GFS cycles found!')
+    def _cycle_key(self, cycle, requestTime):
+        """Key of the cycle and requested time window in self.cycleIndex."""
+        return 'gfs_%s_%s_%d-%d' % ({True: '0p25', False: '0p50'}[self.HD],
+                                    cycle.strftime('%Y%m%d%H'),
+                                    requestTime[0], requestTime[1])
+
+    def _cache_path(self, requestVar, cycle, requestTime):
+        """
+        Path of the cache file of one variable, for the cycle and the
+        requested time, altitude, latitude and longitude index windows.
+        """
+        window = '_'.join('%d-%d' % (first, last) for first, last in
+                          [requestTime, self.requestAltitude, self.requestLatitude] +
+                          self.requestLongitudes)
+        return os.path.join(self.cache_dir, 'gfs_%s_%s_%s_%s.npz' % (
+            {True: '0p25', False: '0p50'}[self.HD],
+            cycle.strftime('%Y%m%d%H'),
+            requestVar,
+            window))
+
+    def _load_cache(self, cycle, requestTime):
+        """
+        Returns the (data_matrices, data_maps) of getNOAAData from the cache,
+        or None if caching is off or any variable is missing.
+        """
+        if self.cache_dir is None:
+            return None
+        data_matrices = {}
+        data_maps = {}
+        for requestVar in self.weatherParameters.keys():
+            path = self._cache_path(requestVar, cycle, requestTime)
+            if not os.path.exists(path):
+                return None
+            with numpy.load(path) as cached:
+                data_matrices[requestVar] = cached['data']
+                data_maps[requestVar] = GFS_Map.fromAxes(cached['latitude'], cached['longitude'],
+                                                         cached['pressure'], cached['time'])
         return data_matrices, data_maps
 
+    def _save_cache(self, cycle, requestTime, data_matrices, data_maps):
+        """Stores the data downloaded by getNOAAData, if caching is on."""
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for requestVar, data_matrix in data_matrices.items():
+            path = self._cache_path(requestVar, cycle, requestTime)
+            # Written aside and renamed, so an interrupted run can't leave
+            # a partial file behind
+            temporary = path + '.tmp.npz'
+            numpy.savez(temporary, data=data_matrix, **data_maps[requestVar].toAxes())
+            os.replace(temporary, path)
+            logger.debug('{} data cached in {}'.format(
+                self.weatherParameters[requestVar], path))
+
     @profile
     def downloadForecast(self, progressHandler=None):
         """Connect to the Global Forecast System and download the closest cycle
@@ -726,7 +943,7 @@ class GFS_Handler(object):
 
         The cycle date and time is stored in the object's cycleDateTime
         variable, while the data and interpolation maps are stored in
-        [self.]temperatureData, altitudeData, windDirData, windSpeedData,
+        [self.]temperatureData, altitudeData, windUData, windVData,
         temperatureMap, etc.
 
         Parameters
@@ -771,39 +988,20 @@ class GFS_Handler(object):
                                        currentDateTime.day,
                                        cycleTime)
 
+        # Any high altitude forecast left from an earlier download is stale
+        if self.HD:
+            self._highAltitudeGFS.temperatureData = None
+
         data_matrices, data_maps = self.getNOAAData(simulationDateTime,
             latestCycleDateTime, progressHandler)
+        self._storeForecast(data_matrices, data_maps)
 
-#######################################################################
-        # PROCESS DATA AND PERFORM CONVERSIONS AS REQUIRED
-
-        # Convert temperatures from Kelvin to Celsius
-        data_matrices['tmpprs'] -= 273.15
-
-        # Convert geopotential height to geometric altitude
-        altitudeMatrix = (data_matrices['hgtprs'] * earthRadius /
-                          (earthRadius - data_matrices['hgtprs']))
-
-        # Convert u and v winds to wind direction and wind speed matrices
-
-        # Convert to KNOTS and the turn into direction and speed
-        self.windDirData, self.windSpeedData = tools.uv2dirspeed(
-            data_matrices['ugrdprs'],
-            data_matrices['vgrdprs'])
-
-        # Store results
-        self.temperatureData = data_matrices['tmpprs']
-        self.altitudeData = data_matrices['hgtprs']
-        self.windSpeedData *= 1.9438445    # Convert to knots
-
-        self.temperatureMap = data_maps['tmpprs']
-        self.altitudeMap = data_maps['hgtprs']
-        self.windsMap = data_maps['ugrdprs']
-
-        # DOWNLOAD HIGH ALTITUDE 0.5 x 0.5 DATA
+        # DOWNLOAD HIGH ALTITUDE 0.5 x 0.5 DATA, unless it already came in
+        # the same batch
         if (self.HD):
-            logger.debug('Preparing to download high altitude forecast...')
-            self._highAltitudeGFS.downloadForecast()
+            if self._highAltitudeGFS.temperatureData is None:
+                logger.debug('Preparing to download high altitude forecast...')
+                self._highAltitudeGFS.downloadForecast()
             self._highAltitudePressure = self._highAltitudeGFS.interpolateData('p')
 
         logger.debug('Forecast successfully downloaded!')
@@ -867,34 +1065,117 @@ class GFS_Handler(object):
             logger.debug('{} data processed.'.format(
                 requestReadableName))
 
+        module._storeForecast(data_matrices, data_maps)
+        return module
+
+    def _storeForecast(self, data_matrices, data_maps):
+        """Converts the parsed NOAA data matrices to the units used by the
+        interpolators and stores them, with their maps."""
         #######################################################################
         # PROCESS DATA AND PERFORM CONVERSIONS AS REQUIRED
 
-                # Convert temperatures from Kelvin to Celsius
+        # Convert temperatures from Kelvin to Celsius
         data_matrices['tmpprs'] -= 273.15
 
-        # Convert geopotential height to geometric altitude
-        altitudeMatrix = (data_matrices['hgtprs'] * earthRadius /
-                          (earthRadius - data_matrices['hgtprs']))
+        # Store results. Winds stay as u and v components in m/s, which can
+        # be interpolated without wrapping around 360 degrees.
+        self.temperatureData = data_matrices['tmpprs']
+        self.altitudeData = data_matrices['hgtprs']
+        self.windUData = data_matrices['ugrdprs']
+        self.windVData = data_matrices['vgrdprs']
 
-        # Convert u and v winds to wind direction and wind speed matrices
+        self.temperatureMap = data_maps['tmpprs']
+        self.altitudeMap = data_maps['hgtprs']
+        self.windsMap = data_maps['ugrdprs']
 
-        # Convert to KNOTS and the turn into direction and speed
-        module.windDirData, module.windSpeedData = tools.uv2dirspeed(
-            data_matrices['ugrdprs'],
-            data_matrices['vgrdprs'])
+    # Data matrices and maps stored by saveBinary, with their bundle names
+    _binaryData = {'altitudeData': 'altitude',
+                   'temperatureData': 'temperature',
+                   'windUData': 'wind_u',
+                   'windVData': 'wind_v'}
+    _binaryMaps = {'altitudeMap': 'altitude',
+                   'temperatureMap': 'temperature',
+                   'windsMap': 'winds'}
 
-        # Store results
-        module.temperatureData = data_matrices['tmpprs']
-        module.altitudeData = data_matrices['hgtprs']
-        module.windSpeedData *= 1.9438445    # Convert to knots
+    def saveBinary(self, path):
+        """
+        Stores the downloaded forecast as a bundle directory that fromBinary
+        can open: one .npy file per data matrix and map axis, plus the
+        handler parameters in metadata.json. For HD forecasts, the high
+        altitude SD data is stored in the high_altitude subdirectory.
+
+        Parameters
+        ----------
+        path : string
+            The bundle directory, created if needed.
+        """
+        os.makedirs(path, exist_ok=True)
+        for attribute, name in self._binaryData.items():
+            numpy.save(os.path.join(path, name + '.npy'),
+                       numpy.ascontiguousarray(getattr(self, attribute)))
+        for attribute, name in self._binaryMaps.items():
+            for axis, values in getattr(self, attribute).toAxes().items():
+                numpy.save(os.path.join(path, '%s_%s.npy' % (name, axis)), values)
+
+        metadata = {'lat': self.lat,
+                    'lon': self.lon,
+                    'launchDateTime': self.launchDateTime.isoformat(),
+                    'cycleDateTime': self.cycleDateTime.isoformat(),
+                    'firstAvailableTime': self.firstAvailableTime.isoformat(),
+                    'forecastDuration': self.forecastDuration,
+                    'HD': self.HD}
+        with open(os.path.join(path, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f, indent=1)
+
+        if self.HD:
+            self._highAltitudeGFS.saveBinary(os.path.join(path, 'high_altitude'))
 
-        module.temperatureMap = data_maps['tmpprs']
-        module.altitudeMap = data_maps['hgtprs']
-        module.windsMap = data_maps['ugrdprs']
+    @classmethod
+    def fromBinary(cls, path, **kwargs):
+        """
+        Opens a forecast bundle written by saveBinary.
+
+        The data matrices are memory mapped read-only, so opening is almost
+        instant and processes using the same bundle share it through the
+        page cache instead of each loading its own copy.
+
+        Parameters
+        ----------
+        path : string
+            The bundle directory.
+        **kwargs : dict
+            Passed to the new GFS_Handler.
+        """
+        with open(os.path.join(path, 'metadata.json')) as f:
+            metadata = json.load(f)
+        module = cls._fromMetadata(metadata, **kwargs)
+        module.cycleDateTime = datetime.fromisoformat(metadata['cycleDateTime'])
+        module.firstAvailableTime = datetime.fromisoformat(metadata['firstAvailableTime'])
+
+        for attribute, name in cls._binaryData.items():
+            # Plain (read-only) array views of the maps: indexing a
+            # numpy.memmap is several times slower
+            setattr(module, attribute, numpy.asarray(
+                numpy.load(os.path.join(path, name + '.npy'), mmap_mode='r')))
+        for attribute, name in cls._binaryMaps.items():
+            axes = [numpy.load(os.path.join(path, '%s_%s.npy' % (name, axis)))
+                    for axis in ('latitude', 'longitude', 'pressure', 'time')]
+            setattr(module, attribute, GFS_Map.fromAxes(*axes))
+
+        if module.HD:
+            module._highAltitudeGFS = GFS_High_Altitude_Handler.fromBinary(
+                os.path.join(path, 'high_altitude'))
+            module._highAltitudePressure = module._highAltitudeGFS.interpolateData('p')
 
         return module
 
+    @classmethod
+    def _fromMetadata(cls, metadata, **kwargs):
+        """New, empty handler with the parameters stored by saveBinary."""
+        return cls(lat=metadata['lat'], lon=metadata['lon'],
+                   date_time=datetime.fromisoformat(metadata['launchDateTime']),
+                   HD=metadata['HD'], forecastDuration=metadata['forecastDuration'], **kwargs)
+
     @profile
     def interpolateData(self, *variables):
         """
@@ -908,9 +1189,15 @@ class GFS_Handler(object):
             Acceptable values for *variables can be a combination of any of
                 't'|'temp'|'temperature'        temperature interpolation
                 'p'|'press'|'pressure'          pressure interpolation
+                'u'|'ugrd'|'wind_u'             eastward wind interpolation
+                'v'|'vgrd'|'wind_v'             northward wind interpolation
                 'd'|'windrct'|'wind_direction'  wind direction interpolation
                 's'|'windspd'|'wind_speed'      wind speed interpolation
 
+        Winds are stored as u and v components in m/s: the direction (in
+        degrees clockwise from the north) and the speed (in knots) are
+        computed from their interpolation.
+
         Returns
         -------
         list of :obj:`Linear4DInterpolator` objects, in the same order as
@@ -933,33 +1220,52 @@ class GFS_Handler(object):
         for variable in variables:
             if variable in ('temp', 't', 'temperature'):
                 # Interpolate temperature
-                if not self.HD:
+                if self.altitudeLevels is not None:
+                    results.append(self._regridded_interpolator(self.temperatureByAltitude, 't'))
+                elif not self.HD:
                     results.append(
                         GFS_data_interpolator(self, self.temperatureData, self.temperatureMap.mappingCoordinates))
                 else:
                     results.append(
                         GFS_data_interpolator(self, self.temperatureData, self.temperatureMap.mappingCoordinates,
-                                              self._highAltitudeGFS.interpolateData('t')))
+                                              self._highAltitudeGFS.interpolateData('t'), self._topPressure()))
 
             elif variable in ('press', 'p', 'pressure'):
                 # Interpolate pressure
-                results.append(self._pressure_interpolator)
+                if self.altitudeLevels is not None:
+                    results.append(self._regridded_pressure)
+                else:
+                    results.append(self._pressure_interpolator)
+
+            elif variable in ('ugrd', 'u', 'wind_u'):
+                # Interpolate eastward wind
+                if self.altitudeLevels is not None:
+                    results.append(self._regridded_interpolator(self.windUByAltitude, 'u'))
+                elif not self.HD:
+                    results.append(GFS_data_interpolator(self, self.windUData, self.windsMap.mappingCoordinates))
+                else:
+                    results.append(GFS_data_interpolator(self, self.windUData, self.windsMap.mappingCoordinates,
+                                                         self._highAltitudeGFS.interpolateData('u'),
+                                                         self._topPressure()))
+
+            elif variable in ('vgrd', 'v', 'wind_v'):
+                # Interpolate northward wind
+                if self.altitudeLevels is not None:
+                    results.append(self._regridded_interpolator(self.windVByAltitude, 'v'))
+                elif not self.HD:
+                    results.append(GFS_data_interpolator(self, self.windVData, self.windsMap.mappingCoordinates))
+                else:
+                    results.append(GFS_data_interpolator(self, self.windVData, self.windsMap.mappingCoordinates,
+                                                         self._highAltitudeGFS.interpolateData('v'),
+                                                         self._topPressure()))
 
             elif variable in ('windrct', 'd', 'wind_direction'):
-                # Interpolate wind direction
-                if not self.HD:
-                    results.append(GFS_data_interpolator(self, self.windDirData, self.windsMap.mappingCoordinates))
-                else:
-                    results.append(GFS_data_interpolator(self, self.windDirData, self.windsMap.mappingCoordinates,
-                                                         self._highAltitudeGFS.interpolateData('d')))
+                # Wind direction from the interpolated components
+                results.append(self._windInterpolator(0))
 
             elif variable in ('windspd', 's', 'wind_speed'):
-                # Interpolate wind speed
-                if not self.HD:
-                    results.append(GFS_data_interpolator(self, self.windSpeedData, self.windsMap.mappingCoordinates))
-                else:
-                    results.append(GFS_data_interpolator(self, self.windSpeedData, self.windsMap.mappingCoordinates,
-                                                         self._highAltitudeGFS.interpolateData('s')))
+                # Wind speed from the interpolated components, in knots
+                results.append(self._windInterpolator(1))
 
             else:
                 logger.error('A wrong interpolation parameter (%s) was passed to the interpolator.' % variable)
@@ -970,6 +1276,174 @@ class GFS_Handler(object):
         else:
             return results
 
+    def _topPressure(self):
+        """
+        Pressure of the highest HD level: the interpolators on the pressure
+        levels use the high altitude SD data above it, as the regridded ones
+        do above the HD columns (see regridAltitude).
+        """
+        return min(self.altitudeMap.fwdPressure)
+
+    def _windInterpolator(self, index):
+        """
+        Interpolator of the wind direction (index 0, in degrees) or speed
+        (index 1, in knots), from the interpolated u and v components.
+        """
+        getWind = self.interpolateStacked('u', 'v')
+
+        def interpolator(lat, lon, alt, time):
+            u, v = getWind(lat, lon, alt, time)
+            windDirection, windSpeed = tools.uv2dirspeed(u, v)
+            return (windDirection, windSpeed * 1.9438445)[index]    # Speed in knots
+
+        return interpolator
+
+    def interpolateStacked(self, *variables):
+        """
+        Set up one linear 4d interpolation for all the variables given, which
+        returns them together, in the same order as *variables, as a numpy
+        array. The cell search and the interpolation weights are then
+        computed once per call for all of them, instead of once per variable
+        as with the interpolators returned by interpolateData.
+
+        Parameters
+        ----------
+        variables : tuple of strings
+            Same as for interpolateData, except wind direction and speed:
+            use the u and v components.
+
+        Returns
+        -------
+        :obj:`GFS_data_interpolator`, to be called with standard 4D
+        coordinates (lat, lon, alt, time).
+
+        Notes
+        -----
+        * The variables are stacked along a last axis of the data, so the
+        forecast is copied once more.
+
+        * Warning: the time parameter must be in GFS units! Use the
+        getGFStime(time) method for conversion.
+        """
+        if self.altitudeLevels is not None:
+            grids = {'t': self.temperatureByAltitude, 'u': self.windUByAltitude,
+                     'v': self.windVByAltitude, 'p': self.pressureByAltitude}
+            maps = dict.fromkeys(grids, self.altitudeLevels)
+        else:
+            # Pressure on the pressure levels is the level itself, which the
+            # linear interpolation in pressure gives back exactly
+            pressure = numpy.array(self.altitudeMap.fwdPressure, dtype=float).reshape(1, 1, -1, 1)
+            grids = {'t': self.temperatureData, 'u': self.windUData, 'v': self.windVData,
+                     'p': numpy.broadcast_to(pressure, self.altitudeData.shape)}
+            maps = {'t': self.temperatureMap, 'u': self.windsMap, 'v': self.windsMap, 'p': self.altitudeMap}
+
+        names = []
+        for variable in variables:
+            for name, aliases in (('t', ('temp', 't', 'temperature')), ('p', ('press', 'p', 'pressure')),
+                                  ('u', ('ugrd', 'u', 'wind_u')), ('v', ('vgrd', 'v', 'wind_v'))):
+                if variable in aliases:
+                    names.append(name)
+                    break
+            else:
+                raise ValueError('A wrong interpolation parameter (%s) was passed to the interpolator.' % variable)
+
+        dataMap = maps[names[0]]
+        if any(maps[name].mappingCoordinates[:4] != dataMap.mappingCoordinates[:4] for name in names):
+            raise ValueError('Variables on different grids cannot be interpolated together.')
+        data = numpy.stack([grids[name] for name in names], axis=-1)
+
+        byAltitude = self.altitudeLevels is not None
+        if not self.HD:
+            return GFS_data_interpolator(self, data, dataMap.mappingCoordinates, byAltitude=byAltitude)
+        highAltitude = self._highAltitudeGFS.interpolateStacked(*names)
+        return GFS_data_interpolator(self, data, dataMap.mappingCoordinates, highAltitude,
+                                     None if byAltitude else self._topPressure(), byAltitude)
+
+    def regridAltitude(self, altitudeStep=100.):
+        """
+        Resamples temperature, winds and pressure from the pressure levels
+        onto geometric altitude levels every altitudeStep meters, once for
+        the whole forecast. The interpolators returned by interpolateData
+        afterwards are then direct 4D (lat, lon, alt, time) lookups, with no
+        altitude to pressure inversion per call.
+
+        At every node, the pressure is found as in _pressure_interpolator
+        (log-pressure interpolation of the altitude column) and the variables
+        are interpolated linearly in pressure, as Linear4DInterpolator does.
+        Below and above the column, the nearest level is used. For HD
+        forecasts, the high altitude SD data is regridded too and used for
+        pressures above the HD levels.
+
+        Parameters
+        ----------
+        [altitudeStep] : scalar (default 100)
+            Spacing of the altitude levels in meters.
+        """
+        if not (self.temperatureData.shape == self.windUData.shape == self.altitudeData.shape):
+            raise ValueError('Temperature, winds and altitude must be on the same grid to be regridded.')
+
+        latitudePoints, longitudePoints, _, timePoints = self.altitudeData.shape
+        bottom = numpy.floor(self.altitudeData.min() / altitudeStep) * altitudeStep
+        altitudes = numpy.arange(bottom, self.altitudeData.max() + altitudeStep, altitudeStep)
+        pressures = numpy.array(self.altitudeMap.fwdPressure)
+        logPressures = numpy.log(pressures)
+        # numpy.interp needs increasing coordinates: pressures are reversed
+        increasing = slice(None, None, -1)
+
+        shape = (latitudePoints, longitudePoints, len(altitudes), timePoints)
+        self.pressureByAltitude = numpy.empty(shape)
+        self.temperatureByAltitude = numpy.empty(shape)
+        self.windUByAltitude = numpy.empty(shape)
+        self.windVByAltitude = numpy.empty(shape)
+        for i, j, k in numpy.ndindex(latitudePoints, longitudePoints, timePoints):
+            column = self.altitudeData[i, j, :, k]
+            pressure = numpy.exp(numpy.interp(altitudes, column, logPressures))
+            self.pressureByAltitude[i, j, :, k] = pressure
+            for data, regridded in ((self.temperatureData, self.temperatureByAltitude),
+                                    (self.windUData, self.windUByAltitude),
+                                    (self.windVData, self.windVByAltitude)):
+                regridded[i, j, :, k] = numpy.interp(pressure, pressures[increasing],
+                                                     data[i, j, increasing, k])
+
+        self.altitudeLevels = GFS_Map.fromAxes(self.altitudeMap.fwdLatitude, self.altitudeMap.fwdLongitude,
+                                               altitudes, self.altitudeMap.fwdTime)
+        self._pressureByAltitude = Linear4DInterpolator(self.pressureByAltitude,
+                                                        self.altitudeLevels.mappingCoordinates)
+        # Above the lowest column top, some columns have run out of levels
+        self._regridTop = self.altitudeData[:, :, -1, :].min()
+
+        if self.HD:
+            self._highAltitudeGFS.regridAltitude(altitudeStep)
+            self._highAltitudePressure = self._highAltitudeGFS.interpolateData('p')
+
+    def _regridded_interpolator(self, data, variable):
+        """
+        Interpolator of data, on the regridded altitude levels. For HD
+        forecasts, the high altitude SD data is used above the HD levels.
+        """
+        if self.HD:
+            return GFS_data_interpolator(self, data, self.altitudeLevels.mappingCoordinates,
+                                         self._highAltitudeGFS.interpolateData(variable), byAltitude=True)
+        return GFS_data_interpolator(self, data, self.altitudeLevels.mappingCoordinates, byAltitude=True)
+
+    def _regridded_pressure(self, lat, lon, alt, time):
+        """
+        Pressure at (lat,lon,alt,time) from the regridded forecast (see
+        regridAltitude).
+        """
+        if not self.HD:
+            return self._pressureByAltitude(lat, lon, alt, time)
+        if not _isArray(lat, lon, alt, time):
+            if alt > self._regridTop:
+                return self._highAltitudePressure(lat, lon, alt, time)
+            return self._pressureByAltitude(lat, lon, alt, time)
+
+        lat, lon, alt, time = numpy.broadcast_arrays(lat, lon, alt, time)
+        pressure = numpy.array(self._pressureByAltitude(lat, lon, alt, time))
+        high = alt > self._regridTop
+        if high.any():
+            pressure[high] = self._highAltitudePressure(lat[high], lon[high], alt[high], time[high])
+        return pressure
 
     def getGFStime(self, time):
         """
@@ -1012,7 +1486,11 @@ class GFS_Handler(object):
         # Run this either once or twice, according to how many datasets have
         # been downloaded (Greenwich meridian crossing.
         for dataStream in dataStreams:
-            dataLines = dataStream.split('\n')
+            # Only the header (first line) and the axes (last 12 lines) are
+            # split into lines, the data block in between is parsed at once
+            header, dataBlock = dataStream.split('\n', 1)
+            dataBlock, *axesLines = dataBlock.rsplit('\n', 12)
+            dataLines = [header] + axesLines
 
             # Count how many latitude, longitude, pressure and time points are
             # available in the datastream. This is used to initialize the
@@ -1028,23 +1506,32 @@ class GFS_Handler(object):
                 longitudePoints, pressurePoints, timePoints))
 
             # Populate the results matrix
-            for line in dataLines[1:-12]:
-                # Skip empty lines
-                if line == '': continue
-
-                # Find the indexes related to this particular latitude line
-                #
-                # WARNING: THIS IS LIKELY TO CAUSE ISSUES IF THE GFS FORMAT CHANGES!
-                #
-                # If the GFS data format changes, modify it here!
-                # This is VERY format-dependent!
-                timeIndex = int(line.split(',')[0].split('][')[0][1:])
-                pressureIndex = int(line.split(',')[0].split('][')[1])
-                latitudeIndex = int(line.split(',')[0].split('][')[2][:-1])
-
-                # Store values
-                results[latitudeIndex, :, pressureIndex, timeIndex] = [
-                    float(x) if float(x) < 1e8 else 0 for x in line.split(',')[1:]]
+            #
+            # Each data line is "[time][pressure][latitude], value, value,..."
+            # with one value per longitude. The brackets are turned into
+            # commas so that the whole block is parsed by numpy.loadtxt at
+            # once, as one row of (time, pressure, latitude, values...) per
+            # line. Empty lines are skipped by loadtxt.
+            #
+            # WARNING: THIS IS LIKELY TO CAUSE ISSUES IF THE GFS FORMAT CHANGES!
+            #
+            # If the GFS data format changes, modify it here!
+            # This is VERY format-dependent!
+            block = dataBlock.replace('][', ',').replace('[', '').replace(']', '')
+            block = numpy.loadtxt(block.strip().split('\n'), delimiter=',', ndmin=2)
+            block = block.reshape((-1, 3 + longitudePoints))
+            values = block[:, 3:]
+            # Fill values (missing data) are stored as 0
+            values[values >= 1e8] = 0
+
+            indices = block[:, :3].astype(int)
+            if len(indices) == timePoints * pressurePoints * latitudePoints and \
+                    (indices == numpy.indices((timePoints, pressurePoints, latitudePoints)).reshape(3, -1).T).all():
+                # Complete response in the usual order: a strided copy
+                results[...] = values.reshape((timePoints, pressurePoints,
+                    latitudePoints, longitudePoints)).transpose(2, 3, 1, 0)
+            else:
+                results[indices[:, 2], :, indices[:, 1], indices[:, 0]] = values
 
             # Generate the mapping. This is an object containing mapping
             # information between GFS indices for lat,lon,press, time and
@@ -1108,10 +1595,11 @@ class GFS_Handler(object):
 
         This is essentially a 3D interpolation of the column of altitudes
         (ie not just a single value) at the point defined just by latitude,
-        longitude and time. Once the column of altitudes is extracted, a
-        UnivariateSpline (1D) interpolation is run between that column of
-        altitudes and the corresponding pressures (which are always constant).
-        Then, root at which the altitude corresponds to the inputs is found.
+        longitude and time. Once the column of altitudes is extracted, the
+        level just above the requested altitude is found by binary search in
+        that (increasing) column, and the pressure is interpolated linearly in
+        log-pressure between it and the level below, i.e. as an exponential
+        atmosphere inside each layer.
 
         If the requested point is outside latitude, longitude or time bounds,
         the nearest value available for the out-of-bounds axis is used.
@@ -1123,48 +1611,210 @@ class GFS_Handler(object):
         -----
         * This is not using the standard interpolate.Linear4DInterpolator
         because it's NOT a 4D interpolation.
+
+        * The coordinates can also be arrays (broadcast together), and an
+        array of pressures is then returned.
+        """
+        if _isArray(lat, lon, alt, time):
+            return self._pressure_batch(lat, lon, alt, time)
+
+        column = self._altitude_column(lat, lon, time)
+
+        if column[0] > alt:
+            # NEAREST NEIGHBOR: if requested point is below minimum altitude,
+            # return lowest point available
+            return self.altitudeMap.fwdPressure[0]
+        elif column[-1] < alt:
+            # NEAREST NEIGHBOR: if requested point is above maximum altitude,
+            # return highest point available
+            if not self.HD:
+                return self.altitudeMap.fwdPressure[-1]
+            else:
+                return self._highAltitudePressure(lat, lon, alt, time)
+        else:
+            # LOG-PRESSURE INTERPOLATION
+            # (see method documentation for details)
+            if self._logPressure[0] is not self.altitudeMap:
+                self._logPressure = (self.altitudeMap,
+                                     numpy.log(self.altitudeMap.fwdPressure).tolist())
+            logPressure = self._logPressure[1]
+            i = max(int(numpy.searchsorted(column, alt)), 1)
+            frac = (alt - column[i - 1]) / (column[i] - column[i - 1])
+            return exp(logPressure[i - 1] + frac * (logPressure[i] - logPressure[i - 1]))
+
+    def _pressure_batch(self, lat, lon, alt, time):
+        """
+        Same as _pressure_interpolator, for arrays of coordinates.
+        """
+        coordinates = [numpy.asarray(x, dtype=float) for x in (lat, lon, alt, time)]
+        if len({x.shape for x in coordinates}) > 1:
+            coordinates = numpy.broadcast_arrays(*coordinates)
+        shape = coordinates[2].shape
+        lat, lon, alt, time = [x.ravel() for x in coordinates]
+        columns = self._altitude_columns(lat, lon, time)
+
+        # LOG-PRESSURE INTERPOLATION, in the layer found by counting the
+        # levels below each altitude (as numpy.searchsorted on each column)
+        grid = self._column_grid()
+        fwdPressure, logPressure = grid['pressure'], grid['logPressure']
+        i = numpy.clip((columns < alt[:, None]).sum(axis=1), 1, len(fwdPressure) - 1)
+        points = numpy.arange(len(alt))
+        below, above = columns[points, i - 1], columns[points, i]
+        frac = (alt - below) / (above - below)
+        pressure = numpy.exp(logPressure[i - 1] + frac * (logPressure[i] - logPressure[i - 1]))
+
+        # NEAREST NEIGHBOR below and above the columns, or the high altitude
+        # data above for HD
+        pressure[columns[:, 0] > alt] = fwdPressure[0]
+        high = columns[:, -1] < alt
+        if self.HD and high.any():
+            pressure[high] = self._highAltitudePressure(lat[high], lon[high], alt[high], time[high])
+        elif not self.HD:
+            pressure[high] = fwdPressure[-1]
+        return pressure.reshape(shape)
+
+    def _altitude_columns(self, lat, lon, time):
         """
+        Same as _altitude_column, for 1D arrays of coordinates: returns one
+        column (row) per point.
+        """
+        grid = self._column_grid()
+        lat = numpy.minimum(numpy.maximum(lat, grid['low'][0]), grid['high'][0])
+        lon = numpy.minimum(numpy.maximum(lon, grid['low'][1]), grid['high'][1])
+        time = numpy.minimum(numpy.maximum(time, grid['low'][2]), grid['high'][2])
+
+        # Find closest indices, with the cells of the scalar lookup, and the
+        # rows of the 8 surrounding columns in the contiguous columns, as
+        # [lat][lon][time][point]: the row of the lower one plus offsets
+        latLocator, lonLocator, timeLocator = grid['locators']
+        strides = grid['strides']
+        i = latLocator.locate(lat)
+        idxLat = (i - 1, i)
+        i = timeLocator.locate(time)
+        idxTime = (i - 1, i)
+        rows = grid['offsets'] + idxLat[0] * strides[0] + idxTime[0]
+        if grid['lonLocator'] is None:
+            i = lonLocator.locate(lon)
+            idxLon = (i - 1, i)
+            rows = rows + idxLon[0] * strides[1]
+        else:
+            idxLon = grid['lonLocator'].locate(lon)
+            rows = rows + (numpy.array(idxLon) * strides[1])[None, :, None]
+
+        latitudes, longitudes, times = grid['latitudes'], grid['longitudes'], grid['times']
+        fracLat = 1 - numpy.abs((lat - latitudes[idxLat[0]]) / (latitudes[idxLat[1]] - latitudes[idxLat[0]]))
+        fracLon = 1 - numpy.abs((lon - longitudes[idxLon[0]]) / (longitudes[idxLon[1]] - longitudes[idxLon[0]]))
+        fracTime = 1 - numpy.abs((time - times[idxTime[0]]) / (times[idxTime[1]] - times[idxTime[0]]))
+        fracLat, fracLon, fracTime = fracLat[:, None], fracLon[:, None], fracTime[:, None]
+
+        alt = self._altitude_data_columns()[rows]
+        alt = fracLat * alt[0] + (1 - fracLat) * alt[1]
+        alt = fracLon * alt[0] + (1 - fracLon) * alt[1]
+        return fracTime * alt[0] + (1 - fracTime) * alt[1]
 
+    def _column_grid(self):
+        """
+        The axes of altitudeMap used by _altitude_columns, made again if it
+        changed: cell locators, bounds, coordinates and pressure levels as
+        arrays, the longitude locator of grids crossing the 180th meridian
+        (None otherwise), and the rows of the 8 vertices of a cell in the
+        columns of _altitude_data_columns relative to the lower one.
+        """
+        if self._columnGrid[0] is not self.altitudeMap:
+            altitudeMap = self.altitudeMap
+            locators = self._column_locators()
+            pressure = numpy.array(altitudeMap.fwdPressure, dtype=float)
+            axes = (altitudeMap.fwdLatitude, altitudeMap.fwdLongitude, altitudeMap.fwdTime)
+            # Rows of the (lat, lon, time) grid points, time varying fastest
+            strides = (len(axes[1]) * len(axes[2]), len(axes[2]))
+            lonStride = strides[1] if locators[1].monotonic else 0
+            vertex = numpy.arange(2)
+            offsets = (vertex[:, None, None] * strides[0] + vertex[None, :, None] * lonStride +
+                       vertex[None, None, :])[..., None]
+            grid = {
+                'locators': locators,
+                'low': [float(axis[0]) for axis in axes],
+                'high': [float(axis[-1]) for axis in axes],
+                'latitudes': numpy.array(locators[0].values),
+                'longitudes': numpy.array(locators[1].values),
+                'lonLocator': None if locators[1].monotonic else
+                LongitudeLocator(altitudeMap.revLongitude, self.lonStep),
+                'times': numpy.array(locators[2].values),
+                'pressure': pressure,
+                'logPressure': numpy.log(pressure),
+                'strides': strides,
+                'offsets': offsets,
+            }
+            self._columnGrid = (altitudeMap, grid)
+        return self._columnGrid[1]
+
+    def _altitude_data_columns(self):
+        """
+        altitudeData as one row of levels per (lat, lon, time) grid point,
+        made again if it changed.
+        """
+        if self._columnData[0] is not self.altitudeData:
+            data = self.altitudeData
+            columns = numpy.ascontiguousarray(data.transpose(0, 1, 3, 2)).reshape(-1, data.shape[2])
+            self._columnData = (data, columns)
+        return self._columnData[1]
+
+    def _column_locators(self):
+        """
+        Cell locators (see interpolate.AxisLocator) of the latitude,
+        longitude and time axes of altitudeMap, made again if it changed.
+        """
+        if self._columnLocators[0] is not self.altitudeMap:
+            self._columnLocators = (self.altitudeMap,
+                                    [AxisLocator(self.altitudeMap.fwdLatitude),
+                                     AxisLocator(self.altitudeMap.fwdLongitude),
+                                     AxisLocator(self.altitudeMap.fwdTime)])
+        return self._columnLocators[1]
+
+    def _altitude_column(self, lat, lon, time):
+        """
+        Altitudes of every pressure level of altitudeMap at (lat,lon,time),
+        interpolated linearly between the surrounding grid columns.
+
+        If the requested point is outside latitude, longitude or time bounds,
+        the nearest value available for the out-of-bounds axis is used.
+        """
         # Clip out-of-bounds coordinates and limit them
-        lat = numpy.clip(lat, self.altitudeMap.fwdLatitude[0],
-            self.altitudeMap.fwdLatitude[-1])
-        lon = numpy.clip(lon, self.altitudeMap.fwdLongitude[0],
-            self.altitudeMap.fwdLongitude[-1])
-        time = numpy.clip(time, self.altitudeMap.fwdTime[0],
-            self.altitudeMap.fwdTime[-1])
-
-        # Find closest indices and subtract 1 if the upper limit is being
-        # reached, to avoid a KeyError
-        i = numpy.digitize([lat], self.altitudeMap.fwdLatitude)[0]
-        if i == len(self.altitudeMap.fwdLatitude):
-            i -= 1
+        lat = min(max(lat, self.altitudeMap.fwdLatitude[0]), self.altitudeMap.fwdLatitude[-1])
+        lon = min(max(lon, self.altitudeMap.fwdLongitude[0]), self.altitudeMap.fwdLongitude[-1])
+        time = min(max(time, self.altitudeMap.fwdTime[0]), self.altitudeMap.fwdTime[-1])
+
+        # Find closest indices (the upper limit is moved back by 1, to avoid
+        # a KeyError), with the cell locators of altitudeMap
+        latLocator, lonLocator, timeLocator = self._column_locators()
+        i = latLocator(lat)
         idxLat = [i - 1, i]
-        i = numpy.digitize([time], self.altitudeMap.fwdTime)[0]
-        if i == len(self.altitudeMap.fwdTime):
-            i -= 1
+        i = timeLocator(time)
         idxTime = [i - 1, i]
 
-        # Reverse mapping for longitude, to account for crossing the 180th
-        # meridian
-        # Note: this method is used for two reasons:
-        #   1. It's faster than numpy.digitize
-        #   2. numpy.digitize fails at longitudes between -180 and 179.5
-        #      (for HD), since there isn't an entry for -180.
-        lonGrid = [floor(lon / self.lonStep) * self.lonStep,
-                   ceil(lon / self.lonStep) * self.lonStep]
-        if lonGrid[0] == -180:
-            lonGrid[0] = 180
-
-        if lonGrid[0] == lonGrid[1]:
-            try:
+        if lonLocator.monotonic:
+            i = lonLocator(lon)
+            idxLon = [i - 1, i]
+        else:
+            # Reverse mapping for longitude, to account for crossing the 180th
+            # meridian
+            # Note: numpy.digitize fails at longitudes between -180 and
+            # 179.5 (for HD), since there isn't an entry for -180.
+            lonGrid = [floor(lon / self.lonStep) * self.lonStep,
+                       ceil(lon / self.lonStep) * self.lonStep]
+            if lonGrid[0] == -180:
+                lonGrid[0] = 180
+
+            if lonGrid[0] == lonGrid[1]:
+                try:
+                    idxLon = [self.altitudeMap.revLongitude[lonGrid[0]],
+                              self.altitudeMap.revLongitude[lonGrid[1] + self.lonStep]]
+                except KeyError:
+                    idxLon = [self.altitudeMap.revLongitude[lonGrid[0] - self.lonStep],
+                              self.altitudeMap.revLongitude[lonGrid[1]]]
+            else:
                 idxLon = [self.altitudeMap.revLongitude[lonGrid[0]],
-                          self.altitudeMap.revLongitude[lonGrid[1] + self.lonStep]]
-            except KeyError:
-                idxLon = [self.altitudeMap.revLongitude[lonGrid[0] - self.lonStep],
                           self.altitudeMap.revLongitude[lonGrid[1]]]
-        else:
-            idxLon = [self.altitudeMap.revLongitude[lonGrid[0]],
-                      self.altitudeMap.revLongitude[lonGrid[1]]]
 
         try:
             fracLat = 1 - (abs((lat - self.altitudeMap.fwdLatitude[idxLat[0]]) /
@@ -1185,35 +1835,19 @@ class GFS_Handler(object):
             logger.error('An error occurred while clipping coordinate points.')
             raise
 
-        alt00 = fracLat * self.altitudeData[idxLat[0], idxLon[0], :, idxTime[0]]\
-            + (1 - fracLat) * self.altitudeData[idxLat[1], idxLon[0], :, idxTime[0]]
-        alt01 = fracLat * self.altitudeData[idxLat[0], idxLon[0], :, idxTime[1]]\
-            + (1 - fracLat) * self.altitudeData[idxLat[1], idxLon[0], :, idxTime[1]]
-        alt10 = fracLat * self.altitudeData[idxLat[0], idxLon[1], :, idxTime[0]]\
-            + (1 - fracLat) * self.altitudeData[idxLat[1], idxLon[1], :, idxTime[0]]
-        alt11 = fracLat * self.altitudeData[idxLat[0], idxLon[1], :, idxTime[1]]\
-            + (1 - fracLat) * self.altitudeData[idxLat[1], idxLon[1], :, idxTime[1]]
-        alt_time0 = fracLon * alt00 + (1 - fracLon) * alt10
-        alt_time1 = fracLon * alt01 + (1 - fracLon) * alt11
-        altitude = fracTime * alt_time0 + (1 - fracTime) * alt_time1 - alt
-
-        if altitude.min() > 0:
-            # NEAREST NEIGHBOR: if requested point is below minimum altitude,
-            # return lowest point available
-            return self.altitudeMap.fwdPressure[0]
-        elif altitude.max() < 0:
-            # NEAREST NEIGHBOR: if requested point is above maximum altitude,
-            # return highest point available
-            if not self.HD:
-                return self.altitudeMap.fwdPressure[-1]
-            else:
-                return self._highAltitudePressure(lat, lon, alt, time)
+        # The 2x2x2 surrounding columns are taken as one block and blended
+        # with a single product, one weight per (lat, lon, time) corner
+        weights = numpy.array([a * b * c for a in (fracLat, 1 - fracLat)
+                               for b in (fracLon, 1 - fracLon)
+                               for c in (fracTime, 1 - fracTime)])
+        rows = slice(idxLat[0], idxLat[1] + 1)
+        times = slice(idxTime[0], idxTime[1] + 1)
+        if idxLon[1] == idxLon[0] + 1:
+            block = self.altitudeData[rows, idxLon[0]:idxLon[1] + 1, :, times]
         else:
-            # LINEAR INTERPOLATION
-            # (see method documentation for details)
-            f = UnivariateSpline(self.altitudeMap.fwdPressure[::-1],
-                                 altitude[::-1], s=0)
-            return f.roots()[0]
+            # Across the 180th meridian, the two longitudes aren't adjacent
+            block = self.altitudeData[rows][:, idxLon][:, :, :, times]
+        return weights @ block.transpose(0, 1, 3, 2).reshape(8, -1)
 
 
 # TODO: Migrate this class back to GFS_Handler - there is no need for an
@@ -1221,19 +1855,110 @@ class GFS_Handler(object):
 # for the high altitude segment of the GFS_Handler downloadForecast
 class GFS_High_Altitude_Handler(GFS_Handler):
     def __init__(self, lat, lon, date_time, forecastDuration=4,
-        debugging=False, log_to_file=False):
+        debugging=False, log_to_file=False, cache_dir=None, server_url=None):
 
         super(GFS_High_Altitude_Handler, self).__init__(lat=lat,
             lon=lon,
             date_time=date_time,
             forecastDuration=forecastDuration,
             debugging=debugging,
-            HD=False)
+            HD=False,
+            cache_dir=cache_dir,
+            server_url=server_url)
 
         # Set the altitude to the higher levels, since the lower altitude
         # handler covers most of the data
         self.requestAltitude = [41, 46]
 
+    @classmethod
+    def _fromMetadata(cls, metadata, **kwargs):
+        # Always SD, there is no HD parameter
+        return cls(lat=metadata['lat'], lon=metadata['lon'],
+                   date_time=datetime.fromisoformat(metadata['launchDateTime']),
+                   forecastDuration=metadata['forecastDuration'], **kwargs)
+
+
+class GFS_Cycle_Index(object):
+    """
+    Private class used to remember which GFS cycles are available on the
+    server, and which are missing, so that GFS_Handler.getNOAAData doesn't
+    have to probe them again.
+
+    Parameters
+    ----------
+    [path] : string (default None)
+        The JSON file where the index is kept, shared by all the handlers
+        and runs using it. If None, the index only lives in memory.
+    [availableTTL] : float (default 86400)
+        Seconds for which a cycle found available is trusted. The NOAA keeps
+        the cycles on the servers for several days.
+    [missingTTL] : float (default 600)
+        Seconds for which a cycle found missing is trusted. It is short, as
+        new cycles become available a few hours after their issuing time.
+
+    Notes
+    -----
+    * Entries are keyed by service, cycle and requested time window (see
+    GFS_Handler._cycle_key), since the latest forecast times of a cycle are
+    the last to become available.
+    """
+
+    def __init__(self, path=None, availableTTL=86400., missingTTL=600.):
+        self.path = path
+        self.availableTTL = availableTTL
+        self.missingTTL = missingTTL
+        self.entries = self._read()
+
+    def lookup(self, key):
+        """
+        True or False if the cycle is known to be available or missing,
+        None if it is unknown or its entry has expired.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        ttl = self.availableTTL if entry['available'] else self.missingTTL
+        if time.time() - entry['checked'] > ttl:
+            return None
+        return entry['available']
+
+    def record(self, key, available):
+        """Stores whether the cycle is available, as checked now."""
+        self.entries[key] = {'available': available, 'checked': time.time()}
+
+    def save(self):
+        """Writes the index to its file, if it has one."""
+        if self.path is None:
+            return
+        # Merge with the entries saved meanwhile by other handlers, keeping
+        # the latest check of each cycle, and drop the expired ones
+        entries = self._read()
+        for key, entry in self.entries.items():
+            if key not in entries or entries[key]['checked'] < entry['checked']:
+                entries[key] = entry
+        oldest = time.time() - max(self.availableTTL, self.missingTTL)
+        self.entries = {key: entry for key, entry in entries.items()
+                        if entry['checked'] >= oldest}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Written aside and renamed, so an interrupted run can't leave a
+        # partial file behind
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def _read(self):
+        """The entries in the file, if there is one."""
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning('Ignoring unreadable GFS cycle index {}'.format(self.path))
+            return {}
+
 
 class GFS_Map(object):
     """
@@ -1322,6 +2047,29 @@ class GFS_Map(object):
 
         return self
 
+    @classmethod
+    def fromAxes(cls, latitude, longitude, pressure, time):
+        """Creates a map from the four axes (real world coordinates of each
+        GFS index), as returned by toAxes."""
+        data_map = cls()
+        data_map.fwdLatitude = [float(lat) for lat in latitude]
+        data_map.fwdLongitude = [float(lon) for lon in longitude]
+        data_map.fwdPressure = [float(press) for press in pressure]
+        data_map.fwdTime = [float(t) for t in time]
+        data_map.revLatitude = {lat: ind for (ind, lat) in enumerate(data_map.fwdLatitude)}
+        data_map.revLongitude = {lon: ind for (ind, lon) in enumerate(data_map.fwdLongitude)}
+        data_map.revPressure = {press: ind for (ind, press) in enumerate(data_map.fwdPressure)}
+        data_map.revTime = {time: ind for (ind, time) in enumerate(data_map.fwdTime)}
+        data_map.mapCoordinates()
+        return data_map
+
+    def toAxes(self):
+        """The four forward maps as arrays, keyed by axis name."""
+        return {'latitude': numpy.array(self.fwdLatitude, dtype=float),
+                'longitude': numpy.array(self.fwdLongitude, dtype=float),
+                'pressure': numpy.array(self.fwdPressure, dtype=float),
+                'time': numpy.array(self.fwdTime, dtype=float)}
+
     def mapCoordinates(self):
         """Prepare the mappingCoordinates variable by putting together all
         forward and reverse maps. 
@@ -1361,24 +2109,37 @@ class GFS_data_interpolator(object):
     map : list
         The map of the data. This should be the mappingCoordinates variable
         generated by the GFS_Map.mapCoordinates() method.
+    byAltitude : bool (default False)
+        If True, data is on altitude levels (see GFS_Handler.regridAltitude)
+        and is looked up directly, without going through pressure.
     """
 
     @profile
     def __init__(self, GFS_Handler, data, dmap, high_alt_interpolator=None,
-        min_pressure=None):
+        min_pressure=None, byAltitude=False):
         # Store data
         self.GFS = GFS_Handler
         self._interpolator = Linear4DInterpolator(data, dmap)
         self._high_alt_interpolator = high_alt_interpolator
         self._min_press = min_pressure
+        self._byAltitude = byAltitude
 
     def __call__(self, lat, lon, alt, time):
         # Get the pressure with a pressure interpolator and use it for the generic one.
 
-        if type(time) is not float and type(time) is not int:
+        # Numbers of any kind (numpy scalars too) and arrays, not datetimes
+        if type(time) is not float and not isinstance(time, (numbers.Real, numpy.ndarray)):
             logger.error('The time passed is not in GFS coordinates! Use the getGFStime() method.')
             return
 
+        if _isArray(lat, lon, alt, time):
+            return self._batch(lat, lon, alt, time)
+
+        if self._byAltitude:
+            if self._high_alt_interpolator is not None and alt > self.GFS._regridTop:
+                return self._high_alt_interpolator(lat, lon, alt, time)
+            return self._interpolator(lat, lon, alt, time)
+
         pressure = self.GFS._pressure_interpolator(lat, lon, alt, time)
 
         if self._min_press is not None and pressure < self._min_press:
@@ -1390,3 +2151,32 @@ class GFS_data_interpolator(object):
                 pressure,
                 time
             )
+
+    def _batch(self, lat, lon, alt, time):
+        """
+        Same as __call__, for arrays of coordinates (broadcast together).
+        """
+        if self._byAltitude:
+            result = self._interpolator(lat, lon, alt, time)
+            if self._high_alt_interpolator is not None:
+                result = self._highAltitude(numpy.asarray(alt) > self.GFS._regridTop, result, lat, lon, alt, time)
+            return result
+
+        pressure = self.GFS._pressure_interpolator(lat, lon, alt, time)
+        result = self._interpolator(lat, lon, pressure, time)
+        if self._min_press is not None:
+            result = self._highAltitude(pressure < self._min_press, result, lat, lon, alt, time)
+        return result
+
+    def _highAltitude(self, high, result, lat, lon, alt, time):
+        """Replaces result with the high altitude data where high is True."""
+        lat, lon, alt, time, high = numpy.broadcast_arrays(lat, lon, alt, time, high)
+        if high.any():
+            result = numpy.array(result)
+            result[..., high] = self._high_alt_interpolator(lat[high], lon[high], alt[high], time[high])
+        return result
+
+
+def _isArray(*coordinates):
+    """True if any of the coordinates is an array, not a scalar."""
+    return not all(isScalar(x) for x in coordinates)
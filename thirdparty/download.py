@@ -0,0 +1,178 @@
+# coding=utf-8
+
+"""
+This module defines the class Downloader, used to download the GFS data from
+the NOAA servers.
+
+The Downloader fetches many urls at once from a pool of threads, limiting
+the number of simultaneous requests to each host. Connections are kept alive
+and reused by later requests to the same host, failed requests are retried
+with exponential backoff and responses are decoded while they are being read.
+Only the standard library is used.
+"""
+
+import codecs
+import http.client
+import logging
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Downloader(object):
+    """
+    Concurrent HTTP(S) GET of many urls, with keep-alive connections, a limit
+    of simultaneous requests per host and retries with exponential backoff.
+
+    Parameters
+    ----------
+    [maxPerHost] : int (default 4)
+        Maximum number of simultaneous requests to the same host.
+    [retries] : int (default 4)
+        Number of times a failed request is retried before giving up.
+    [backoff] : float (default 0.5)
+        Wait before the first retry, in seconds. It doubles at every retry.
+    [timeout] : float (default 60)
+        Socket timeout of the connections, in seconds.
+
+    Notes
+    -----
+    * Connection errors and server errors (5xx) are retried. Any other HTTP
+    status is a final answer: the request fails with no retry, and gives an
+    empty text instead of None, so that callers can tell a missing resource
+    from an unreachable server.
+
+    :Example:
+        >>> downloader = Downloader(maxPerHost=4)
+        >>> responses = downloader.fetch([url1, url2, url3])
+        >>> responses[url1]  # decoded text, '' if refused, None if failed
+    """
+
+    chunkSize = 1 << 16
+
+    def __init__(self, maxPerHost=4, retries=4, backoff=0.5, timeout=60):
+        self.maxPerHost = maxPerHost
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._hostLimits = {}
+        self._lock = threading.Lock()
+        # Open connections not in use, keyed by (scheme, host)
+        self._idle = {}
+
+    def fetch(self, urls, progressHandler=None):
+        """
+        Downloads all the urls concurrently.
+
+        Parameters
+        ----------
+        urls : list of strings
+            The urls to GET.
+        [progressHandler] : function (default None)
+            Called with (completed, total) every time a request finishes.
+
+        Returns
+        -------
+        responses : dict
+            (url: text) pairs, with the utf-8 decoded body of each response,
+            '' for the requests answered with an error status and None for
+            the requests that failed.
+        """
+        urls = list(dict.fromkeys(urls))
+        responses = {}
+        if not urls:
+            return responses
+
+        # Enough threads for every host to be at its limit
+        hosts = {urllib.parse.urlsplit(url).netloc for url in urls}
+        workers = min(len(urls), self.maxPerHost * len(hosts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for url, text in zip(urls, executor.map(self.get, urls)):
+                responses[url] = text
+                if progressHandler:
+                    progressHandler(len(responses), len(urls))
+        return responses
+
+    def get(self, url):
+        """
+        Downloads one url, retrying if needed. Returns the decoded text, ''
+        if the server answered with an error status, or None if the request
+        failed.
+        """
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        wait = self.backoff
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(wait)
+                wait *= 2
+            try:
+                with self._hostLimit(parts.netloc):
+                    status, text = self._request(parts.scheme, parts.netloc, path)
+            except (OSError, http.client.HTTPException) as error:
+                logger.debug('Request failed (%s), attempt %d: %s' % (error, attempt + 1, url))
+                continue
+            if status < 500:
+                if status != 200:
+                    logger.debug('HTTP status %d: %s' % (status, url))
+                    return ''
+                return text
+            logger.debug('HTTP status %d, attempt %d: %s' % (status, attempt + 1, url))
+        logger.error('Giving up after %d attempts: %s' % (self.retries + 1, url))
+        return None
+
+    def close(self):
+        """Closes the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _request(self, scheme, host, path):
+        """GET of path on a connection to host: (status, text)."""
+        connection = self._connection(scheme, host)
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'identity'})
+            response = connection.getresponse()
+
+            # Decode while reading, so no copy of the whole raw body is kept
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            pieces = []
+            while True:
+                chunk = response.read(self.chunkSize)
+                if not chunk:
+                    break
+                pieces.append(decoder.decode(chunk))
+            pieces.append(decoder.decode(b'', final=True))
+        except BaseException:
+            # It may be left in the middle of a response
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                self._idle.setdefault((scheme, host), []).append(connection)
+        return response.status, ''.join(pieces)
+
+    def _connection(self, scheme, host):
+        """An idle keep-alive connection to host, or a new one."""
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop()
+        connectionClass = {'https': http.client.HTTPSConnection,
+                           'http': http.client.HTTPConnection}[scheme]
+        return connectionClass(host, timeout=self.timeout)
+
+    def _hostLimit(self, host):
+        """The semaphore limiting the simultaneous requests to host."""
+        with self._lock:
+            if host not in self._hostLimits:
+                self._hostLimits[host] = threading.BoundedSemaphore(self.maxPerHost)
+            return self._hostLimits[host]
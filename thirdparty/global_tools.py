@@ -120,17 +120,17 @@ def m2deg(dLat, dLon, latitude):
     
     Parameters
     ----------
-    dLat : float
+    dLat : float or array
         distance in the direction of meridians [m]. Positive to the north
-    dLon : float
+    dLon : float or array
         distance in the direction of parallels [m]. Positive to the east
-    latitude: float
+    latitude: float or array
         current latitude [deg], used to calculate the distance between
         meridians.
     
     Returns
     -------
-    deltaLat, deltaLon : (float, float)
+    deltaLat, deltaLon : (float, float) or (array, array)
         both in degrees. Sign convention: deltaLat positive to the north,
         deltaLon positive to the west.
     """
@@ -139,6 +139,15 @@ def m2deg(dLat, dLon, latitude):
     R = 6378137 #[m]
 
     # One degree of latitude and longitude
+    if isinstance(latitude, float):
+        # Floats first, the model calls this at every stage
+        beta = atan(0.99664719 * tan(radians(abs(latitude))))
+        return dLat / 111100, dLon / ((pi / 180) * R * cos(beta))
+    if np.ndim(latitude):
+        beta = np.arctan(0.99664719 * np.tan(np.radians(np.abs(latitude))))
+        oneDegLon = (pi / 180) * R * np.cos(beta)
+        oneDegLat = 111100
+        return dLat / oneDegLat, dLon / oneDegLon
     beta = atan(0.99664719 * tan(radians(abs(latitude))))
     oneDegLon = (pi / 180) * R * cos(beta)
     oneDegLat = 111100
@@ -21,6 +21,7 @@ Niccolo' Zapponi, nz1g10@soton.ac.uk, 22/04/2013
 
 __author__ = "Niccolo' Zapponi, University of Southampton, nz1g10@soton.ac.uk"
 
+from bisect import bisect_right
 from math import floor, ceil
 import numpy
 # from six.moves import builtins
@@ -46,8 +47,11 @@ class Linear4DInterpolator(object):
 
     Parameters
     ----------
-    data : numpy array (4D)
-        the 4D matrix containing data to be interpolated
+    data : numpy array (4D or 5D)
+        the 4D matrix containing data to be interpolated. Several variables
+        on the same grid can be stacked along a 5th (last) axis: they are
+        then all interpolated with the same weights and returned together as
+        an array (along its first axis for array queries)
     data_map : list
         contains four lists and four dictionaries, formed of the real world
         values corresponding to each data matrix axis and their reverse mapping
@@ -82,6 +86,10 @@ class Linear4DInterpolator(object):
 
         >>> # Request data (requires latitude, longitude, pressure and time):
         >>> myInterpolator(lat, lon, press, time)
+
+        >>> # Coordinates can also be arrays (broadcast together), to
+        >>> # interpolate many points at once:
+        >>> myInterpolator(latArray, lonArray, pressArray, time)
     """
 
     @profile
@@ -111,39 +119,54 @@ class Linear4DInterpolator(object):
         # Calculate longitude step to account for HD and SD data
         self.lonStep = self.dmap[1][1] - self.dmap[1][0]
 
+        # Bounds as floats, and the cell locators of each axis. Longitudes
+        # that cross the 180th meridian aren't monotonic: they are looked up
+        # through the reverse map instead.
+        self._bounds = [(float(low), float(high)) for low, high in zip(self.min, self.max)]
+        self._locators = [AxisLocator(self.dmap[axis]) for axis in range(4)]
+        self._longitudeLocator = None
+        if not self._locators[1].monotonic:
+            self._locators[1] = None
+            self._longitudeLocator = LongitudeLocator(self.dmap[5], self.lonStep)
+        # For arrays of coordinates: the axes and bounds as arrays, and the
+        # data with the 4 grid axes flattened into one (made on first use).
+        # The 16 vertices of a cell are then the flat index of its lower
+        # vertex plus _offsets (the longitudes across the 180th meridian
+        # aren't consecutive: their part is added separately).
+        self._axes = [numpy.array(self.dmap[axis], dtype=float) for axis in range(4)]
+        self._low = self.min.astype(float)[:, None]
+        self._high = self.max.astype(float)[:, None]
+        self._flat = None
+        sizes = self.data.shape
+        self._strides = [sizes[1] * sizes[2] * sizes[3], sizes[2] * sizes[3], sizes[3], 1]
+        lonStride = self._strides[1] if self._locators[1] is not None else 0
+        vertex = numpy.arange(2)
+        self._offsets = (vertex[:, None, None, None] * self._strides[0] + vertex[None, :, None, None] * lonStride +
+                         vertex[None, None, :, None] * self._strides[2] + vertex[None, None, None, :])[..., None]
+
     def __call__(self, lat, lon, press, time):
+        if not (isScalar(lat) and isScalar(lon) and isScalar(press) and isScalar(time)):
+            return self._batch(lat, lon, press, time)
+
         # Check if within bounds and switch to nearest neighbour if not
-        lat = numpy.clip(lat, self.min[0], self.max[0])
-        lon = numpy.clip(lon, self.min[1], self.max[1])
-        press = numpy.clip(press, self.min[2], self.max[2])
-        time = numpy.clip(time, self.min[3], self.max[3])
-
-        # Find closest indices and subtract 1 if the upper limit is being reached, to avoid a KeyError
-        i = numpy.digitize([lat], self.dmap[0])[0]
-        if i == len(self.dmap[0]):
-            i -= 1
+        lat = min(max(lat, self._bounds[0][0]), self._bounds[0][1])
+        lon = min(max(lon, self._bounds[1][0]), self._bounds[1][1])
+        press = min(max(press, self._bounds[2][0]), self._bounds[2][1])
+        time = min(max(time, self._bounds[3][0]), self._bounds[3][1])
+
+        # Find closest indices (the upper limit is moved back by 1, to avoid a KeyError)
+        i = self._locators[0](lat)
         idx0 = [i - 1, i]
-        i = numpy.digitize([press], self.dmap[2])[0]
-        if i == len(self.dmap[1]):
-            i -= 1
+        i = self._locators[2](press)
         idx2 = [i - 1, i]
-        i = numpy.digitize([time], self.dmap[3])[0]
-        if i == len(self.dmap[3]):
-            i -= 1
+        i = self._locators[3](time)
         idx3 = [i - 1, i]
 
-        # Reverse mapping for longitude, to account for crossing the 180th meridian
-        lonGrid = [floor(lon / self.lonStep) * self.lonStep, ceil(lon / self.lonStep) * self.lonStep]
-        if lonGrid[0] == -180:
-            lonGrid[0] = 180
-
-        if lonGrid[0] == lonGrid[1]:
-            try:
-                idx1 = [self.dmap[5][lonGrid[0]], self.dmap[5][lonGrid[1] + self.lonStep]]
-            except KeyError:
-                idx1 = [self.dmap[5][lonGrid[0] - self.lonStep], self.dmap[5][lonGrid[1]]]
+        if self._locators[1] is not None:
+            i = self._locators[1](lon)
+            idx1 = [i - 1, i]
         else:
-            idx1 = [self.dmap[5][lonGrid[0]], self.dmap[5][lonGrid[1]]]
+            idx1 = self._longitudeIndices(lon)
 
         # Calculate the normalized distance of the requested point from the lower vertex, along all 4 axes
         frac0 = 1 - abs((lat - self.dmap[0][idx0[0]]) / (self.dmap[0][idx0[1]] - self.dmap[0][idx0[0]]))
@@ -151,6 +174,20 @@ class Linear4DInterpolator(object):
         frac2 = 1 - abs((press - self.dmap[2][idx2[0]]) / (self.dmap[2][idx2[1]] - self.dmap[2][idx2[0]]))
         frac3 = 1 - abs((time - self.dmap[3][idx3[0]]) / (self.dmap[3][idx3[1]] - self.dmap[3][idx3[0]]))
 
+        if self.data.ndim == 5:
+            # Stacked variables: fetch the 16 vertices of all of them at once
+            # and reduce one dimension at a time, last one first
+            if idx0[0] >= 0 and idx1[1] == idx1[0] + 1 and idx2[0] >= 0 and idx3[0] >= 0:
+                # Contiguous cell (the usual case): a view is enough
+                vertices = self.data[idx0[0]:idx0[1] + 1, idx1[0]:idx1[1] + 1,
+                                     idx2[0]:idx2[1] + 1, idx3[0]:idx3[1] + 1]
+            else:
+                vertices = self.data[numpy.ix_(idx0, idx1, idx2, idx3)]
+            vertices = frac3 * vertices[:, :, :, 0] + (1 - frac3) * vertices[:, :, :, 1]
+            vertices = frac2 * vertices[:, :, 0] + (1 - frac2) * vertices[:, :, 1]
+            vertices = frac1 * vertices[:, 0] + (1 - frac1) * vertices[:, 1]
+            return frac0 * vertices[0] + (1 - frac0) * vertices[1]
+
         # Interpolate (one dimension at a time)
         # 1st dimension
         tx000 = frac0 * self.data[idx0[0], idx1[0], idx2[0], idx3[0]] + (1 - frac0) * self.data[
@@ -183,4 +220,205 @@ class Linear4DInterpolator(object):
         # 4th dimension
         result = frac3 * txyz0 + (1 - frac3) * txyz1
 
-        return result
\ No newline at end of file
+        return result
+
+    def _longitudeIndices(self, lon):
+        # Reverse mapping for longitude, to account for crossing the 180th meridian
+        lonGrid = [floor(lon / self.lonStep) * self.lonStep, ceil(lon / self.lonStep) * self.lonStep]
+        if lonGrid[0] == -180:
+            lonGrid[0] = 180
+
+        if lonGrid[0] == lonGrid[1]:
+            try:
+                return [self.dmap[5][lonGrid[0]], self.dmap[5][lonGrid[1] + self.lonStep]]
+            except KeyError:
+                return [self.dmap[5][lonGrid[0] - self.lonStep], self.dmap[5][lonGrid[1]]]
+        return [self.dmap[5][lonGrid[0]], self.dmap[5][lonGrid[1]]]
+
+    def _batch(self, lat, lon, press, time):
+        """
+        Same as __call__, for arrays of coordinates: the cells and weights of
+        all the points are found at once, and the 16 vertices of every cell
+        fetched with a single fancy index into the flattened grid.
+        """
+        coordinates = [numpy.asarray(x, dtype=float) for x in (lat, lon, press, time)]
+        shape = numpy.broadcast_shapes(*[x.shape for x in coordinates])
+        points = numpy.empty((4,) + shape)
+        for axis, x in enumerate(coordinates):
+            points[axis] = x
+        points = points.reshape(4, -1)
+
+        # Check if within bounds and switch to nearest neighbour if not
+        numpy.maximum(points, self._low, out=points)
+        numpy.minimum(points, self._high, out=points)
+
+        # Find closest indices, with the cells of the scalar lookup, and the
+        # normalized distance of the points from the lower vertex
+        flat = self._offsets
+        fractions = []
+        for axis, locator in enumerate(self._locators):
+            x = points[axis]
+            if locator is None:
+                low, high = self._longitudeLocator.locate(x)
+                flat = flat + (numpy.array([low, high]) * self._strides[1])[None, :, None, None]
+            else:
+                high = locator.locate(x)
+                low = high - 1
+                flat = flat + low * self._strides[axis]
+            values = self._axes[axis]
+            fraction = 1 - numpy.abs((x - values[low]) / (values[high] - values[low]))
+            # Stacked variables: the same weight for all of them
+            fractions.append(fraction[:, None] if self.data.ndim == 5 else fraction)
+
+        if self._flat is None:
+            # A view, unless the data isn't contiguous
+            self._flat = self.data.reshape((-1,) + self.data.shape[4:])
+        vertices = self._flat[flat]
+
+        # Interpolate (one dimension at a time, last one first)
+        vertices = fractions[3] * vertices[:, :, :, 0] + (1 - fractions[3]) * vertices[:, :, :, 1]
+        vertices = fractions[2] * vertices[:, :, 0] + (1 - fractions[2]) * vertices[:, :, 1]
+        vertices = fractions[1] * vertices[:, 0] + (1 - fractions[1]) * vertices[:, 1]
+        result = fractions[0] * vertices[0] + (1 - fractions[0]) * vertices[1]
+        if self.data.ndim == 5:
+            return result.T.reshape((-1,) + shape)
+        return result.reshape(shape)
+
+
+def isScalar(x):
+    """True if x is a scalar coordinate, False for arrays (quick for floats)."""
+    return isinstance(x, (float, int)) or numpy.ndim(x) == 0
+
+
+class AxisLocator(object):
+    """
+    Finds the cell [i - 1, i] of a monotonic axis containing a coordinate:
+    i is the index numpy.digitize returns, moved back by 1 past the upper
+    limit.
+
+    The last cell found is checked first, since successive queries along a
+    trajectory mostly fall in the same one. Otherwise, the index is computed
+    directly on uniform increasing axes (such as the GFS latitude, longitude
+    and time) and found by binary search on the others (such as pressure).
+    The cells of an array of coordinates are found at once with locate.
+
+    Parameters
+    ----------
+    values : list
+        The coordinates of the axis.
+    """
+
+    def __init__(self, values):
+        self.values = [float(value) for value in values]
+        self.size = len(self.values)
+        steps = numpy.diff(self.values)
+        self.decreasing = self.size > 1 and steps[0] < 0
+        self.monotonic = bool(numpy.all(steps < 0) if self.decreasing else numpy.all(steps > 0))
+        self.uniform = (self.monotonic and not self.decreasing and self.size > 1 and
+                        numpy.allclose(steps, steps[0], rtol=1e-9, atol=0))
+        self._inverseStep = 1 / steps[0] if self.uniform else None
+        # Binary search works on increasing values
+        self._increasing = self.values[::-1] if self.decreasing else self.values
+        self._increasingArray = numpy.array(self._increasing)
+        self._last = 1
+
+    def __call__(self, x):
+        i = self._last
+        if not self._contains(i, x):
+            i = self._search(x)
+            self._last = i
+        return i
+
+    def locate(self, x):
+        """
+        Cells of the array of coordinates x, the same as calling the locator
+        on each of them, found by numpy.searchsorted.
+        """
+        i = self._increasingArray.searchsorted(x, side='right')
+        if self.decreasing:
+            # Number of values above x
+            i = self.size - i
+        return numpy.minimum(i, self.size - 1)
+
+    def _contains(self, i, x):
+        """True if i is the cell of x."""
+        values = self.values
+        if self.decreasing:
+            if i == 0:
+                return x >= values[0]
+            if i == self.size - 1:
+                return values[i - 1] > x
+            return values[i - 1] > x >= values[i]
+        if i == 0:
+            return x < values[0]
+        if i == self.size - 1:
+            return values[i - 1] <= x
+        return values[i - 1] <= x < values[i]
+
+    def _search(self, x):
+        """Cell of x, without the last cell."""
+        values = self.values
+        if self.decreasing:
+            # Number of values above x
+            i = self.size - bisect_right(self._increasing, x)
+        elif self.uniform:
+            i = min(max(floor((x - values[0]) * self._inverseStep) + 1, 0), self.size)
+            # Fix rounding at the cell boundaries
+            while i < self.size and values[i] <= x:
+                i += 1
+            while i > 0 and values[i - 1] > x:
+                i -= 1
+        else:
+            i = bisect_right(values, x)
+        if i == self.size:
+            i -= 1
+        return i
+
+
+class LongitudeLocator(object):
+    """
+    Indices of the grid longitudes on each side of every longitude of an
+    array, from the reverse longitude map. Same as the scalar lookup of
+    Linear4DInterpolator, including grid points and the 180th meridian.
+    The sorted longitudes of the map are built once.
+
+    Parameters
+    ----------
+    revLongitude : dict
+        Index of each grid longitude.
+    lonStep : float
+        Step of the grid longitudes.
+    """
+
+    def __init__(self, revLongitude, lonStep):
+        self.lonStep = lonStep
+        self.keys = numpy.array(sorted(revLongitude), dtype=float)
+        self.rows = numpy.array([revLongitude[key] for key in self.keys])
+
+    def _lookup(self, grid):
+        i = numpy.minimum(numpy.searchsorted(self.keys, grid), len(self.keys) - 1)
+        return self.rows[i], self.keys[i] == grid
+
+    def locate(self, lon):
+        """
+        Indices (idx0, idx1) of the longitudes on each side of the array lon.
+        """
+        lonStep = self.lonStep
+        lonGrid0 = numpy.floor(lon / lonStep) * lonStep
+        lonGrid1 = numpy.ceil(lon / lonStep) * lonStep
+        lonGrid0[lonGrid0 == -180] = 180
+
+        # On a grid longitude, the next one is used, or the previous one if
+        # the next isn't in the grid
+        onGrid = lonGrid0 == lonGrid1
+        idx0, found0 = self._lookup(lonGrid0)
+        idx1, found1 = self._lookup(numpy.where(onGrid, lonGrid1 + lonStep, lonGrid1))
+        previous = onGrid & ~(found0 & found1)
+        idxPrevious, foundPrevious = self._lookup(lonGrid0 - lonStep)
+        idxGrid, foundGrid = self._lookup(lonGrid1)
+        idx0 = numpy.where(previous, idxPrevious, idx0)
+        idx1 = numpy.where(previous, idxGrid, idx1)
+
+        if not numpy.where(previous, foundPrevious & foundGrid, found0 & found1).all():
+            raise KeyError('Longitude outside of the grid')
+        return idx0, idx1